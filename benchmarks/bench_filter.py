@@ -0,0 +1,87 @@
+"""
+Benchmarks of the particle filter hot paths
+"""
+import numpy as np
+import pytest
+
+from birdseye.factory import build_sensor
+from birdseye.particle_filter import RESAMPLE_METHODS
+from conftest import make_env
+
+
+def test_update_state_vectorized(benchmark, env):
+    """
+    Motion of the particles of every target
+    """
+
+    def update():
+        for target_pf in env.pf:
+            env.state.update_state_vectorized(target_pf.particles, (30, 1))
+
+    benchmark(update)
+
+
+def test_observation_vectorized(benchmark, env):
+    """
+    Expected RSSI of the particles of every target
+    """
+
+    def observe():
+        for t, target_pf in enumerate(env.pf):
+            env.sensor.observation_vectorized(target_pf.particles, t)
+
+    benchmark(observe)
+
+
+def test_weight(benchmark, env):
+    """
+    Likelihood of one reading per target
+    """
+    hypotheses = [
+        env.sensor.observation_vectorized(target_pf.particles, t)
+        for t, target_pf in enumerate(env.pf)
+    ]
+
+    def weight():
+        for target_hypotheses in hypotheses:
+            env.sensor.weight(target_hypotheses, -60.0)
+
+    benchmark(weight)
+
+
+def test_pf_update(benchmark, env):
+    """
+    One update of every per target filter, as in RFMultiSeparableEnv.step
+    """
+    observation = np.full(env.state.n_targets, -60.0)
+
+    def update():
+        for t in range(env.state.n_targets):
+            env.pf[t].update(observation[t], xp=env.pf[t].particles, control=(30, 1))
+
+    benchmark(update)
+
+
+@pytest.mark.parametrize("cell_size", [2, 4], ids=lambda c: f"{c}m")
+def test_grid_update(benchmark, cell_size):
+    """
+    One update of the grid backend over the default 400 m wide grid
+    """
+    env = make_env(1, 3000, belief_backend="grid", grid_cell_size=cell_size)
+    benchmark(env.pf[0].update, -60.0)
+
+
+def test_observation_table(benchmark, n_particles):
+    """
+    observation_vectorized in the quantized likelihood mode
+    """
+    env = make_env(1, n_particles)
+    sensor = build_sensor(rssi_table=True)
+    benchmark(sensor.observation_vectorized, env.pf[0].particles, 0)
+
+
+@pytest.mark.parametrize("method", list(RESAMPLE_METHODS))
+def test_resample(benchmark, method, n_particles):
+    weights = np.random.default_rng(0).random(n_particles) ** 4
+    weights /= np.sum(weights)
+    benchmark(RESAMPLE_METHODS[method], weights, np.random.default_rng(0))
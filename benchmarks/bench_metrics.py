@@ -0,0 +1,51 @@
+"""
+Benchmarks of the multi target particle helpers and tracking metrics
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from birdseye.core import particle_swap
+from birdseye.core import tracking_error
+from birdseye.core import tracking_metrics_separable
+
+from conftest import make_env
+
+
+@pytest.mark.parametrize("n_particles", [100, 500], ids=lambda n: f"{n}particles")
+def test_particle_swap(benchmark, n_particles):
+    """
+    particle_swap of a joint 2 target filter, quadratic in the particle count
+    """
+    env = make_env(2, n_particles)
+    particles = np.hstack(env.get_all_particles())
+    stub = SimpleNamespace(pf=SimpleNamespace(particles=particles), state=env.state)
+
+    def swap():
+        stub.pf.particles = particles
+        particle_swap(stub)
+
+    benchmark.pedantic(swap, rounds=3, iterations=1)
+
+
+@pytest.mark.parametrize("n_targets", [2, 4, 8], ids=lambda n: f"{n}targets")
+def test_tracking_error(benchmark, n_targets):
+    """
+    tracking_error searches every target permutation, a single round as
+    8 targets take tens of seconds
+    """
+    env = make_env(n_targets, 1000)
+    targets = np.array(env.state.target_state)
+    particles = np.hstack(env.get_all_particles())
+    benchmark.pedantic(tracking_error, args=(targets, particles), rounds=1, iterations=1)
+
+
+@pytest.mark.parametrize("n_targets", [2, 4, 8], ids=lambda n: f"{n}targets")
+def test_tracking_metrics_separable(benchmark, n_targets):
+    env = make_env(n_targets, 1000)
+    benchmark(
+        tracking_metrics_separable,
+        np.array(env.state.target_state),
+        env.get_all_particles(),
+    )
@@ -0,0 +1,35 @@
+"""
+Benchmarks of the planner building blocks
+"""
+import numpy as np
+
+from birdseye.mcts_utils import select_action_light
+
+from conftest import make_env
+
+
+def test_void_probability(benchmark, env):
+    actions = [env.actions.index_to_action(0)] * 4
+    benchmark(env.void_probability, actions, 10)
+
+
+def test_select_action_light(benchmark, n_targets):
+    """
+    20 MCTS simulations of depth 2 on a 400 particle downsample
+    """
+    env = make_env(n_targets, 3000)
+    rng = np.random.default_rng(0)
+    benchmark.pedantic(
+        select_action_light,
+        args=(env,),
+        kwargs={
+            "Q": {},
+            "N": {},
+            "depth": 2,
+            "iterations": 20,
+            "n_downsample": 400,
+            "rng": rng,
+        },
+        rounds=3,
+        iterations=1,
+    )
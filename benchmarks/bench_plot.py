@@ -0,0 +1,28 @@
+"""
+Benchmark of the live plot of a simulated separable env
+"""
+import matplotlib
+
+matplotlib.use("agg")
+import matplotlib.pyplot as plt  # pylint: disable=wrong-import-position
+
+from birdseye.utils import Results  # pylint: disable=wrong-import-position
+
+
+def test_live_plot(benchmark, env, tmp_path):
+    results = Results(
+        experiment_name="benchmark",
+        global_start_time="live_plot",
+        config={"plot_dir": str(tmp_path)},
+    )
+    fig = plt.figure(figsize=(14, 10), dpi=100)
+    ax = fig.subplots()
+    time_step = iter(range(1000000))
+
+    def plot():
+        results.live_plot(
+            env=env, time_step=next(time_step), fig=fig, ax=ax, data={}, separable=True
+        )
+
+    benchmark.pedantic(plot, rounds=5, iterations=1)
+    plt.close(fig)
@@ -0,0 +1,70 @@
+"""
+Shared fixtures of the microbenchmarks
+
+The benchmark modules are named bench_*.py and only collected when benchmarks/
+(or a file in it) is named on the command line, so a run of the whole tree
+such as the unit test job does not pick them up. Run them with
+
+    python -m pytest benchmarks --benchmark-json=bench.json
+"""
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from birdseye.factory import build_env
+
+PARTICLE_COUNTS = [1000, 3000, 10000]
+TARGET_COUNTS = [1, 2, 4]
+
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+
+
+def benchmarks_requested(config):
+    """Whether benchmarks/ or a path inside it is a command line argument"""
+    for arg in config.args:
+        path = Path(arg.split("::")[0]).resolve()
+        if path == BENCHMARKS_DIR or BENCHMARKS_DIR in path.parents:
+            return True
+    return False
+
+
+def pytest_collect_file(file_path, parent):
+    # files given on the command line are already collected by pytest
+    if (
+        file_path.suffix == ".py"
+        and file_path.name.startswith("bench_")
+        and not parent.session.isinitpath(file_path)
+        and benchmarks_requested(parent.config)
+    ):
+        return pytest.Module.from_parent(parent, path=file_path)
+    return None
+
+
+def make_env(n_targets, n_particles, seed=0, **kwargs):
+    """
+    Simulated separable env of birdseye.factory.build_env, with one generator
+    seeded by seed, kwargs are passed to build_env
+    """
+    return build_env(
+        n_targets,
+        rng=np.random.default_rng(seed),
+        num_particles=n_particles,
+        **kwargs,
+    )
+
+
+@pytest.fixture(params=PARTICLE_COUNTS, ids=lambda n: f"{n}particles")
+def n_particles(request):
+    return request.param
+
+
+@pytest.fixture(params=TARGET_COUNTS, ids=lambda n: f"{n}targets")
+def n_targets(request):
+    return request.param
+
+
+@pytest.fixture
+def env(n_targets, n_particles):
+    return make_env(n_targets, n_particles)
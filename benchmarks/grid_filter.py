@@ -0,0 +1,166 @@
+"""
+Accuracy and cost of the grid belief backend against particle filters
+
+Runs the same synthetic localization episodes with every backend: a target
+at a random position within particle_distance of the start of a sensor
+walking east at 2 m per step while sweeping its yagi by 30 degrees per step,
+with RSSI readings from the bundled radiation pattern and log normal fading.
+The filters are updated by RFMultiSeparableEnv.real_step, as in geolocate.
+
+For every search radius the run reports, per backend, the mean and 90th
+percentile distance from the belief centroid to the target after the last
+step and the time per step, so the radius where the grid starts to beat
+the particle counts in use can be read off.
+
+Each run is appended to benchmarks/results/grid_filter.jsonl tagged with the
+git commit.
+
+Usage
+-----
+    python benchmarks/grid_filter.py [--distances 100 200 400]
+        [--particles 1000 3000 10000] [--cells 2 4] [--episodes 10]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+from datetime import datetime
+from timeit import default_timer as timer
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from birdseye.core import pol2cart  # noqa: E402
+from birdseye.factory import build_env  # noqa: E402
+from birdseye.factory import build_sensor  # noqa: E402
+from birdseye.sensor import SingleRSSISeparable  # noqa: E402
+from startup import git_commit  # noqa: E402
+
+RESULTS_FILE = os.path.join(REPO_DIR, "benchmarks", "results", "grid_filter.jsonl")
+
+
+class ReadingSensor(SingleRSSISeparable):
+    """
+    Sensor whose real observation is the reading of the current step
+    """
+
+    reading = None
+
+    def real_observation(self):
+        return [self.reading]
+
+
+def run_episode(backend, distance, seed, args, n_particles=3000, cell_size=2):
+    """
+    Localization error (m) after the last step and mean time per step (s)
+    """
+    rng = np.random.default_rng(seed)
+    sensor = build_sensor(
+        fading_sigma=args.fading_sigma, rng=rng, sensor_class=ReadingSensor
+    )
+    env = build_env(
+        rng=rng,
+        sensor=sensor,
+        simulated=False,
+        num_particles=n_particles,
+        state_kwargs={"particle_distance": distance},
+        belief_frame=args.frame,
+        belief_backend=backend,
+        grid_cell_size=cell_size,
+    )
+
+    target = np.array(
+        pol2cart(rng.uniform(10, distance), np.radians(rng.uniform(0, 360)))
+    )
+    position = np.zeros(2)
+    heading = 0
+    data = {}
+    start = timer()
+    for _ in range(args.steps):
+        heading = (heading + 30) % 360
+        position = position + pol2cart(2, np.radians(0))
+        offset = target - position
+        bearing = (np.degrees(np.arctan2(offset[1], offset[0])) - heading) % 360
+        sensor.reading = float(
+            sensor.observation([np.hypot(*offset), bearing], 0)[0]
+        )
+        data.update(
+            {"needs_processing": True, "distance": 2, "course": 0, "heading": heading}
+        )
+        env.real_step(data)
+    step_time = (timer() - start) / args.steps
+
+    absolute = env.get_absolute_particles()[0]
+    x, y = pol2cart(absolute[:, 0], np.radians(absolute[:, 1]))
+    return float(np.hypot(np.mean(x) - target[0], np.mean(y) - target[1])), step_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--distances", nargs="+", type=float, default=[100, 200, 400], help="m"
+    )
+    parser.add_argument(
+        "--particles", nargs="+", type=int, default=[1000, 3000, 10000]
+    )
+    parser.add_argument("--cells", nargs="+", type=float, default=[2, 4], help="m")
+    parser.add_argument("--episodes", type=int, default=10)
+    parser.add_argument("--steps", type=int, default=40)
+    parser.add_argument("--fading_sigma", type=float, default=4)
+    parser.add_argument("--frame", default="world", help="belief frame")
+    parser.add_argument("--results", default=RESULTS_FILE, help="results history")
+    args = parser.parse_args()
+    os.chdir(REPO_DIR)
+
+    backends = [("particles", {"n_particles": n}) for n in args.particles] + [
+        ("grid", {"cell_size": cell_size}) for cell_size in args.cells
+    ]
+    commit, dirty = git_commit()
+    record = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.node(),
+        "args": vars(args),
+        "results": [],
+    }
+    print(f"{'distance':>8s} {'backend':>16s} {'error':>8s} {'p90':>8s} {'step':>9s}")
+    for distance in args.distances:
+        for backend, options in backends:
+            runs = [
+                run_episode(backend, distance, seed, args, **options)
+                for seed in range(args.episodes)
+            ]
+            errors = [error for error, _ in runs]
+            result = {
+                "distance": distance,
+                "backend": backend,
+                **options,
+                "error_mean": float(np.mean(errors)),
+                "error_p90": float(np.quantile(errors, 0.9)),
+                "step_time": float(np.mean([step_time for _, step_time in runs])),
+            }
+            record["results"].append(result)
+            name = (
+                f"grid {options['cell_size']:g}m"
+                if backend == "grid"
+                else f"{options['n_particles']} particles"
+            )
+            print(
+                f"{distance:8.0f} {name:>16s} {result['error_mean']:7.1f}m "
+                f"{result['error_p90']:7.1f}m {1000 * result['step_time']:7.2f}ms"
+            )
+
+    os.makedirs(os.path.dirname(args.results), exist_ok=True)
+    with open(args.results, "a", encoding="UTF-8") as f:
+        f.write(json.dumps(record))
+        f.write("\n")
+    print(f"results appended to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+MQTT load test of the geolocate loop against an in-process broker
+
+Publishes gamutrf/inference (and gamutrf/targets) traffic at increasing
+rates to a Geolocate instance connected to a birdseye.mqtt_local.LocalBroker,
+so no network or real broker is needed. Messages are synthesized (a sensor
+walking north, one prediction class per target) or replayed from a capture,
+and stamped with their publish time, so the loop records the end to end
+latency from publishing to the filter update that used them in the
+geolocate.end_to_end span.
+
+For every rate the run reports the latency, the loop time, and the ingest
+counters. A rate is flagged as behind when messages are dropped or the loop
+takes longer than step_duration, i.e. the filter can not keep up.
+
+Each run is appended to benchmarks/results/mqtt_load.jsonl tagged with the
+git commit.
+
+Usage
+-----
+    python benchmarks/mqtt_load.py [--rates 1 10 100 1000] [--duration 10]
+        [--burst 50 --burst_every 5] [--replay replay_files/mqtt-1.log]
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from timeit import default_timer as timer
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import birdseye.instrument as instrument  # noqa: E402
+from birdseye.mqtt_local import LocalBroker  # noqa: E402
+from birdseye.replay import ReplayReader  # noqa: E402
+from geolocate import Geolocate  # noqa: E402
+from startup import git_commit  # noqa: E402
+
+RESULTS_FILE = os.path.join(REPO_DIR, "benchmarks", "results", "mqtt_load.jsonl")
+
+
+def synthetic_messages(n_targets, seed=0):
+    """
+    Inference messages of a sensor walking north, one class per target
+    """
+    rng = np.random.default_rng(seed)
+    for i in itertools.count():
+        yield {
+            "metadata": {"rssi_max": "-60"},
+            "predictions": {
+                f"target{t}": [{"rssi_max": str(rng.normal(-60 - 5 * t, 3))}]
+                for t in range(n_targets)
+            },
+            "position": [32.922651 + i * 1e-6, -117.120815],
+            "heading": 0,
+            "gps": "fix",
+        }
+
+
+def replay_messages(path):
+    """
+    Messages of a capture, repeated for as long as needed
+    """
+    while True:
+        for _, message in ReplayReader(path):
+            yield message
+
+
+def target_message():
+    return {
+        "gps_fix_type": 2,
+        "gps_stale": "false",
+        "latitude": 32.9236,
+        "longitude": -117.1208,
+        "target_name": "drone1",
+    }
+
+
+def publish_offsets(rate, duration, burst=0, burst_every=0):
+    """
+    Sorted publish times in seconds from the start: rate messages per second,
+    plus burst messages at once every burst_every seconds
+    """
+    offsets = list(np.arange(0, duration, 1 / rate)) if rate > 0 else []
+    if burst and burst_every:
+        for t in np.arange(burst_every, duration, burst_every):
+            offsets.extend([t] * burst)
+    return sorted(offsets)
+
+
+def run_rate(config_path, overrides, rate, messages, args):
+    """
+    Publish at rate messages per second to a fresh Geolocate instance
+    """
+    instrument.enable()
+    instrument.REGISTRY.reset()
+    broker = LocalBroker()
+    instance = Geolocate(config_path=config_path, config=overrides)
+    instance.broker = broker
+    instance.start(setDaemon=True)
+    deadline = timer() + 30
+    while not broker.clients and timer() < deadline:
+        time.sleep(0.01)
+
+    offsets = publish_offsets(rate, args.duration, args.burst, args.burst_every)
+    target_every = int(rate / args.targets_rate) if args.targets_rate else 0
+    start = timer()
+    for i, offset in enumerate(offsets):
+        wait = start + offset - timer()
+        if wait > 0:
+            time.sleep(wait)
+        message = dict(next(messages))
+        message["publish_time"] = timer()
+        broker.publish("gamutrf/inference", json.dumps(message))
+        if target_every and i % target_every == 0:
+            broker.publish("gamutrf/targets", json.dumps(target_message()))
+    publish_time = timer() - start
+    # let the last messages reach the filter
+    time.sleep(2 * args.step_duration)
+    instance.stop()
+    broker.close()
+
+    histograms = instrument.REGISTRY.histograms
+    counters = {
+        name: value
+        for (name, labels), value in instrument.REGISTRY.counters.items()
+        if dict(labels).get("queue", "gamutrf/inference") == "gamutrf/inference"
+    }
+    end_to_end = histograms.get("geolocate.end_to_end")
+    loop = histograms.get("geolocate.loop")
+    result = {
+        "rate": rate,
+        "published": len(offsets),
+        "publish_rate": len(offsets) / publish_time if publish_time else 0,
+        "received": counters.get("ingest_messages", 0),
+        "dropped": counters.get("ingest_dropped", 0),
+        "coalesced": counters.get("messages_coalesced", 0),
+        "applied": end_to_end.count if end_to_end else 0,
+        "latency_mean": end_to_end.sum / end_to_end.count if end_to_end else None,
+        "latency_p90": end_to_end.quantile(0.9) if end_to_end else None,
+        "steps": loop.count if loop else 0,
+        "loop_mean": loop.sum / loop.count if loop else None,
+        "loop_p90": loop.quantile(0.9) if loop else None,
+    }
+    result["behind"] = bool(
+        result["dropped"]
+        or result["loop_mean"] is None
+        or result["loop_mean"] > 1.1 * args.step_duration
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--config", default="geolocate.ini", help="geolocate config")
+    parser.add_argument(
+        "--rates", nargs="+", type=float, default=[1, 10, 100, 1000], help="msg/s"
+    )
+    parser.add_argument("--duration", type=float, default=10, help="seconds per rate")
+    parser.add_argument("--burst", type=int, default=0, help="messages per burst")
+    parser.add_argument("--burst_every", type=float, default=0, help="seconds")
+    parser.add_argument("--targets_rate", type=float, default=1, help="msg/s")
+    parser.add_argument("--step_duration", type=float, default=0.2)
+    parser.add_argument("--coalesce", default="latest")
+    parser.add_argument("--n_targets", type=int, default=2)
+    parser.add_argument("--n_particles", type=int, default=3000)
+    parser.add_argument("--use_planner", action="store_true")
+    parser.add_argument("--replay", default=None, help="capture to replay")
+    parser.add_argument("--results", default=RESULTS_FILE, help="results history")
+    parser.add_argument("--log", default="WARNING", help="Log level")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log.upper()))
+    os.chdir(REPO_DIR)
+    overrides = {
+        "use_flask": "false",
+        "local_plot": "false",
+        "make_gif": "false",
+        "use_planner": str(args.use_planner).lower(),
+        "n_targets": str(args.n_targets),
+        "n_particles": str(args.n_particles),
+        "step_duration": str(args.step_duration),
+        "coalesce": args.coalesce,
+        "results_name": "mqtt_load",
+    }
+    if args.replay:
+        messages = replay_messages(args.replay)
+    else:
+        messages = synthetic_messages(args.n_targets)
+
+    commit, dirty = git_commit()
+    record = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.node(),
+        "args": vars(args),
+        "rates": [],
+    }
+    print(
+        f"{'rate':>8s} {'published':>9s} {'applied':>8s} {'dropped':>8s} "
+        f"{'latency':>8s} {'loop':>8s}"
+    )
+    for rate in args.rates:
+        result = run_rate(args.config, overrides, rate, messages, args)
+        record["rates"].append(result)
+        latency = result["latency_mean"] or 0
+        loop = result["loop_mean"] or 0
+        flag = "  BEHIND" if result["behind"] else ""
+        print(
+            f"{rate:8.1f} {result['published']:9d} {result['applied']:8d} "
+            f"{result['dropped']:8d} {latency:7.3f}s {loop:7.3f}s{flag}"
+        )
+
+    os.makedirs(os.path.dirname(args.results), exist_ok=True)
+    with open(args.results, "a", encoding="UTF-8") as f:
+        f.write(json.dumps(record))
+        f.write("\n")
+    print(f"results appended to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+"""
+Startup benchmark of the geolocate, sigscan and lightweight_separable entry points
+
+Every scenario runs in a fresh interpreter, so imports are cold, and records
+the time spent importing the entry point, building the sensor (radiation
+pattern CSV parsing), building the state, actions and env, drawing the
+particle prior (env.reset), building the planner, the first filter step and
+the steady state step latency. geolocate runs Geolocate.main on a fast-forward
+replay and reports its whole setup as one phase. A second interpreter per
+scenario runs with -X importtime to break the import time down per module.
+
+Each run is appended to benchmarks/results/startup.jsonl tagged with the git
+commit, and compared against the latest run of a different commit.
+
+Usage
+-----
+    python benchmarks/startup.py [--scenarios geolocate sigscan] [--steps 20]
+
+GPSVis map tile downloads are left out, they depend on the network.
+"""
+import argparse
+import configparser
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_FILE = os.path.join(REPO_DIR, "benchmarks", "results", "startup.jsonl")
+# geolocate writes the replay outputs here, deleted after the run
+STARTUP_RESULTS_NAME = "startup_benchmark"
+SCENARIOS = ("geolocate", "sigscan", "lightweight_separable")
+# modules reported in the import breakdown besides birdseye.*
+MIN_IMPORT_TIME = 0.01
+# relative slowdown reported as a regression, if also above MIN_REGRESSION_TIME
+REGRESSION_THRESHOLD = 0.2
+MIN_REGRESSION_TIME = 0.005
+
+
+class PhaseTimer:
+    """
+    Wall clock time of consecutive phases, relative to the timer creation
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.phases = {}
+
+    def __call__(self, name):
+        now = time.perf_counter()
+        self.phases[name] = now - self.last
+        self.last = now
+
+
+def walk_messages(n_steps, n_targets):
+    """
+    GPS, heading and RSSI messages of a sensor walking north
+    """
+    for i in range(n_steps):
+        yield {
+            "position": [-41.2768 + i * 1e-5, 174.7779],
+            "heading": 0,
+            "rssi": [-60.0 - t for t in range(n_targets)] if n_targets > 1 else -60.0,
+        }
+
+
+def step_stats(step_times):
+    step_times = sorted(step_times)
+    if not step_times:
+        return {}
+    return {
+        "step_median": step_times[len(step_times) // 2],
+        "step_p90": step_times[int(0.9 * (len(step_times) - 1))],
+        "step_mean": sum(step_times) / len(step_times),
+    }
+
+
+def antenna_file(antenna_type):
+    if antenna_type in ["directional", "yagi", "logp"]:
+        return "radiation_pattern_yagi_5.csv"
+    return "radiation_pattern_monopole.csv"
+
+
+def run_geolocate(timer, n_steps):
+    """
+    Time Geolocate.main itself, fast-forwarding a replay of n_steps messages.
+    Setup is everything main does before its first loop iteration, when it
+    first checks whether it was stopped, and each later check ends a step.
+    """
+    import geolocate  # pylint: disable=import-outside-toplevel
+
+    from birdseye.definitions import RUN_DIR  # pylint: disable=import-outside-toplevel
+
+    timer("import")
+
+    results_dir = os.path.join(RUN_DIR, STARTUP_RESULTS_NAME)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        replay_file = os.path.join(tmpdir, "walk.log")
+        instance = geolocate.Geolocate(
+            config_path="geolocate.ini",
+            config={
+                "replay_file": replay_file,
+                "replay_fast_forward": "true",
+                "results_name": STARTUP_RESULTS_NAME,
+            },
+        )
+        with open(replay_file, "w", encoding="UTF-8") as f:
+            for message in walk_messages(n_steps, int(instance.config["n_targets"])):
+                f.write(json.dumps(message) + "\n")
+
+        step_ends = []
+
+        def stopped():
+            step_ends.append(time.perf_counter())
+            if len(step_ends) == 1:
+                timer("setup")
+            elif len(step_ends) == 2:
+                timer("first_step")
+            return len(step_ends) > n_steps
+
+        try:
+            instance.main(stopped)
+        finally:
+            shutil.rmtree(results_dir, ignore_errors=True)
+    return [end - start for start, end in zip(step_ends[1:], step_ends[2:])]
+
+
+def run_sigscan(timer, n_steps):
+    import sigscan  # pylint: disable=import-outside-toplevel
+
+    import birdseye.env  # pylint: disable=import-outside-toplevel
+    import birdseye.state  # pylint: disable=import-outside-toplevel
+    from birdseye.actions import WalkingActions  # pylint: disable=import-outside-toplevel
+
+    timer("import")
+
+    instance = sigscan.SigScan(config_path="sigscan_config.ini")
+    config = instance.config
+    sensor = sigscan.GamutRFSensor(
+        antenna_filename=antenna_file(config.get("antenna_type", "omni")),
+        power_tx=float(config.get("power_tx", "26")),
+        directivity_tx=float(config.get("directivity_tx", "1")),
+        freq=float(config.get("freq", "5.7e9")),
+        fading_sigma=float(config.get("fading_sigma", "8")),
+        threshold=float(config.get("threshold", "-120")),
+        data=instance.data,
+    )
+    timer("sensor")
+
+    n_targets = int(config.get("n_targets", "2"))
+    state = birdseye.state.RFMultiState(
+        n_targets=n_targets,
+        reward=config.get("reward", "heuristic_reward"),
+        simulated=False,
+        particle_distance=float(config.get("particle_distance", "200")),
+    )
+    env = birdseye.env.RFMultiEnv(
+        sensor=sensor, actions=WalkingActions(), state=state, simulated=False
+    )
+    timer("env")
+    env.reset()
+    timer("reset")
+    # the dqn and mcts planners need checkpoints and are disabled by default
+    timer("planner")
+
+    step_times = []
+    for message in walk_messages(n_steps, 1):
+        step_start = time.perf_counter()
+        instance.data_handler(message)
+        env.real_step(instance.data)
+        step_times.append(time.perf_counter() - step_start)
+        if len(step_times) == 1:
+            timer("first_step")
+    return step_times[1:]
+
+
+def run_lightweight_separable(timer, n_steps):
+    import lightweight_separable  # pylint: disable=import-outside-toplevel,unused-import
+
+    import birdseye.actions  # pylint: disable=import-outside-toplevel
+    import birdseye.factory  # pylint: disable=import-outside-toplevel
+    from birdseye.planners.repp import REPP  # pylint: disable=import-outside-toplevel
+    from birdseye.rng import RNGContext  # pylint: disable=import-outside-toplevel
+
+    timer("import")
+
+    config = configparser.ConfigParser()
+    config.read("lightweight_separable_config.ini")
+    config = config["lightweight"]
+    n_targets = int(config.get("n_targets", "2"))
+    rng = RNGContext()
+    sensor = birdseye.factory.build_sensor(
+        n_targets,
+        fading_sigma=float(config.get("fading_sigma", "8")),
+        rng=rng,
+        antenna_filename=antenna_file(config.get("antenna_type", "logp")),
+        power_tx=[float(x) for x in config.get("power_tx", "26").split(",")],
+        directivity_tx=[float(x) for x in config.get("directivity_tx", "1").split(",")],
+        freq=[float(x) for x in config.get("freq", "5.7e9").split(",")],
+    )
+    timer("sensor")
+
+    sensor_speed = float(config.get("sensor_speed", "1"))
+    env = birdseye.factory.build_env(
+        n_targets,
+        rng=rng,
+        sensor=sensor,
+        actions=birdseye.actions.BaselineActions(sensor_speed=sensor_speed),
+        num_particles=3000,
+        state_kwargs={
+            "target_speed": float(config.get("target_speed", "0.5")),
+            "sensor_speed": sensor_speed,
+            "reward": lambda pf: pf.weight_entropy,
+        },
+        reset=False,
+    )
+    timer("env")
+    env.reset()
+    timer("reset")
+    planner = REPP(env, 35, 10, 1, 0.82, set(range(n_targets)), rng=rng.planner)
+    timer("planner")
+
+    step_times = []
+    for _ in range(n_steps):
+        step_start = time.perf_counter()
+        action = planner.get_action()[0]
+        env.step(action)
+        step_times.append(time.perf_counter() - step_start)
+        if len(step_times) == 1:
+            timer("first_step")
+    return step_times[1:]
+
+
+def run_child(scenario, n_steps):
+    """
+    Run a scenario in this (fresh) interpreter and print its timings as JSON
+    """
+    timer = PhaseTimer()
+    step_times = globals()[f"run_{scenario}"](timer, n_steps)
+    result = {"phases": timer.phases, "time_to_first_step": sum(timer.phases.values())}
+    result.update(step_stats(step_times))
+    print(json.dumps(result))
+
+
+def parse_importtime(stderr):
+    """
+    Cumulative import time in seconds of the birdseye modules and of every
+    top level module taking at least MIN_IMPORT_TIME
+    """
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        seconds = int(cumulative) / 1e6
+        if name.startswith("birdseye") or (depth == 0 and seconds >= MIN_IMPORT_TIME):
+            imports[name] = seconds
+    return imports
+
+
+def run_scenario(scenario, n_steps):
+    env = dict(os.environ, PYTHONPATH=REPO_DIR, MPLBACKEND="agg")
+    child = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", scenario]
+        + ["--steps", str(n_steps)],
+        cwd=REPO_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    result = json.loads(child.stdout.strip().splitlines()[-1])
+    importtime = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {scenario}"],
+        cwd=REPO_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    result["imports"] = parse_importtime(importtime.stderr)
+    return result
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        dirty = bool(
+            subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                cwd=REPO_DIR,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+    return commit, dirty
+
+
+def load_history(results_file):
+    if not os.path.exists(results_file):
+        return []
+    with open(results_file, "r", encoding="UTF-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def metrics(result):
+    flat = {f"phase.{k}": v for k, v in result["phases"].items()}
+    flat.update(
+        {k: v for k, v in result.items() if k not in ("phases", "imports")}
+    )
+    return flat
+
+
+def compare(record, baseline):
+    """
+    Print the change of every metric against a previous record
+    """
+    print(f"compared with {baseline['commit']} ({baseline['timestamp']})")
+    regressions = []
+    for scenario, result in record["scenarios"].items():
+        if scenario not in baseline["scenarios"]:
+            continue
+        previous = metrics(baseline["scenarios"][scenario])
+        for name, value in metrics(result).items():
+            if name not in previous or not previous[name]:
+                continue
+            change = value / previous[name] - 1
+            flag = ""
+            if (
+                change > REGRESSION_THRESHOLD
+                and value - previous[name] > MIN_REGRESSION_TIME
+            ):
+                flag = "  REGRESSION"
+                regressions.append(f"{scenario} {name}")
+            print(
+                f"  {scenario:24s} {name:24s} {previous[name]:9.4f}s -> {value:9.4f}s "
+                f"({change:+.0%}){flag}"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--steps", type=int, default=20, help="filter steps per run")
+    parser.add_argument("--results", default=RESULTS_FILE, help="results history")
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.steps)
+        return []
+
+    commit, dirty = git_commit()
+    record = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.node(),
+        "steps": args.steps,
+        "scenarios": {},
+    }
+    for scenario in args.scenarios:
+        result = run_scenario(scenario, args.steps)
+        record["scenarios"][scenario] = result
+        phases = ", ".join(f"{k} {v:.3f}s" for k, v in result["phases"].items())
+        print(f"{scenario}: {phases}, step median {result.get('step_median', 0):.4f}s")
+
+    history = load_history(args.results)
+    os.makedirs(os.path.dirname(args.results), exist_ok=True)
+    with open(args.results, "a", encoding="UTF-8") as f:
+        f.write(json.dumps(record))
+        f.write("\n")
+    print(f"results appended to {args.results}")
+
+    previous = [r for r in history if r["commit"] != commit]
+    if previous:
+        return compare(record, previous[-1])
+    return []
+
+
+if __name__ == "__main__":
+    main()
@@ -42,9 +42,14 @@ class Actions:
         """Define ordered list of actions"""
         return list(map(self.action_to_index, self.action_space))
 
-    def get_random_action(self):
-        """Return random action and associated index"""
-        random_action_index = random.choice(self.get_action_list())
+    def get_random_action(self, rng=None):
+        """Return random action and associated index, drawn from rng if given"""
+        if rng is None:
+            random_action_index = random.choice(self.get_action_list())
+        else:
+            random_action_index = self.get_action_list()[
+                rng.integers(len(self.get_action_list()))
+            ]
         return self.index_to_action(random_action_index), random_action_index
 
     def print_action_info(self):
@@ -0,0 +1,347 @@
+"""
+Simulated environment that advances many independent episodes at once
+"""
+import numpy as np
+
+from .env import weighted_std
+from .particle_filter import batch_systematic_resample
+from .particle_filter import log_normalize
+from .sensor import get_directivity
+from .sensor import rssi
+from .core import pol2cart
+
+
+def particle_centroids(particles, weights=None):
+    """
+    Centroids in cartesian coordinates of particles (..., n_particles, 4),
+    weighted like RFMultiSeparableEnv when weights (..., n_particles) are given
+    """
+    x, y = pol2cart(particles[..., 0], np.radians(particles[..., 1]))
+    return np.stack(
+        (
+            np.average(x, axis=-1, weights=weights),
+            np.average(y, axis=-1, weights=weights),
+        ),
+        axis=-1,
+    )
+
+
+def particle_std_dev_cartesian(particles, weights=None):
+    """Cartesian standard deviations, see particle_centroids"""
+    x, y = pol2cart(particles[..., 0], np.radians(particles[..., 1]))
+    if weights is None:
+        return np.stack((np.std(x, axis=-1), np.std(y, axis=-1)), axis=-1)
+    return np.stack(
+        (weighted_std(x, weights, axis=-1), weighted_std(y, weights, axis=-1)),
+        axis=-1,
+    )
+
+
+def particle_std_dev_polar(particles, weights=None):
+    """Range and bearing standard deviations, see particle_centroids"""
+    if weights is None:
+        return np.std(particles[..., :2], axis=-2)
+    return np.stack(
+        (
+            weighted_std(particles[..., 0], weights, axis=-1),
+            weighted_std(particles[..., 1], weights, axis=-1),
+        ),
+        axis=-1,
+    )
+
+
+class BatchedRFMultiSeparableEnv:
+    """
+    Batched, simulation only counterpart of RFMultiSeparableEnv.
+
+    Every array carries a leading episode axis: target states are
+    (n_episodes, n_targets, 4), sensor states (n_episodes, 4) and particles
+    (n_episodes, n_targets, n_particles, 4). Each (episode, target) pair is
+    an independent particle filter with the same dynamics, noise, weighting
+    and resampling as the per-target pfilter of RFMultiSeparableEnv.
+    Finished episodes are masked out with done() and no longer advance.
+
+    Parameters
+    ----------
+    sensor : SingleRSSISeparable
+        Sensor model shared by all episodes
+    actions : Actions
+        Action space
+    state : RFMultiState
+        State model shared by all episodes
+    n_episodes : int
+        Number of episodes simulated together
+    num_particles : int
+        Particles per target
+    resample_proportion : float
+        Proportion of particles replenished from the prior every step
+    n_eff_threshold : float
+        Resample when the normalized effective sample size drops below this
+    rng : numpy.random.Generator, optional
+        Random number generator for the filters
+    """
+
+    def __init__(
+        self,
+        sensor=None,
+        actions=None,
+        state=None,
+        n_episodes=8,
+        num_particles=2000,
+        resample_proportion=0.1,
+        n_eff_threshold=1,
+        rng=None,
+    ):
+        self.sensor = sensor
+        self.actions = actions
+        self.state = state
+        self.simulated = True
+        self.n_episodes = n_episodes
+        self.n_particles = num_particles
+        self.resample_proportion = resample_proportion
+        self.n_eff_threshold = n_eff_threshold
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        self.target_state = None
+        self.sensor_state = None
+        self.particles = None
+        self.weights = None
+        self.active = None
+        self.iters = None
+
+    def reset(self):
+        """Reset every episode with new targets and uniform beliefs"""
+        n_episodes, n_targets = self.n_episodes, self.state.n_targets
+        self.target_state = self.state.random_states(n_episodes * n_targets).reshape(
+            n_episodes, n_targets, 4
+        )
+        self.sensor_state = np.zeros((n_episodes, 4))
+        self.particles = self.state.random_particle_states(
+            n_episodes * n_targets * self.n_particles
+        ).reshape(n_episodes, n_targets, self.n_particles, 4)
+        self.weights = np.full(
+            (n_episodes, n_targets, self.n_particles), 1 / self.n_particles
+        )
+        self.active = np.ones(n_episodes, dtype=bool)
+        self.iters = np.zeros(n_episodes, dtype=int)
+
+    def observation(self, states, fading_sigma=None):
+        """RSSI of states of shape (n_episodes, n_targets, ..., 4)
+
+        One fading draw is shared by everything observed for a given
+        (episode, target), like SingleRSSISeparable.observation_vectorized.
+        """
+        if fading_sigma is None:
+            fading_sigma = self.sensor.fading_sigma
+        observations = np.empty(states.shape[:-1])
+        for t in range(states.shape[1]):
+            directivity_rx = get_directivity(
+                self.sensor.radiation_pattern, np.radians(states[:, t, ..., 1])
+            )
+            observations[:, t] = rssi(
+                states[:, t, ..., 0],
+                directivity_rx,
+                power_tx=self.sensor.power_tx[t],
+                directivity_tx=self.sensor.directivity_tx[t],
+                freq=self.sensor.freq[t],
+            )
+        if fading_sigma:
+            fading = self.rng.normal(0, fading_sigma, states.shape[:2])
+            observations -= fading.reshape(fading.shape + (1,) * (states.ndim - 3))
+        return observations
+
+    def particle_noise(self, particles, sigmas=(1, 2, 2)):
+        particles[..., :3] += self.rng.normal(0, sigmas, particles.shape[:-1] + (3,))
+        particles[..., 0] = np.clip(particles[..., 0], a_min=1, a_max=None)
+        return particles
+
+    def update_filters(self, particles, weights, observations, controls):
+        """One particle filter update of every (episode, target) filter
+
+        Parameters
+        ----------
+        particles : array_like
+            Particles of shape (n, n_targets, n_particles, 4)
+        weights : array_like
+            Weights of shape (n, n_targets, n_particles)
+        observations : array_like
+            Observations of shape (n, n_targets)
+        controls : array_like
+            Controls of shape (n, 2)
+
+        Returns
+        -------
+        particles, weights : array_like
+            Updated particles and weights
+        """
+        particles = self.particle_noise(
+            self.state.update_states_batched(particles, controls)
+        )
+        hypotheses = self.observation(particles)
+
+        # Gaussian log likelihood, as SingleRSSISeparable.log_weight,
+        # normalized with log-sum-exp so far off particles do not underflow
+        with np.errstate(divide="ignore"):
+            log_weights = np.log(weights)
+        log_weights -= np.square(hypotheses - observations[..., None]) / (
+            2 * self.sensor.std_dev**2
+        )
+        # filters whose weights all vanished fall back to uniform
+        log_weights, _ = log_normalize(log_weights)
+        weights = np.exp(log_weights)
+
+        shape = particles.shape
+        flat_particles = particles.reshape(-1, self.n_particles, 4)
+        flat_weights = weights.reshape(-1, self.n_particles)
+
+        # resampling step
+        n_eff = 1 / np.sum(flat_weights**2, axis=-1) / self.n_particles
+        resample = n_eff < self.n_eff_threshold
+        if np.any(resample):
+            indices = batch_systematic_resample(flat_weights[resample], self.rng)
+            flat_particles[resample] = np.take_along_axis(
+                flat_particles[resample], indices[..., None], axis=1
+            )
+            flat_weights[resample] = 1 / self.n_particles
+
+        # randomly resample some particles from the prior
+        if self.resample_proportion > 0:
+            mask = self.rng.random(flat_weights.shape) < self.resample_proportion
+            flat_particles[mask] = self.state.random_particle_states(np.sum(mask))
+
+        return flat_particles.reshape(shape), flat_weights.reshape(shape[:-1])
+
+    def step(self, controls):
+        """Advance every active episode by one step
+
+        Parameters
+        ----------
+        controls : array_like
+            Controls of shape (n_episodes, 2), rows of done episodes are ignored
+
+        Returns
+        -------
+        observations : array_like
+            Observations of shape (n_episodes, n_targets), NaN for done episodes
+        """
+        controls = np.asarray(controls, dtype=float)
+        active = np.flatnonzero(self.active)
+        observations = np.full((self.n_episodes, self.state.n_targets), np.nan)
+        if len(active) == 0:
+            return observations
+
+        next_state = self.state.update_states_batched(
+            self.target_state[active], controls[active]
+        )
+        self.sensor_state[active] = self.state.update_sensors_batched(
+            self.sensor_state[active], controls[active]
+        )
+        observations[active] = self.observation(next_state[:, :, None, :])[..., 0]
+        self.particles[active], self.weights[active] = self.update_filters(
+            self.particles[active],
+            self.weights[active],
+            observations[active],
+            controls[active],
+        )
+        self.target_state[active] = next_state
+        self.iters[active] += 1
+        return observations
+
+    def done(self, episodes):
+        """Mark episodes as finished, they no longer advance"""
+        self.active[episodes] = False
+
+    def get_particle_centroids(self):
+        """Weighted centroids of shape (n_episodes, n_targets, 2)"""
+        return particle_centroids(self.particles, self.weights)
+
+    def get_particle_std_dev_cartesian(self):
+        """Weighted standard deviations of shape (n_episodes, n_targets, 2)"""
+        return particle_std_dev_cartesian(self.particles, self.weights)
+
+    def get_particle_std_dev_polar(self):
+        """Weighted standard deviations of shape (n_episodes, n_targets, 2)"""
+        return particle_std_dev_polar(self.particles, self.weights)
+
+    def targets_found(self, min_std_dev):
+        """Mask of episodes whose targets are all localized, see utils.targets_found"""
+        std_dev = np.amax(self.get_particle_std_dev_cartesian(), axis=-1)
+        return np.all(std_dev <= min_std_dev, axis=-1)
+
+    def episode(self, e):
+        """EpisodeView of episode e, for planners written against a single env"""
+        return EpisodeView(self, e)
+
+
+class EpisodeState:
+    """
+    State of a single episode of a batched env, other attributes are read
+    from the shared state model
+    """
+
+    def __init__(self, batch_env, e):
+        self._batch_env = batch_env
+        self._e = e
+
+    @property
+    def target_state(self):
+        return self._batch_env.target_state[self._e]
+
+    @property
+    def sensor_state(self):
+        return self._batch_env.sensor_state[self._e]
+
+    def __getattr__(self, name):
+        return getattr(self._batch_env.state, name)
+
+
+class EpisodeView:
+    """
+    Read only view of a single episode of a BatchedRFMultiSeparableEnv with
+    the interface the REPP and LAVAPilot planners and tracking metrics use
+    """
+
+    def __init__(self, batch_env, e):
+        self.batch_env = batch_env
+        self.e = e
+        self.sensor = batch_env.sensor
+        self.actions = batch_env.actions
+        self.state = EpisodeState(batch_env, e)
+        self.simulated = True
+
+    def get_all_particles(self):
+        return self.batch_env.particles[self.e]
+
+    def dynamics(self, particles, control=None, **kwargs):
+        return self.batch_env.state.update_states_batched(
+            particles[None], np.array([control], dtype=float)
+        )[0]
+
+    def void_probability(self, actions, r_min, min_bound=0.8):
+        """see RFMultiSeparableEnv.void_probability"""
+        updated_particles = np.array(self.get_all_particles())
+        p_outside_void = []
+        for action in actions:
+            updated_particles = self.dynamics(updated_particles, control=action)
+            p_outside_void.extend(np.mean(updated_particles[..., 0] >= r_min, axis=-1))
+        if np.min(p_outside_void) >= min_bound:
+            return True, updated_particles
+        return False, updated_particles
+
+    def belief(self, particles=None):
+        """
+        Particles and weights of the episode belief, or the given particles
+        unweighted, e.g. rolled out by a planner
+        """
+        if particles is None:
+            return self.get_all_particles(), self.batch_env.weights[self.e]
+        return particles, None
+
+    def get_particle_centroids(self, particles=None):
+        return particle_centroids(*self.belief(particles))
+
+    def get_particle_std_dev_cartesian(self, particles=None):
+        return particle_std_dev_cartesian(*self.belief(particles))
+
+    def get_particle_std_dev_polar(self, particles=None):
+        return particle_std_dev_polar(*self.belief(particles))
@@ -0,0 +1,207 @@
+"""
+Persistent catalog of the runs under RUN_DIR, used by results.filter_runs
+"""
+import json
+import os
+import sqlite3
+
+from .definitions import RUN_DIR
+
+CATALOG_FILE = "run_catalog.sqlite"
+
+# config fields stored as their own indexed columns, with the default used
+# by filter_runs when a run's config does not define them
+NUMERIC_FIELDS = {
+    "target_start": None,
+    "target_speed": 1.0,
+    "fading_sigma": 0.0,
+    "particle_resample": 0.005,
+}
+TEXT_FIELDS = ("reward", "sensor")
+
+
+def parse_header(method_name, header_path):
+    """
+    Parse a run header, returns the full config and the config filtered on
+    """
+    with open(header_path, "r", encoding="UTF-8") as f:
+        config = json.load(f)
+    config["Methods"]["reward"] = config["Methods"].get("reward", "range_reward")
+    filter_config = dict(config["Methods"])
+    if method_name == "baseline":
+        filter_config.update(config["Defaults"])
+    return config, filter_config
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class RunCatalog:
+    """
+    sqlite table of run name, method, config fields and file paths of every
+    run with a <run>_header.txt and <run>_data.csv. update() only parses
+    headers that are new or changed since the last update. Close the
+    catalog, or use it as a context manager, when done.
+
+    Parameters
+    ----------
+    run_dir : str, optional
+        Directory holding one directory per method
+    """
+
+    def __init__(self, run_dir=RUN_DIR):
+        self.run_dir = run_dir
+        os.makedirs(run_dir, exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(run_dir, CATALOG_FILE))
+        columns = ", ".join(
+            [f"{field} REAL" for field in NUMERIC_FIELDS]
+            + [f"{field} TEXT" for field in TEXT_FIELDS]
+        )
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                "method TEXT, run TEXT, header_path TEXT, data_path TEXT, "
+                "header_mtime REAL, config TEXT, filter_config TEXT, "
+                f"{columns}, PRIMARY KEY (method, run))"
+            )
+            for field in list(NUMERIC_FIELDS) + list(TEXT_FIELDS):
+                self.connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS runs_{field} ON runs (method, {field})"
+                )
+
+    def close(self):
+        """
+        Close the sqlite connection
+        """
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def update(self, method_name):
+        """
+        Add new and changed runs of a method and drop runs that are gone
+        """
+        method_dir = os.path.join(self.run_dir, method_name)
+        files = set(os.listdir(method_dir))
+        runs = {f[: -len("_header.txt")] for f in files if f.endswith("_header.txt")}
+        runs = {r for r in runs if f"{r}_data.csv" in files}
+        known = dict(
+            self.connection.execute(
+                "SELECT run, header_mtime FROM runs WHERE method = ?", (method_name,)
+            ).fetchall()
+        )
+        with self.connection:
+            for run in set(known) - runs:
+                self.connection.execute(
+                    "DELETE FROM runs WHERE method = ? AND run = ?", (method_name, run)
+                )
+            for run in runs:
+                header_path = os.path.join(method_dir, f"{run}_header.txt")
+                mtime = os.path.getmtime(header_path)
+                if known.get(run) == mtime:
+                    continue
+                try:
+                    config, filter_config = parse_header(method_name, header_path)
+                except Exception:  # pylint: disable=broad-except
+                    # invalid header, not a valid run
+                    self.connection.execute(
+                        "DELETE FROM runs WHERE method = ? AND run = ?",
+                        (method_name, run),
+                    )
+                    continue
+                fields = [to_float(filter_config.get(f)) for f in NUMERIC_FIELDS] + [
+                    filter_config.get(f) for f in TEXT_FIELDS
+                ]
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO runs VALUES "
+                    f"({', '.join(['?'] * (7 + len(fields)))})",
+                    [
+                        method_name,
+                        run,
+                        header_path,
+                        os.path.join(method_dir, f"{run}_data.csv"),
+                        mtime,
+                        json.dumps(config),
+                        json.dumps(filter_config),
+                    ]
+                    + fields,
+                )
+
+    def runs(self, method_name):
+        """
+        Names of the valid runs of a method
+        """
+        self.update(method_name)
+        return [
+            run
+            for (run,) in self.connection.execute(
+                "SELECT run FROM runs WHERE method = ?", (method_name,)
+            )
+        ]
+
+    def config(self, method_name, run_name):
+        """
+        Cached config of a run, None if the run is not in the catalog
+        """
+        row = self.connection.execute(
+            "SELECT config FROM runs WHERE method = ? AND run = ?",
+            (method_name, run_name),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def query(self, method_name, config_filter=None):
+        """
+        Runs of a method whose config matches config_filter, with the
+        semantics of results.filter_runs
+
+        Indexed fields and the datetime bounds are matched in SQL, any other
+        field is compared against the cached config.
+        """
+        self.update(method_name)
+        where = ["method = ?"]
+        params = [method_name]
+        other = {}
+        for k, v in (config_filter or {}).items():
+            if k in NUMERIC_FIELDS and not isinstance(v, list):
+                default = NUMERIC_FIELDS[k]
+                if default is None:
+                    where.append(f"{k} = ?")
+                else:
+                    where.append(f"COALESCE({k}, {default}) = ?")
+                params.append(float(v))
+            elif k in TEXT_FIELDS:
+                where.append(f"{k} = ?")
+                params.append(v)
+            elif k == "datetime_start":
+                where.append("run >= ?")
+                params.append(v)
+            elif k == "datetime_end":
+                where.append("run <= ?")
+                params.append(v)
+            else:
+                other[k] = v
+
+        rows = self.connection.execute(
+            f"SELECT run, filter_config FROM runs WHERE {' AND '.join(where)}", params
+        ).fetchall()
+        runs = []
+        for run, filter_config in rows:
+            if other:
+                filter_config = json.loads(filter_config)
+                if not all(
+                    filter_config.get(k, None) in v
+                    if isinstance(v, list)
+                    else filter_config.get(k) == v
+                    for k, v in other.items()
+                ):
+                    continue
+            runs.append(run)
+        return runs
@@ -0,0 +1,396 @@
+"""
+Core math helpers of the particle filters, planners and metrics
+
+Only depends on numpy so that the simulation, filtering and planning modules
+can be imported without the plotting and IO dependencies of birdseye.utils.
+"""
+from itertools import permutations
+
+import numpy as np
+
+
+def targets_found(env, min_std_dev):
+    std_dev = np.amax(
+        env.get_particle_std_dev_cartesian(), axis=1
+    )  # get maximum standard deviation axis for each target
+    not_found = np.where(std_dev > min_std_dev)
+    if len(not_found[0]) == 0:
+        return True
+    return False
+
+
+def permute_particle(particle):
+    return np.hstack((particle[4:], particle[:4]))
+
+
+def particle_swap(env):
+    # 2000 x 8
+    particles = np.copy(env.pf.particles)
+    n_targets = env.state.n_targets
+    state_dim = 4
+
+    # convert particles to cartesian
+    for i in range(n_targets):
+        x, y = pol2cart(
+            particles[:, state_dim * i], np.radians(particles[:, (state_dim * i) + 1])
+        )
+        particles[:, state_dim * i] = x
+        particles[:, (state_dim * i) + 1] = y
+
+    swapped = True
+    k = 0
+    while swapped and k < 10:
+        k += 1
+        swapped = False
+        for i in range(len(particles)):
+            original_particle = np.copy(particles[i])
+            target_centroids = [
+                np.mean(particles[:, state_dim * t : (state_dim * t) + 2])
+                for t in range(n_targets)
+            ]
+            distance = 0
+            for t in range(n_targets):
+                dif = (
+                    particles[i, state_dim * t : (state_dim * t) + 2]
+                    - target_centroids[t]
+                )
+                distance += np.dot(dif, dif)
+
+            permuted_particle = permute_particle(particles[i])
+            particles[i] = permuted_particle
+            permuted_target_centroids = [
+                np.mean(particles[:, state_dim * t : (state_dim * t) + 2])
+                for t in range(n_targets)
+            ]
+            permuted_distance = 0
+            for t in range(n_targets):
+                dif = (
+                    particles[i, state_dim * t : (state_dim * t) + 2]
+                    - permuted_target_centroids[t]
+                )
+                permuted_distance += np.dot(dif, dif)
+
+            if distance < permuted_distance:
+                particles[i] = original_particle
+            else:
+                swapped = True
+
+    # convert particles to polar
+    for i in range(n_targets):
+        rho, phi = cart2pol(
+            particles[:, state_dim * i], particles[:, (state_dim * i) + 1]
+        )
+        particles[:, state_dim * i] = rho
+        particles[:, (state_dim * i) + 1] = np.degrees(phi)
+
+    env.pf.particles = particles
+
+
+def circ_tangents(point, center, radius):
+    px, py = point
+    cx, cy = center
+
+    b = np.sqrt((px - cx) ** 2 + (py - cy) ** 2)
+    if radius >= b:
+        ##print(f"Warning: No tangents are possible.  radius >= distance to circle center ({radius} >= {b})")
+        return None
+    th = np.arccos(radius / b)
+    d = np.arctan2(py - cy, px - cx)
+    d1 = d + th
+    d2 = d - th
+
+    tangents = [
+        [cx + radius * np.cos(d1), cy + radius * np.sin(d1)],
+        [cx + radius * np.cos(d2), cy + radius * np.sin(d2)],
+    ]
+    v = np.array(point) - np.array(center)
+    v /= np.linalg.norm(v)
+    intersection = np.array(center) + radius * v
+    tangents.append(list(intersection))
+    return np.array(tangents)
+
+
+def pol2cart(rho, phi):
+    """
+    Transform polar to cartesian
+    """
+    x = rho * np.cos(phi)
+    y = rho * np.sin(phi)
+    return (x, y)
+
+
+def cart2pol(x, y):
+    """
+    Transform cartesian to polar
+    """
+    rho = np.sqrt(x**2 + y**2)
+    phi = np.arctan2(y, x)
+    return rho, phi
+
+
+def get_distance(coord1, coord2):
+    """
+    Get the distance between two coordinates
+    """
+    if (coord1 is None) or (coord2 is None):
+        return None
+
+    lat1, long1 = coord1
+    lat2, long2 = coord2
+    # approximate radius of earth in km
+    R = 6373.0
+
+    lat1 = np.radians(lat1)
+    long1 = np.radians(long1)
+
+    lat2 = np.radians(lat2)
+    long2 = np.radians(long2)
+
+    dlon = long2 - long1
+    dlat = lat2 - lat1
+
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    distance = R * c
+    return distance * (1e3)
+
+
+def get_heading(coord1, coord2):
+    """
+    Get the heading of two coordinates
+    """
+    if (coord1 is None) or (coord2 is None):
+        return None
+
+    lat1, long1 = coord1
+    lat2, long2 = coord2
+    dLon = long2 - long1
+    x = np.cos(np.radians(lat2)) * np.sin(np.radians(dLon))
+    y = np.cos(np.radians(lat1)) * np.sin(np.radians(lat2)) - np.sin(
+        np.radians(lat1)
+    ) * np.cos(np.radians(lat2)) * np.cos(np.radians(dLon))
+    brng = np.arctan2(x, y)
+    brng = np.degrees(brng)
+
+    return -brng + 90
+
+
+def is_float(element):
+    """
+    Check if an element is a float or not
+    """
+    try:
+        float(element)
+        return True
+    except (ValueError, TypeError):
+        return False
+
+
+def particles_mean_belief(particles):
+    particles_r = particles[:, 0]
+    particles_theta = np.radians(particles[:, 1])
+    particles_x, particles_y = pol2cart(particles_r, particles_theta)
+
+    # centroid of particles x,y
+    mean_x = np.mean(particles_x)
+    mean_y = np.mean(particles_y)
+
+    # centroid of particles r,theta
+    mean_r, mean_theta = cart2pol(mean_x, mean_y)
+
+    particles_heading = particles[:, 2]
+    particles_heading_rad = np.radians(particles_heading)
+    mean_heading_rad = np.arctan2(
+        np.mean(np.sin(particles_heading_rad)), np.mean(np.cos(particles_heading_rad))
+    )
+    mean_heading = np.degrees(mean_heading_rad)
+
+    mean_spd = np.mean(particles[:, 3])
+
+    return (
+        particles_x,
+        particles_y,
+        mean_x,
+        mean_y,
+        mean_r,
+        mean_theta,
+        mean_heading,
+        mean_spd,
+    )
+
+
+def particles_centroid_xy(particles):
+    particles_r = particles[:, 0]
+    particles_theta = np.radians(particles[:, 1])
+    particles_x, particles_y = pol2cart(particles_r, particles_theta)
+
+    # centroid of particles x,y
+    mean_x = np.mean(particles_x)
+    mean_y = np.mean(particles_y)
+
+    return [mean_x, mean_y]
+
+
+def angle_diff(angle):
+    diff = angle % 360
+
+    diff = (diff + 360) % 360
+
+    diff[diff > 180] -= 360
+    return diff
+
+
+def tracking_error(all_targets, all_particles):
+    """
+    Calculate different tracking errors
+    """
+    results = []
+    r_error = None
+    theta_error = None
+    heading_error = None
+    centroid_distance_error = None
+    rmse = None
+    mae = None
+    n_targets = len(all_particles[0]) // 4
+
+    # reorder targets to fit closest particles
+    min_distance = None
+    optimal_target_permutation = None
+
+    for idxs in list(permutations(range(n_targets))):
+        target_permutation = all_targets[list(idxs)]
+
+        distance = 0
+        for t in range(n_targets):
+            particle_centroid = np.array(
+                particles_centroid_xy(all_particles[:, 4 * t : 4 * (t + 1)])
+            )
+            target = np.array(
+                pol2cart(target_permutation[t][0], np.radians(target_permutation[t][1]))
+            )
+            distance += np.linalg.norm(particle_centroid - target) ** 2
+        if min_distance is None or distance < min_distance:
+            min_distance = distance
+            optimal_target_permutation = target_permutation
+
+    for t in range(n_targets):
+        target = optimal_target_permutation[t]
+        particles = all_particles[:, 4 * t : 4 * (t + 1)]
+
+        target_r = target[0]
+        target_theta = np.radians(target[1])
+        target_heading = target[2]
+        target_x, target_y = pol2cart(target_r, target_theta)
+
+        (
+            particles_x,
+            particles_y,
+            mean_x,
+            mean_y,
+            mean_r,
+            mean_theta,
+            mean_heading,
+            mean_spd,
+        ) = particles_mean_belief(particles)
+
+        r_error = np.mean(np.abs(target_r - particles[:, 0]))
+        theta_error = np.mean(np.abs(angle_diff(target[1] - particles[:, 1])))
+        heading_diff = np.abs(np.mean(target_heading - particles[:, 2])) % 360
+        heading_error = heading_diff if heading_diff <= 180 else 360 - heading_diff
+
+        # centroid euclidean distance error x,y
+        centroid_distance_error = np.sqrt(
+            (mean_x - target_x) ** 2 + (mean_y - target_y) ** 2
+        )
+
+        mae = np.mean(
+            np.sqrt((particles_x - target_x) ** 2 + (particles_y - target_y) ** 2)
+        )
+
+        # root mean square error
+        rmse = np.sqrt(
+            np.mean((particles_x - target_x) ** 2 + (particles_y - target_y) ** 2)
+        )
+
+        results.append(
+            [r_error, theta_error, heading_error, centroid_distance_error, rmse, mae]
+        )
+    results = np.array(results).T
+
+    if len(results) > 5:
+        r_error = results[0]
+        theta_error = results[1]
+        heading_error = results[2]
+        centroid_distance_error = results[3]
+        rmse = results[4]
+        mae = results[5]
+
+    return r_error, theta_error, heading_error, centroid_distance_error, rmse, mae
+
+
+def tracking_metrics_separable(all_targets, all_particles):
+    """
+    Calculate different tracking metrics
+    """
+    results = []
+    r_error = None
+    theta_error = None
+    heading_error = None
+    centroid_distance_error = None
+    rmse = None
+    mae = None
+    n_targets, n_particles, n_states = all_particles.shape
+
+    for t in range(n_targets):
+        target = all_targets[t]
+        particles = all_particles[t]
+
+        target_r = target[0]
+        target_theta = np.radians(target[1])
+        target_heading = target[2]
+        target_x, target_y = pol2cart(target_r, target_theta)
+
+        (
+            particles_x,
+            particles_y,
+            mean_x,
+            mean_y,
+            mean_r,
+            mean_theta,
+            mean_heading,
+            mean_spd,
+        ) = particles_mean_belief(particles)
+
+        r_error = np.mean(np.abs(target_r - particles[:, 0]))
+        theta_error = np.mean(np.abs(angle_diff(target[1] - particles[:, 1])))
+        heading_diff = np.abs(np.mean(target_heading - particles[:, 2])) % 360
+        heading_error = heading_diff if heading_diff <= 180 else 360 - heading_diff
+
+        # centroid euclidean distance error x,y
+        centroid_distance_error = np.sqrt(
+            (mean_x - target_x) ** 2 + (mean_y - target_y) ** 2
+        )
+
+        mae = np.mean(
+            np.sqrt((particles_x - target_x) ** 2 + (particles_y - target_y) ** 2)
+        )
+
+        # root mean square error
+        rmse = np.sqrt(
+            np.mean((particles_x - target_x) ** 2 + (particles_y - target_y) ** 2)
+        )
+
+        results.append(
+            [r_error, theta_error, heading_error, centroid_distance_error, rmse, mae]
+        )
+    results = np.array(results).T
+
+    r_error = results[0]
+    theta_error = results[1]
+    heading_error = results[2]
+    centroid_distance_error = results[3]
+    rmse = results[4]
+    mae = results[5]
+
+    return r_error, theta_error, heading_error, centroid_distance_error, rmse, mae
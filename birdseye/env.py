@@ -1,28 +1,87 @@
 import numpy as np
-import random
-from pfilter import ParticleFilter
-from pfilter import systematic_resample
-from scipy.ndimage import gaussian_filter
-from timeit import default_timer as timer
+
+from .grid_filter import GridFilter
+from .particle_filter import RESAMPLE_METHODS
+from .particle_filter import ParticleFilter
+from .particle_filter import systematic_resample
 
 # from .pfrnn.pfrnn import pfrnn
-from .utils import particle_swap
-from .utils import particles_mean_belief
-from .utils import pol2cart
+from .core import particle_swap
+from .core import cart2pol
+from .core import particles_mean_belief
+from .core import pol2cart
+from .instrument import timed
+from .lazy import lazy_import
+
+ndimage = lazy_import("scipy.ndimage")
+
+BELIEF_FRAMES = ["sensor", "world"]
+BELIEF_BACKENDS = ["particles", "grid"]
+
 
+def weighted_std(values, weights, axis=None):
+    """Standard deviation of values weighted by the particle weights"""
+    mean = np.average(values, axis=axis, weights=weights)
+    if axis is not None:
+        mean = np.expand_dims(mean, axis)
+    return np.sqrt(np.average((values - mean) ** 2, axis=axis, weights=weights))
+
+
+class AbsoluteCache:
+    """Absolute particles of particle filters, recomputed only after the
+    filter is updated, its particles are replaced or the sensor moves
+
+    The cached arrays are read only, they are shared by every caller until
+    the next update.
+    """
 
-def pffilter_copy(pf, n_downsample=None):
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key, pf, sensor_state, transform):
+        """Cached transform(pf.particles)
+
+        Parameters
+        ----------
+        key : hashable
+            Cache entry, e.g. the target index
+        pf : ParticleFilter
+            Filter whose particles are transformed
+        sensor_state : array_like
+            Sensor state the transform depends on
+        transform : callable
+            Function of the particles returning their absolute states
+        """
+        stamp = (pf.version, tuple(np.ravel(sensor_state)))
+        entry = self.entries.get(key, None)
+        if (
+            entry is not None
+            and entry[0] is pf
+            and entry[1] is pf.particles
+            and entry[2] == stamp
+        ):
+            return entry[3]
+        absolute = transform(pf.particles)
+        absolute.flags.writeable = False
+        self.entries[key] = (pf, pf.particles, stamp, absolute)
+        return absolute
+
+
+def pffilter_copy(pf, n_downsample=None, rng=None):
     """Modified from https://github.com/johnhw/pfilter/blob/master/pfilter/pfilter.py, because missing noise_fn
     Copy this filter at its current state. Returns
     an exact copy, that can be run forward indepedently of the first.
     Beware that if your passed in functions (e.g. dynamics) are stateful, behaviour
     might not be independent! (tip: write stateless functions!)
+    The copy draws from rng, or shares the generator of pf if rng is None.
     Returns:
     ---------
         A new, independent copy of this filter.
     """
+    rng = rng if rng is not None else pf.rng
     # construct the filter
     new_copy = ParticleFilter(
+        rng=rng,
         observe_fn=pf.observe_fn,
         resample_fn=pf.resample_fn,
         n_particles=pf.n_particles,
@@ -30,6 +89,7 @@ def pffilter_copy(pf, n_downsample=None):
         dynamics_fn=pf.dynamics_fn,
         noise_fn=pf.noise_fn,
         weight_fn=pf.weight_fn,
+        log_weight_fn=pf.log_weight_fn,
         resample_proportion=pf.resample_proportion,
         column_names=pf.column_names,
         internal_weight_fn=pf.internal_weight_fn,
@@ -59,7 +119,7 @@ def pffilter_copy(pf, n_downsample=None):
         new_copy.n_particles = n_downsample
         new_copy.weights = np.ones(n_downsample) / n_downsample
         new_copy.particles = new_copy.particles[
-            np.random.randint(len(new_copy.particles), size=n_downsample)
+            rng.integers(len(new_copy.particles), size=n_downsample)
         ]
     return new_copy
 
@@ -73,7 +133,16 @@ class RFMultiSeparableEnv:
         simulated=True,
         num_particles=2000,
         resample_proportion=0.1,
+        rng=None,
+        belief_frame="sensor",
+        belief_backend="particles",
+        grid_cell_size=2.0,
+        grid_width=None,
+        resample_method="systematic",
+        n_eff_threshold=1.0,
     ):
+        # Random number generator shared by the particle filters
+        self.rng = rng if rng is not None else np.random.default_rng()
         # Sensor definitions
         self.sensor = sensor
         # Action space and function to convert from action to index and vice versa
@@ -84,13 +153,41 @@ class RFMultiSeparableEnv:
         self.simulated = simulated
         self.n_particles = num_particles
         self.resample_proportion = resample_proportion
+        # Frame of the particles: "sensor" keeps (range, bearing, relative
+        # course, speed) relative to the sensor, "world" keeps (x, y, course,
+        # speed) in meters from the origin of the sensor state (the first GPS
+        # fix), so sensor motion only moves the sensor pose
+        if belief_frame not in BELIEF_FRAMES:
+            raise ValueError(f"belief_frame must be one of {BELIEF_FRAMES}")
+        if belief_frame == "world" and simulated:
+            raise ValueError("the world belief frame is only supported on real data")
+        self.belief_frame = belief_frame
+        # "particles" or "grid", a histogram filter of grid_cell_size meter
+        # cells over grid_width meters (by default twice the particle
+        # distance) around the sensor, see birdseye.grid_filter
+        if belief_backend not in BELIEF_BACKENDS:
+            raise ValueError(f"belief_backend must be one of {BELIEF_BACKENDS}")
+        self.belief_backend = belief_backend
+        self.grid_cell_size = float(grid_cell_size)
+        self.grid_width = grid_width
+        # resampling of the particle filters, see RESAMPLE_METHODS. They
+        # resample once the effective sample size (a fraction of the
+        # particles) drops below n_eff_threshold, 1 resamples every update
+        if resample_method not in RESAMPLE_METHODS:
+            raise ValueError(
+                f"resample_method must be one of {list(RESAMPLE_METHODS)}"
+            )
+        self.resample_method = resample_method
+        self.n_eff_threshold = float(n_eff_threshold)
 
         # self.pfrnn = pfrnn()
 
         self.last_observation = None
         self.pf = None
         self.iters = 0
+        self.absolute_cache = AbsoluteCache()
 
+    @timed("env.dynamics")
     def dynamics(
         self,
         particles,
@@ -107,9 +204,12 @@ class RFMultiSeparableEnv:
         array_like
             Updated particle state information
         """
-        start = timer()
         n_particles, n_states = particles.shape
 
+        if self.belief_frame == "world":
+            # only the targets move, the sensor motion is in its pose
+            return self.state.update_world_states(particles)
+
         updated_particles = []
         if not self.simulated:
             for p in range(n_particles):
@@ -131,12 +231,10 @@ class RFMultiSeparableEnv:
         #     print(f"{updated_particles=}")
         #     print(f"{updated_particles2=}")
         #     print(updated_particles==updated_particles2)
-        end = timer()
-        # print(f"dynamics: {end-start}")
         return np.array(updated_particles)
 
+    @timed("env.particle_noise")
     def particle_noise(self, particles, sigmas=[1, 2, 2], xp=None):
-        start = timer()
         n_particles, n_states = particles.shape
         # debug: assert n_states == self.state.state_dim
 
@@ -144,21 +242,24 @@ class RFMultiSeparableEnv:
         # particles[:,0] = np.clip(particles[:,0], a_min=1, a_max=None)
         # particles[:,1] += np.random.normal(0, sigmas[1], (n_particles))
         # particles[:,2] += np.random.normal(0, sigmas[2], (n_particles))
-        particles[:, [0, 1, 2]] += np.random.normal([0, 0, 0], sigmas, (n_particles, 3))
-        particles[:, 0] = np.clip(particles[:, 0], a_min=1, a_max=None)
-        end = timer()
-        # print(f"noise = {end-start}")
+        particles[:, [0, 1, 2]] += self.rng.normal([0, 0, 0], sigmas, (n_particles, 3))
+        if self.belief_frame == "world":
+            particles[:, 2] %= 360
+        else:
+            particles[:, 0] = np.clip(particles[:, 0], a_min=1, a_max=None)
         return particles
 
-    def reset(
-        self,
-    ):
+    def reset(self, belief=None, target_positions=None):
         """Reset initial state and particle filter
 
         Parameters
         ----------
-        num_particles : integer
-            Number of particles to build particle filter
+        belief : array_like, optional
+            Particles of shape (n_targets, n, 4) from a previous run, used to
+            shape the initial belief of each target
+        target_positions : list, optional
+            Per target (distance, bearing) relative to the sensor, or None,
+            used to center the initial belief on a known target position
 
         Returns
         -------
@@ -171,47 +272,258 @@ class RFMultiSeparableEnv:
             self.state.target_state = self.state.init_target_state()
         self.state.sensor_state = self.state.init_sensor_state()
 
+        if self.belief_frame == "world":
+
+            def prior_fn(n):
+                return self.state.world_states(self.state.random_particle_states(n))
+
+            # x and y in meters, about the spread of the sensor frame noise
+            # at the typical target range
+            noise_sigmas = [2, 2, 2]
+            column_names = ["x", "y", "course", "own_speed"]
+        else:
+            prior_fn = self.state.random_particle_states
+            noise_sigmas = [1, 2, 2]
+            column_names = ["range", "heading", "relative_course", "own_speed"]
+
         self.pf = []
         for t in range(self.state.n_targets):
-            target_pf = ParticleFilter(
-                prior_fn=lambda n: np.array(
-                    [self.state.random_particle_state() for _ in range(n)]
-                ),
-                # observe_fn=lambda states, **kwargs: np.array(
-                #     [
-                #         self.sensor.observation(
-                #             x,
-                #             t,
-                #             fading_sigma=0
-                #         )
-                #         for x in states
-                #     ]
-                # ),
-                observe_fn=lambda states, **kwargs: np.array(
-                    self.sensor.observation_vectorized(states, t)
-                ),
-                n_particles=self.n_particles,
-                dynamics_fn=self.dynamics,
-                resample_proportion=self.resample_proportion,  # 0.1,  # 0.005,
-                noise_fn=lambda x, **kwargs: self.particle_noise(x, sigmas=[1, 2, 2]),
-                weight_fn=lambda hyp, o, xp=None, **kwargs: self.sensor.weight(hyp, o),
-                resample_fn=systematic_resample,
-                n_eff_threshold=1,
-                column_names=["range", "heading", "relative_course", "own_speed"],
-            )
+            if self.belief_backend == "grid":
+                target_pf = self.grid_filter(t)
+            else:
+                target_pf = ParticleFilter(
+                    rng=self.rng,
+                    prior_fn=prior_fn,
+                    # observe_fn=lambda states, **kwargs: np.array(
+                    #     [
+                    #         self.sensor.observation(
+                    #             x,
+                    #             t,
+                    #             fading_sigma=0
+                    #         )
+                    #         for x in states
+                    #     ]
+                    # ),
+                    # bind t now, a late bound t made every filter use the last
+                    # target's transmitter parameters
+                    observe_fn=lambda states, t=t, sensor_poses=None, **kwargs: (
+                        self.observe(states, t, sensor_poses=sensor_poses)
+                    ),
+                    n_particles=self.n_particles,
+                    dynamics_fn=self.dynamics,
+                    resample_proportion=self.resample_proportion,  # 0.1,  # 0.005,
+                    noise_fn=lambda x, **kwargs: self.particle_noise(
+                        x, sigmas=noise_sigmas
+                    ),
+                    weight_fn=lambda hyp, o, xp=None, **kwargs: self.sensor.weight(
+                        hyp, o
+                    ),
+                    log_weight_fn=lambda hyp, o, xp=None, **kwargs: (
+                        self.sensor.log_weight(hyp, o)
+                    ),
+                    resample_fn=RESAMPLE_METHODS[self.resample_method],
+                    n_eff_threshold=self.n_eff_threshold,
+                    column_names=column_names,
+                )
             self.pf.append(target_pf)
 
+            if target_positions is not None and target_positions[t] is not None:
+                self.reseed_target(
+                    t,
+                    self.state.gps_particle_states(
+                        self.n_particles, *target_positions[t]
+                    ),
+                )
+            elif belief is not None:
+                self.reseed_target(
+                    t, self.state.belief_particle_states(self.n_particles, belief[t])
+                )
+
+    def grid_filter(self, target):
+        """Histogram filter of a target, the grid belief backend
+
+        Parameters
+        ----------
+        target : integer
+            Index of the target
+
+        Returns
+        -------
+        GridFilter
+            Filter whose particles are a sample in the belief frame
+        """
+
+        def to_states(states):
+            if self.belief_frame == "world":
+                return states
+            return self.state.relative_states(states)
+
+        particle_distance = self.state.particle_distance
+        return GridFilter(
+            # noise free expected RSSI, fading is in the likelihood
+            observe_fn=lambda x, y, sensor_poses=None: self.observe_positions(
+                x, y, target, sensor_poses, fading_sigma=0
+            ),
+            weight_fn=self.sensor.weight,
+            log_weight_fn=self.sensor.log_weight,
+            pose_fn=self.state.sensor_pose,
+            to_states=to_states,
+            width=self.grid_width or 2 * particle_distance,
+            cell_size=self.grid_cell_size,
+            motion_sigma=max(self.state.target_speed, self.grid_cell_size / 2),
+            prior_radius=particle_distance,
+            n_particles=self.n_particles,
+            speed=self.state.target_speed,
+            rng=self.rng,
+        )
+
+    def reseed_target(self, target, particles):
+        """Replace the belief of a single target with the given particles
+
+        Parameters
+        ----------
+        target : integer
+            Index of the target
+        particles : array_like
+            Particles of shape (n_particles, 4) relative to the sensor
+        """
+        target_pf = self.pf[target]
+        if self.belief_backend == "grid":
+            target_pf.reseed(self.state.world_states(particles))
+            return
+        if self.belief_frame == "world":
+            particles = self.state.world_states(particles)
+        target_pf.version += 1
+        target_pf.particles = np.array(particles, dtype=float)
+        target_pf.original_particles = np.array(target_pf.particles)
+        target_pf.weights = np.ones(target_pf.n_particles) / target_pf.n_particles
+
     def pf_copy(self, n_downsample=None):
         return [pffilter_copy(pf, n_downsample=n_downsample) for pf in self.pf]
 
     def random_state(self, pf):
         state = [
-            pf[i].particles[np.random.choice(pf[i].particles.shape[0], 1, False)][0]
+            pf[i].particles[self.rng.integers(pf[i].particles.shape[0])]
             for i in range(self.state.n_targets)
         ]
         return state
 
+    def observe(self, states, target, sensor_poses=None):
+        """Expected RSSI of particle states, from one or several sensors
+
+        Parameters
+        ----------
+        states : array_like
+            Particle states in the belief frame, shape (n_particles, 4)
+        target : int
+            Target index
+        sensor_poses : array_like, optional
+            (x, y, heading) of the sensor of each reading, shape (n_obs, 3),
+            with x and y in meters from the sensor. By default every reading
+            is from the sensor.
+
+        Returns
+        -------
+        array_like
+            Expected RSSI of shape (n_particles), or (n_particles, n_obs)
+            with sensor_poses
+        """
+        if self.belief_frame == "world":
+            return self.observe_positions(
+                states[:, 0], states[:, 1], target, sensor_poses
+            )
+        if sensor_poses is None:
+            return np.array(self.sensor.observation_vectorized(states, target))
+        x, y = pol2cart(
+            states[:, 0], np.radians(states[:, 1] + self.state.sensor_state[2])
+        )
+        x_s, y_s, _ = self.state.sensor_pose()
+        return self.observe_positions(x + x_s, y + y_s, target, sensor_poses)
+
+    def observe_positions(self, x, y, target, sensor_poses=None, fading_sigma=None):
+        """Expected RSSI of target positions in the world frame
+
+        Parameters
+        ----------
+        x, y : array_like
+            Target positions in meters from the origin of the sensor state,
+            shape (n)
+        target : int
+            Target index
+        sensor_poses : array_like, optional
+            See observe
+        fading_sigma : float, optional
+            Fading of the expected RSSI, by default that of the sensor
+
+        Returns
+        -------
+        array_like
+            Expected RSSI of shape (n), or (n, n_obs) with sensor_poses
+        """
+        x_s, y_s, heading = self.state.sensor_pose()
+        single = sensor_poses is None
+        if single:
+            sensor_poses = [(0, 0, heading)]
+
+        # range and bearing of every position from every distinct sensor,
+        # computed in one pass of shape (n_sensors, n)
+        poses, reading_sensor = np.unique(sensor_poses, axis=0, return_inverse=True)
+        dx = x[None, :] - (x_s + poses[:, 0, None])
+        dy = y[None, :] - (y_s + poses[:, 1, None])
+        # rounded so round trips of whole degree bearings index the same
+        # radiation pattern entry
+        bearing = np.round(np.degrees(np.arctan2(dy, dx)) - poses[:, 2, None], 9)
+        sensor_states = np.stack(
+            (np.sqrt(dx**2 + dy**2), bearing % 360), axis=-1
+        ).reshape(-1, 2)
+        rssi = np.reshape(
+            self.sensor.observation_vectorized(
+                sensor_states, target, fading_sigma=fading_sigma
+            ),
+            (len(poses), -1),
+        )
+        if single:
+            return rssi[0]
+        return rssi[np.ravel(reading_sensor)].T
+
+    def fuse_readings(self, observation, fused, target):
+        """Readings of a target from the reference and the fused sensors
+
+        Parameters
+        ----------
+        observation : float or list or None
+            Reading(s) of the reference sensor
+        fused : list of dict
+            "offset" (x, y) in meters, "heading" and per target "rssi" of
+            the other sensors
+        target : int
+            Target index
+
+        Returns
+        -------
+        readings : list or None
+            Every reading of the target, None if there is none
+        sensor_poses : array_like or None
+            (x, y, heading) of the sensor of each reading, see observe
+        """
+        readings = []
+        poses = []
+        sensors = [(observation, (0.0, 0.0, self.state.sensor_state[2]))] + [
+            (sensor["rssi"][target], (*sensor["offset"], sensor["heading"]))
+            for sensor in fused
+        ]
+        for obs, pose in sensors:
+            if obs is None:
+                continue
+            for value in np.atleast_1d(obs):
+                readings.append(float(value))
+                poses.append(pose)
+        if not readings:
+            return None, None
+        return readings, np.array(poses, dtype=float)
+
     # returns observation, reward, done, info
+    @timed("env.real_step")
     def real_step(self, data):
         # action = data['action_taken'] if data.get('action_taken', None) else (0,0)
 
@@ -234,18 +546,34 @@ class RFMultiSeparableEnv:
             # data.get("heading", None),
         )
 
-        # Get sensor observation
+        # Get sensor observation, a reading, a batch of readings or None per
+        # target
         observation = self.sensor.real_observation()
-        observation = np.array(observation)  # if observation is not None else None
+        if any(isinstance(obs, (list, tuple)) for obs in observation):
+            # batches of different lengths, every reading weights the
+            # particles in the single update of the step
+            batches = np.empty(len(observation), dtype=object)
+            for t, obs in enumerate(observation):
+                batches[t] = obs
+            observation = batches
+        else:
+            observation = np.array(observation)
+
+        # readings of other sensors fused into this belief, see fuse_readings
+        fused = data.get("fused_observations", None) or []
 
         # Update particle filter
         for t in range(self.state.n_targets):
+            observed, sensor_poses = observation[t], None
+            if fused:
+                observed, sensor_poses = self.fuse_readings(observed, fused, t)
             self.pf[t].update(
-                observation[t],
+                observed,
                 xp=self.pf[t].particles,
                 distance=distance,
                 course=course,
                 heading=heading,
+                sensor_poses=sensor_poses,
                 # distance=data.get("distance", None),
                 # course=data.get("course", None),
                 # heading=data.get("heading", None),
@@ -288,6 +616,7 @@ class RFMultiSeparableEnv:
         return False, updated_particles
 
     # returns observation, reward, done, info
+    @timed("env.step")
     def step(self, action):
         """Function to make step based on
            state variables and action index
@@ -419,32 +748,56 @@ class RFMultiSeparableEnv:
 
             # Build two-dim histogram distribution
             h, xedges, yedges = np.histogram2d(x, y, bins=(xedges, yedges))
-            h = gaussian_filter(h, sigma=8)
+            h = ndimage.gaussian_filter(h, sigma=8)
             heatmaps.append(h)
         heatmaps = np.array(heatmaps)
         return heatmaps
 
+    def world_absolute_states(self, particles):
+        x, y, crs, spd = np.moveaxis(particles, -1, 0)
+        r, theta = cart2pol(x, y)
+        return np.stack((r, np.degrees(theta) % 360, crs, spd), axis=-1)
+
     def get_absolute_particles(self):
+        if self.belief_frame == "world":
+            transform = self.world_absolute_states
+        else:
+            transform = self.state.get_absolute_states
         return np.array(
             [
-                [self.state.get_absolute_state(p) for p in self.pf[t].particles]
+                self.absolute_cache.get(
+                    t, self.pf[t], self.state.sensor_state, transform
+                )
                 for t in range(self.state.n_targets)
             ]
         )
 
     def get_absolute_target(self):
-        return np.array(
-            [self.state.get_absolute_state(state) for state in self.state.target_state]
-        )
+        return self.state.get_absolute_states(self.state.target_state)
+
+    def relative_particles(self, target):
+        """Particles of a target relative to the sensor, whatever the belief
+        frame, as used by the planners and the belief statistics"""
+        if self.belief_frame == "world":
+            return self.state.relative_states(self.pf[target].particles)
+        return self.pf[target].particles
 
     def get_particle_centroids(self, particles=None):
         centroids = []
         if particles is None:
             for t in range(self.state.n_targets):
+                relative = self.relative_particles(t)
                 particles_x, particles_y = pol2cart(
-                    self.pf[t].particles[:, 0], np.radians(self.pf[t].particles[:, 1])
+                    relative[:, 0], np.radians(relative[:, 1])
+                )
+                # weighted, the weights carry over when not resampled
+                weights = self.pf[t].weights
+                centroids.append(
+                    [
+                        np.average(particles_x, weights=weights),
+                        np.average(particles_y, weights=weights),
+                    ]
                 )
-                centroids.append([np.mean(particles_x), np.mean(particles_y)])
         else:
             n_targets, n_particles, n_states = particles.shape
 
@@ -460,10 +813,17 @@ class RFMultiSeparableEnv:
         std_dev = []
         if particles is None:
             for t in range(self.state.n_targets):
+                relative = self.relative_particles(t)
                 particles_x, particles_y = pol2cart(
-                    self.pf[t].particles[:, 0], np.radians(self.pf[t].particles[:, 1])
+                    relative[:, 0], np.radians(relative[:, 1])
+                )
+                weights = self.pf[t].weights
+                std_dev.append(
+                    [
+                        weighted_std(particles_x, weights),
+                        weighted_std(particles_y, weights),
+                    ]
                 )
-                std_dev.append([np.std(particles_x), np.std(particles_y)])
         else:
             n_targets, n_particles, n_states = particles.shape
             # debug: assert n_targets == self.state.n_targets
@@ -480,10 +840,12 @@ class RFMultiSeparableEnv:
         std_dev = []
         if particles is None:
             for t in range(self.state.n_targets):
+                relative = self.relative_particles(t)
+                weights = self.pf[t].weights
                 std_dev.append(
                     [
-                        np.std(self.pf[t].particles[:, 0]),
-                        np.std(self.pf[t].particles[:, 1]),
+                        weighted_std(relative[:, 0], weights),
+                        weighted_std(relative[:, 1], weights),
                     ]
                 )
         else:
@@ -496,11 +858,17 @@ class RFMultiSeparableEnv:
         return np.array(std_dev)
 
     def get_all_particles(self):
-        return np.array([self.pf[t].particles for t in range(self.state.n_targets)])
+        return np.array(
+            [self.relative_particles(t) for t in range(self.state.n_targets)]
+        )
 
 
 class RFMultiEnv:
-    def __init__(self, sensor=None, actions=None, state=None, simulated=True):
+    def __init__(
+        self, sensor=None, actions=None, state=None, simulated=True, rng=None
+    ):
+        # Random number generator of the particle filter and its noise
+        self.rng = rng if rng is not None else np.random.default_rng()
         # Sensor definitions
         self.sensor = sensor
         # Action space and function to convert from action to index and vice versa
@@ -515,6 +883,7 @@ class RFMultiEnv:
         self.last_observation = None
         self.pf = None
         self.iters = 0
+        self.absolute_cache = AbsoluteCache()
 
     def dynamics(
         self,
@@ -549,14 +918,35 @@ class RFMultiEnv:
             updated_particles.append(new_p)
         return np.array(updated_particles)
 
+    def observe(self, states, **kwargs):
+        """Expected observation of every joint particle state
+
+        Sensors in the quantized likelihood mode (rssi_table) observe all
+        the particles at once, the others one particle at a time
+        """
+        if getattr(self.sensor, "rssi_table", None) is not None:
+            return self.sensor.observation_vectorized(
+                np.reshape(states, (len(states), self.state.n_targets, 4)),
+                fading_sigma=0,
+            )
+        return np.array(
+            [
+                self.sensor.observation(
+                    [x[4 * t : 4 * (t + 1)] for t in range(self.state.n_targets)],
+                    fading_sigma=0,
+                )
+                for x in states
+            ]
+        )
+
     def particle_noise(self, particles, sigmas=[1, 2, 2], xp=None):
         for t in range(self.state.n_targets):
-            particles[:, [4 * t]] += np.random.normal(0, sigmas[0], (len(particles), 1))
+            particles[:, [4 * t]] += self.rng.normal(0, sigmas[0], (len(particles), 1))
             particles[:, [4 * t]] = np.clip(particles[:, [4 * t]], a_min=1, a_max=None)
-            particles[:, [(4 * t) + 1]] += np.random.normal(
+            particles[:, [(4 * t) + 1]] += self.rng.normal(
                 0, sigmas[1], (len(particles), 1)
             )
-            particles[:, [(4 * t) + 2]] += np.random.normal(
+            particles[:, [(4 * t) + 2]] += self.rng.normal(
                 0, sigmas[2], (len(particles), 1)
             )
 
@@ -571,7 +961,7 @@ class RFMultiEnv:
         return [pffilter_copy(self.pf, n_downsample=n_downsample)]
 
     def random_state(self, pf):
-        return [random.choice(self.pf.particles)]
+        return [self.pf.particles[self.rng.integers(len(self.pf.particles))]]
 
     def reset(self, num_particles=2000):
         """Reset initial state and particle filter
@@ -594,21 +984,9 @@ class RFMultiEnv:
 
         # Setup particle filter
         self.pf = ParticleFilter(
-            prior_fn=lambda n: np.array(
-                [
-                    np.array(self.state.init_particle_state()).reshape(-1)
-                    for i in range(n)
-                ]
-            ),
-            observe_fn=lambda states, **kwargs: np.array(
-                [
-                    self.sensor.observation(
-                        [x[4 * t : 4 * (t + 1)] for t in range(self.state.n_targets)],
-                        fading_sigma=0,
-                    )
-                    for x in states
-                ]
-            ),
+            rng=self.rng,
+            prior_fn=self.state.init_particle_states,
+            observe_fn=self.observe,
             n_particles=num_particles,
             dynamics_fn=self.dynamics,
             resample_proportion=0.005,  # 0.005,
@@ -617,6 +995,12 @@ class RFMultiEnv:
             #            gaussian_noise(x, sigmas=[0.2, 0.2, 0.1, 0.05, 0.05]),
             # [self.sensor.weight(None, o, state=x) for x in xp],
             weight_fn=lambda hyp, o, xp=None, **kwargs: self.sensor.weight(hyp, o),
+            # sensors with log likelihoods are weighted in the log domain
+            log_weight_fn=(
+                (lambda hyp, o, xp=None, **kwargs: self.sensor.log_weight(hyp, o))
+                if hasattr(self.sensor, "log_weight")
+                else None
+            ),
             resample_fn=systematic_resample,
             n_eff_threshold=1,
             column_names=["range", "heading", "relative_course", "own_speed"],
@@ -842,26 +1226,24 @@ class RFMultiEnv:
 
             # Build two-dim histogram distribution
             h, xedges, yedges = np.histogram2d(x, y, bins=(xedges, yedges))
-            h = gaussian_filter(h, sigma=8)
+            h = ndimage.gaussian_filter(h, sigma=8)
             heatmaps.append(h)
         heatmaps = np.array(heatmaps)
         return heatmaps
 
     def get_absolute_particles(self):
-        return np.array(
-            [
-                [
-                    self.state.get_absolute_state(x[4 * t : 4 * (t + 1)])
-                    for t in range(self.state.n_targets)
-                ]
-                for x in self.pf.particles
-            ]
+        # joint particles of shape (n, 4 * n_targets) -> (n, n_targets, 4)
+        return self.absolute_cache.get(
+            0,
+            self.pf,
+            self.state.sensor_state,
+            lambda particles: self.state.get_absolute_states(
+                particles.reshape(len(particles), self.state.n_targets, 4)
+            ),
         )
 
     def get_absolute_target(self):
-        return np.array(
-            [self.state.get_absolute_state(state) for state in self.state.target_state]
-        )
+        return self.state.get_absolute_states(self.state.target_state)
 
     def get_particle_centroids(self, particles=None):
         if particles is None:
@@ -916,6 +1298,7 @@ class RFEnv:
 
         # self.pfrnn = pfrnn()
         self.pf = None
+        self.absolute_cache = AbsoluteCache()
 
     def dynamics(self, particles, control=None, **kwargs):
         """Helper function for particle filter dynamics
@@ -947,7 +1330,7 @@ class RFEnv:
 
         # Setup particle filter
         self.pf = ParticleFilter(
-            prior_fn=lambda n: np.array([self.state.random_state() for i in range(n)]),
+            prior_fn=self.state.random_states,
             observe_fn=lambda states, **kwargs: np.array(
                 [np.array(self.sensor.observation(x)) for x in states]
             ),
@@ -1080,7 +1463,9 @@ class RFEnv:
         return heatmap
 
     def get_absolute_particles(self):
-        return np.array([self.state.get_absolute_state(t) for t in self.pf.particles])
+        return self.absolute_cache.get(
+            0, self.pf, self.state.sensor_state, self.state.get_absolute_states
+        )
 
     def get_absolute_target(self):
         return self.state.get_absolute_state(self.state.target_state)
@@ -0,0 +1,113 @@
+"""
+Factories of the separable sensor and env shared by the tests, the
+microbenchmarks and the benchmark scripts
+"""
+import numpy as np
+
+from .actions import BaselineActions
+from .env import RFMultiSeparableEnv
+from .rng import RNGContext
+from .sensor import SingleRSSISeparable
+from .state import RFMultiState
+
+
+def component_rngs(rng):
+    """
+    Sensor, state and filter generators of an RNGContext, or the same
+    generator (or None) for all three
+    """
+    if isinstance(rng, RNGContext):
+        return rng.sensor, rng.state, rng.filter
+    return rng, rng, rng
+
+
+def per_target(value, n_targets):
+    """List of one value per target, scalars are repeated"""
+    if np.ndim(value) == 0:
+        return [value] * n_targets
+    return list(value)
+
+
+def build_sensor(
+    n_targets=1,
+    fading_sigma=8,
+    rng=None,
+    sensor_class=SingleRSSISeparable,
+    antenna_filename="radiation_pattern_yagi_5.csv",
+    power_tx=26,
+    directivity_tx=1,
+    freq=5.7e9,
+    **kwargs,
+):
+    """
+    Sensor with the bundled yagi radiation pattern and identical targets by
+    default, kwargs are passed to sensor_class
+
+    Parameters
+    ----------
+    rng : RNGContext or numpy.random.Generator or None
+        The sensor generator of an RNGContext is used
+    power_tx, directivity_tx, freq : float or list of float
+        Transmitter parameters, a scalar is used for every target
+    """
+    return sensor_class(
+        antenna_filename=antenna_filename,
+        power_tx=per_target(power_tx, n_targets),
+        directivity_tx=per_target(directivity_tx, n_targets),
+        freq=per_target(freq, n_targets),
+        n_targets=n_targets,
+        fading_sigma=fading_sigma,
+        rng=component_rngs(rng)[0],
+        **kwargs,
+    )
+
+
+def build_env(
+    n_targets=1,
+    rng=None,
+    sensor=None,
+    actions=None,
+    fading_sigma=8,
+    simulated=True,
+    num_particles=200,
+    state_kwargs=None,
+    reset=True,
+    **kwargs,
+):
+    """
+    Separable env, kwargs are passed to RFMultiSeparableEnv
+
+    Parameters
+    ----------
+    rng : RNGContext or numpy.random.Generator or None
+        Either one generator per component or one generator shared by all
+    sensor : Sensor, optional
+        Defaults to build_sensor(n_targets, fading_sigma, rng)
+    actions : Actions, optional
+        Defaults to BaselineActions()
+    state_kwargs : dict, optional
+        Extra RFMultiState arguments
+    reset : bool
+        Whether to draw the particle prior (env.reset)
+    """
+    if sensor is None:
+        sensor = build_sensor(n_targets, fading_sigma, rng)
+    _, state_rng, filter_rng = component_rngs(rng)
+    state = RFMultiState(
+        n_targets=n_targets,
+        simulated=simulated,
+        rng=state_rng,
+        **(state_kwargs or {}),
+    )
+    env = RFMultiSeparableEnv(
+        sensor=sensor,
+        actions=actions if actions is not None else BaselineActions(),
+        state=state,
+        simulated=simulated,
+        num_particles=num_particles,
+        rng=filter_rng,
+        **kwargs,
+    )
+    if reset:
+        env.reset()
+    return env
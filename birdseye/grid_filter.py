@@ -0,0 +1,311 @@
+"""
+Histogram (grid) filter, an alternative to the particle filter for large
+search areas
+
+The belief of a target is a log probability grid of fixed resolution over
+its position, in meters east/north of the origin of the sensor state. The
+grid starts centered on the origin and follows the sensor: it is shifted by
+whole cells onto the sensor once the sensor leaves the central half of the
+grid, and onto the states of a reseed that all fall outside it. Every
+update convolves the belief with a motion kernel and adds the log likelihood
+of the readings. The expected RSSI image of the grid only depends on the
+sensor pose, so it is cached and a static sensor computes it once.
+
+GridFilter has the parts of the ParticleFilter interface used by
+RFMultiSeparableEnv and geolocate: update(), particles (a sample of the grid
+in the belief frame of the env), weights, n_particles, n_eff,
+weight_entropy, version and the resample counters (always 0, the sample
+is redrawn from the belief every update).
+"""
+import logging
+
+import numpy as np
+
+from .instrument import timed
+from .lazy import lazy_import
+
+ndimage = lazy_import("scipy.ndimage")
+
+# log of the smallest probability kept, so empty cells can recover
+LOG_TINY = np.log(np.finfo(float).tiny)
+
+
+def motion_kernel(cell_size, sigma):
+    """Normalized 2D Gaussian kernel of a random walk of sigma meters per step
+
+    Parameters
+    ----------
+    cell_size : float
+        Grid resolution (m)
+    sigma : float
+        Standard deviation of the target motion in one step (m)
+
+    Returns
+    -------
+    array_like
+        Kernel of odd shape (k, k), at least (3, 3)
+    """
+    sigma_cells = max(sigma / cell_size, 1e-3)
+    radius = max(1, int(np.ceil(3 * sigma_cells)))
+    offsets = np.arange(-radius, radius + 1)
+    squared = offsets[:, None] ** 2 + offsets[None, :] ** 2
+    kernel = np.exp(-squared / (2 * sigma_cells**2))
+    return kernel / np.sum(kernel)
+
+
+class GridFilter:
+    """
+    Histogram filter over a square grid of target positions
+
+    Parameters
+    ----------
+    observe_fn : callable
+        observe_fn(x, y, sensor_poses=None) expected RSSI of positions in
+        meters, shape (n) or (n, n_obs), see RFMultiSeparableEnv.observe
+    weight_fn : callable
+        weight_fn(hypotheses, observed) likelihood of the readings, with
+        hypotheses of shape (n, n_obs) and observed of shape (1, n_obs)
+    log_weight_fn : callable, optional
+        Log likelihood of the readings with the arguments of weight_fn,
+        used instead of weight_fn when given
+    pose_fn : callable
+        Current (x, y, heading) of the sensor, the key of the cached
+        expected RSSI image
+    to_states : callable
+        Converts (x, y, course, speed) states to the belief frame of the
+        particles
+    width : float
+        Side of the grid (m), centered on the origin and then re-centered
+        on the sensor, see recenter
+    cell_size : float
+        Grid resolution (m)
+    motion_sigma : float
+        Standard deviation of the target motion in one step (m)
+    prior_radius : float, optional
+        Radius (m) of the uniform prior around the sensor, by default the
+        whole grid
+    n_particles : int
+        Size of the sample exposed as particles
+    speed : float
+        Speed of the sampled states
+    rng : numpy.random.Generator
+        Random number generator of the samples
+    """
+
+    def __init__(
+        self,
+        observe_fn,
+        weight_fn,
+        pose_fn,
+        to_states,
+        log_weight_fn=None,
+        width=400,
+        cell_size=2.0,
+        motion_sigma=1.0,
+        prior_radius=None,
+        n_particles=2000,
+        speed=1.0,
+        rng=None,
+    ):
+        self.observe_fn = observe_fn
+        self.weight_fn = weight_fn
+        self.log_weight_fn = log_weight_fn
+        self.pose_fn = pose_fn
+        self.to_states = to_states
+        self.cell_size = float(cell_size)
+        self.n_cells = int(np.ceil(width / self.cell_size))
+        self.width = self.n_cells * self.cell_size
+        # edges of the cells relative to the center of the grid
+        self.offsets = np.linspace(-self.width / 2, self.width / 2, self.n_cells + 1)
+        self.center = np.zeros(2)
+        self.place_grid()
+        self.kernel = motion_kernel(self.cell_size, motion_sigma)
+        self.n_particles = n_particles
+        self.speed = speed
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.version = 0
+        self.resampled = False
+        self.resample_count = 0
+        self.expected_key = None
+        self.expected = None
+        self.init_filter(prior_radius)
+
+    def place_grid(self):
+        """Edges and cell centers of the grid around self.center"""
+        self.edges_x = self.center[0] + self.offsets
+        self.edges_y = self.center[1] + self.offsets
+        # grid[i, j] is the cell of x = x[i, j], y = y[i, j], the layout of
+        # np.histogram2d(x, y)
+        self.x, self.y = np.meshgrid(
+            (self.edges_x[:-1] + self.edges_x[1:]) / 2,
+            (self.edges_y[:-1] + self.edges_y[1:]) / 2,
+            indexing="ij",
+        )
+        # the expected RSSI image is of the cells, not only of the pose
+        self.expected_key = None
+
+    def recenter(self, x, y):
+        """Shift the grid by whole cells to center it on (x, y)
+
+        The belief of the cells still on the grid is kept, the new cells
+        start at the smallest probability.
+
+        Parameters
+        ----------
+        x, y : float
+            New center (m)
+
+        Returns
+        -------
+        bool
+            Whether the grid moved
+        """
+        shift = np.rint((np.array([x, y]) - self.center) / self.cell_size).astype(int)
+        if not np.any(shift):
+            return False
+        n = self.n_cells
+        shifted = np.full(self.log_belief.shape, LOG_TINY)
+        if np.all(np.abs(shift) < n):
+            # new cell i is old cell i + shift
+            new = tuple(slice(max(-d, 0), n - max(d, 0)) for d in shift)
+            old = tuple(slice(max(d, 0), n + min(d, 0)) for d in shift)
+            shifted[new] = self.log_belief[old]
+        self.log_belief = shifted
+        self.center = self.center + shift * self.cell_size
+        self.place_grid()
+        self.normalize()
+        return True
+
+    def follow_sensor(self):
+        """Re-center the grid on the sensor once it leaves the central half"""
+        x_s, y_s, _ = self.pose_fn()
+        if np.max(np.abs(np.array([x_s, y_s]) - self.center)) > self.width / 4:
+            self.recenter(x_s, y_s)
+
+    def histogram(self, states):
+        """Counts of the (x, y, ...) states in every cell"""
+        counts, _, _ = np.histogram2d(
+            states[:, 0], states[:, 1], bins=(self.edges_x, self.edges_y)
+        )
+        return counts
+
+    def init_filter(self, prior_radius=None):
+        """Uniform belief over the cells within prior_radius of the sensor"""
+        self.log_belief = np.zeros(self.x.shape)
+        if prior_radius is not None:
+            x_s, y_s, _ = self.pose_fn()
+            outside = np.hypot(self.x - x_s, self.y - y_s) > prior_radius
+            if not np.all(outside):
+                self.log_belief[outside] = LOG_TINY
+        self.normalize()
+        self.sample()
+
+    @property
+    def belief(self):
+        """Probability of every cell, shape (n_cells, n_cells)"""
+        return np.exp(self.log_belief)
+
+    def normalize(self):
+        top = np.max(self.log_belief)
+        self.log_belief -= top + np.log(np.sum(np.exp(self.log_belief - top)))
+        np.maximum(self.log_belief, LOG_TINY, out=self.log_belief)
+
+    def predict(self):
+        """Convolve the belief with the motion kernel"""
+        belief = ndimage.convolve(self.belief, self.kernel, mode="constant")
+        self.log_belief = np.log(np.maximum(belief, np.finfo(float).tiny))
+
+    def expected_rssi(self, sensor_poses=None):
+        """Expected RSSI image of the grid, shape (n_cells**2, n_obs)"""
+        key = (
+            tuple(np.ravel(self.pose_fn())),
+            None if sensor_poses is None else np.asarray(sensor_poses).tobytes(),
+        )
+        if key != self.expected_key:
+            expected = self.observe_fn(
+                self.x.ravel(), self.y.ravel(), sensor_poses=sensor_poses
+            )
+            self.expected = np.reshape(expected, (self.x.size, -1))
+            self.expected_key = key
+        return self.expected
+
+    def log_likelihood(self, observed, sensor_poses=None):
+        """Log likelihood of the readings for every cell"""
+        observed = np.asarray(observed, dtype=float).reshape(1, -1)
+        if self.log_weight_fn is not None:
+            log_weights = self.log_weight_fn(self.expected_rssi(sensor_poses), observed)
+            return np.reshape(log_weights, self.x.shape)
+        weights = self.weight_fn(self.expected_rssi(sensor_poses), observed)
+        weights = np.maximum(np.reshape(weights, self.x.shape), np.finfo(float).tiny)
+        return np.log(weights)
+
+    @timed("grid_filter.update")
+    def update(self, observed=None, sensor_poses=None, **kwargs):
+        """Update the belief with the readings of one step
+
+        Parameters
+        ----------
+        observed : float or array_like, optional
+            Reading(s) of the step, None only applies the motion
+        sensor_poses : array_like, optional
+            (x, y, heading) of the sensor of each reading, see
+            RFMultiSeparableEnv.observe
+        """
+        self.follow_sensor()
+        self.predict()
+        if observed is not None:
+            self.log_belief += self.log_likelihood(observed, sensor_poses)
+        self.normalize()
+        self.sample()
+        self.version += 1
+
+    def reseed(self, states):
+        """Replace the belief with the histogram of states
+
+        The grid is re-centered on the median of the states when none of
+        them is on it, and the belief is kept (with a warning) when the
+        states do not fit on the grid even then.
+
+        Parameters
+        ----------
+        states : array_like
+            (x, y, course, speed) states of shape (n, 4)
+        """
+        states = np.asarray(states, dtype=float)
+        counts = self.histogram(states)
+        if not np.any(counts) and np.all(np.isfinite(states[:, :2])):
+            self.recenter(*np.median(states[:, :2], axis=0))
+            counts = self.histogram(states)
+        if not np.any(counts):
+            logging.warning(
+                f"no reseed state on the {self.width:g} m grid around "
+                f"{tuple(self.center)}, keeping the belief"
+            )
+            return
+        belief = ndimage.convolve(counts / np.sum(counts), self.kernel, mode="constant")
+        self.log_belief = np.log(np.maximum(belief, np.finfo(float).tiny))
+        self.normalize()
+        self.sample()
+        self.version += 1
+
+    def sample(self):
+        """Draw the particles from the belief, with the statistics of the
+        weights the particle filter would expose"""
+        belief = self.belief.ravel()
+        positions = (np.arange(self.n_particles) + self.rng.random()) / self.n_particles
+        cells = np.searchsorted(np.cumsum(belief), positions, side="right")
+        cells = np.minimum(cells, belief.size - 1)
+        jitter = self.rng.uniform(-0.5, 0.5, (2, self.n_particles)) * self.cell_size
+        states = np.column_stack(
+            (
+                self.x.ravel()[cells] + jitter[0],
+                self.y.ravel()[cells] + jitter[1],
+                self.rng.integers(0, 11, self.n_particles, endpoint=True) * 30,
+                np.full(self.n_particles, self.speed),
+            )
+        ).astype(float)
+        self.particles = self.to_states(states)
+        self.weights = np.ones(self.n_particles) / self.n_particles
+        # fraction of the grid effectively occupied, and entropy of the cells
+        self.n_eff = (1.0 / np.sum(belief**2)) / belief.size
+        self.weight_entropy = np.sum(belief * self.log_belief.ravel())
@@ -0,0 +1,148 @@
+"""
+Bounded ingestion queue between the MQTT network thread and the geolocate loop
+
+The paho callbacks only append raw payloads to a MessageQueue. The main loop
+drains the queue once per step, which decodes the JSON payloads, and
+coalesces the messages received during the step into the one message handed
+to the data handler, so the shared state is only ever mutated by the loop
+thread.
+
+Coalescing policies:
+
+- latest: keep the last message, drop the others
+- mean: last message, with the RSSI averaged over every message (per class
+  for inference predictions)
+- batch: as mean, and every RSSI reading is kept in "rssi_batch" so the
+  filter can use all of them
+"""
+import json
+import logging
+import threading
+from collections import deque
+from timeit import default_timer as timer
+
+import numpy as np
+
+from . import instrument
+from .core import is_float
+
+COALESCE_POLICIES = ["latest", "mean", "batch"]
+
+
+class MessageQueue:
+    """
+    Thread safe bounded queue of (receive time, message) pairs, the oldest
+    message is dropped when a put finds the queue full
+
+    Messages are either decoded dicts (e.g. replayed) or raw MQTT JSON
+    payloads, decoded by drain() on the thread that reads the queue.
+
+    Parameters
+    ----------
+    name : str
+        Name of the queue in the ingest metrics, e.g. the MQTT topic
+    maxsize : int
+        Maximum number of queued messages
+    """
+
+    def __init__(self, name, maxsize=1000):
+        self.name = name
+        self.maxsize = maxsize
+        self.messages = deque()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.messages)
+
+    def put(self, message):
+        dropped = False
+        with self.lock:
+            if len(self.messages) >= self.maxsize:
+                self.messages.popleft()
+                dropped = True
+            self.messages.append((timer(), message))
+        instrument.inc("ingest_messages", queue=self.name)
+        if dropped:
+            instrument.inc("ingest_dropped", queue=self.name)
+
+    def drain(self):
+        """
+        Remove and return every queued (receive time, message) pair, raw
+        payloads decoded and malformed ones dropped
+        """
+        with self.lock:
+            messages = list(self.messages)
+            self.messages.clear()
+        instrument.set_gauge("ingest_queue_depth", len(messages), queue=self.name)
+        decoded = []
+        n_payloads = 0
+        for received, message in messages:
+            if isinstance(message, (bytes, bytearray, str)):
+                n_payloads += 1
+                try:
+                    message = json.loads(message)
+                except ValueError as err:
+                    logging.warning(f"dropping malformed message on {self.name}: {err}")
+                    instrument.inc("ingest_malformed", queue=self.name)
+                    continue
+            decoded.append((received, message))
+        if n_payloads:
+            instrument.inc("mqtt_messages", n_payloads, topic=self.name)
+        return decoded
+
+
+def prediction_rssi(message):
+    """
+    RSSI of every prediction of an inference message, by class
+    """
+    metadata = message.get("metadata", None) or {}
+    return {
+        class_name: [
+            float(prediction.get("rssi_max", metadata.get("rssi_max", None)))
+            for prediction in predictions
+        ]
+        for class_name, predictions in (message.get("predictions", None) or {}).items()
+    }
+
+
+def coalesce(messages, policy="latest"):
+    """
+    Combine the messages received during one step into a single message
+
+    Parameters
+    ----------
+    messages : list of dict
+        Messages in arrival order, at least one
+    policy : str
+        One of COALESCE_POLICIES
+
+    Returns
+    -------
+    message : dict
+        The last message, with the RSSI readings of every message merged
+        in for the mean and batch policies
+    """
+    if policy not in COALESCE_POLICIES:
+        raise ValueError(f"coalesce policy must be one of {COALESCE_POLICIES}")
+    latest = messages[-1]
+    if policy == "latest" or (len(messages) == 1 and policy == "mean"):
+        return latest
+
+    message = dict(latest)
+    class_rssi = {}
+    for m in messages:
+        for class_name, values in prediction_rssi(m).items():
+            class_rssi.setdefault(class_name, []).extend(values)
+    rssi = [float(m["rssi"]) for m in messages if is_float(m.get("rssi", None))]
+
+    if class_rssi:
+        # the data handler averages the predictions of each class
+        message["predictions"] = {
+            class_name: [{"rssi_max": value} for value in values]
+            for class_name, values in class_rssi.items()
+        }
+    if rssi:
+        message["rssi"] = float(np.mean(rssi))
+    if policy == "batch":
+        message["rssi_batch"] = class_rssi if class_rssi else rssi or None
+    return message
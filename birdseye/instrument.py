@@ -0,0 +1,282 @@
+"""
+Lightweight instrumentation of the hot paths
+
+Named spans record their wall clock duration into per span histograms,
+counters count events and gauges hold the last value of a quantity. Every
+metric lives in a Registry which can be exported as Prometheus text or JSON.
+
+Instrumentation is on unless the BIRDSEYE_INSTRUMENT environment variable is
+"0", and can be switched with enable(). When disabled, span() returns a shared
+no-op context manager and timed() functions only check a flag.
+
+The hot path never takes a lock: updates are plain attribute and list
+increments under the GIL, exporters read snapshot copies.
+"""
+import functools
+import json
+import os
+import re
+from bisect import bisect_left
+from timeit import default_timer as timer
+
+# histogram bucket upper bounds in seconds, from 1 us to 10 s
+BUCKETS = tuple(
+    round(m * 10.0**e, 9) for e in range(-6, 1) for m in (1, 2.5, 5)
+) + (10.0,)
+
+
+def metric_name(name):
+    """
+    Prometheus compatible metric name
+    """
+    return re.sub(r"[^a-zA-Z0-9_:]", "_", name)
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{k}="{v}"' for k, v in labels)
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    """
+    Count, sum and bucket counts of observed values
+    """
+
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket holding the q-th quantile
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float("inf"),), list(self.counts)):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in self.bounds] + ["+Inf"], self.counts)),
+        }
+
+
+class Span:
+    """
+    Context manager recording its duration into a registry histogram
+    """
+
+    __slots__ = ("registry", "name", "start")
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = timer()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, timer() - self.start)
+        return False
+
+
+class NullSpan:
+    """
+    Span used when instrumentation is disabled
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Registry:
+    """
+    Span histograms, counters and gauges of a process
+
+    Parameters
+    ----------
+    enabled : bool
+        Record metrics, when False span, observe, inc and set_gauge do nothing
+    prefix : str
+        Prefix of the exported metric names
+    """
+
+    def __init__(self, enabled=True, prefix="birdseye"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def span(self, name):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name)
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms.setdefault(name, Histogram())
+        histogram.observe(seconds)
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        if not self.enabled:
+            return
+        self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def reset(self):
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def to_dict(self):
+        """
+        Snapshot of every metric as a JSON serializable dict
+        """
+        return {
+            "spans": {
+                name: histogram.to_dict()
+                for name, histogram in list(self.histograms.items())
+            },
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in list(self.counters.items())
+            ],
+            "gauges": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in list(self.gauges.items())
+            ],
+        }
+
+    def to_prometheus(self):
+        """
+        Snapshot of every metric in the Prometheus text exposition format
+        """
+        lines = []
+        histograms = sorted(list(self.histograms.items()))
+        if histograms:
+            family = f"{self.prefix}_span_seconds"
+            lines.append(f"# HELP {family} Duration of instrumented spans")
+            lines.append(f"# TYPE {family} histogram")
+            for name, histogram in histograms:
+                counts = list(histogram.counts)
+                cumulative = 0
+                for bound, count in zip(histogram.bounds + ("+Inf",), counts):
+                    cumulative += count
+                    labels = format_labels((("span", name), ("le", bound)))
+                    lines.append(f"{family}_bucket{labels} {cumulative}")
+                labels = format_labels((("span", name),))
+                lines.append(f"{family}_sum{labels} {histogram.sum}")
+                lines.append(f"{family}_count{labels} {cumulative}")
+
+        for kind, metrics, suffix in (
+            ("counter", self.counters, "_total"),
+            ("gauge", self.gauges, ""),
+        ):
+            families = {}
+            for (name, labels), value in list(metrics.items()):
+                families.setdefault(name, []).append((labels, value))
+            for name in sorted(families):
+                family = f"{self.prefix}_{metric_name(name)}{suffix}"
+                lines.append(f"# TYPE {family} {kind}")
+                for labels, value in sorted(families[name]):
+                    lines.append(f"{family}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """
+        Write a snapshot to path, as JSON if path ends with .json else as
+        Prometheus text
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="UTF-8") as f:
+            if path.endswith(".json"):
+                json.dump(self.to_dict(), f)
+            else:
+                f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+REGISTRY = Registry(enabled=os.getenv("BIRDSEYE_INSTRUMENT", "1") != "0")
+
+
+def enable(enabled=True):
+    REGISTRY.enabled = enabled
+
+
+def span(name):
+    """
+    Time a block into the span histogram name, e.g. with span("env.step"):
+    """
+    return REGISTRY.span(name)
+
+
+def observe(name, seconds):
+    REGISTRY.observe(name, seconds)
+
+
+def inc(name, value=1, **labels):
+    REGISTRY.inc(name, value, **labels)
+
+
+def set_gauge(name, value, **labels):
+    REGISTRY.set_gauge(name, value, **labels)
+
+
+def timed(name):
+    """
+    Decorator timing every call of a function into the span histogram name
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not REGISTRY.enabled:
+                return fn(*args, **kwargs)
+            start = timer()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                REGISTRY.observe(name, timer() - start)
+
+        return wrapper
+
+    return decorator
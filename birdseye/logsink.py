@@ -0,0 +1,174 @@
+"""
+Buffered, asynchronous line log for the MQTT network thread
+
+Writers only put lines on a queue. A background thread keeps the log file
+open, flushes it every flush_interval seconds and, when the file grows past
+max_bytes, rotates it to a numbered segment (optionally gzip compressed).
+close() writes every queued line before returning. If the file cannot be
+written (e.g. the disk is full) the thread stops and later lines are
+dropped and counted instead of queued. Items the formatter fails on are
+dropped and counted too.
+"""
+import gzip
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+
+# stop marker of the writer queue
+_CLOSE = object()
+
+
+class AsyncLogWriter:
+    """
+    Line log written by a background thread
+
+    Segments of a rotated log <name>.log are named <name>.1.log,
+    <name>.2.log, ... in write order, or <name>.1.log.gz, ... when compressed.
+
+    Parameters
+    ----------
+    path : str
+        Path of the log file, lines are appended
+    flush_interval : float
+        Seconds between two flushes of the file
+    max_bytes : int
+        Rotate the file when it grows past max_bytes (UTF-8 encoded), 0
+        never rotates
+    compress : bool
+        gzip the rotated segments
+    formatter : callable, optional
+        Applied to every queued item by the writer thread, returns the line
+        to write, so writers can queue raw data
+    """
+
+    def __init__(
+        self, path, flush_interval=1.0, max_bytes=0, compress=False, formatter=None
+    ):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.formatter = formatter
+        self.segment = 0
+        # set when the writer thread stopped on an error, lines written
+        # after it are dropped
+        self.failed = False
+        self.dropped = 0
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, line):
+        """
+        Queue a line (with its trailing newline) for writing, or the raw
+        data of a line if the writer has a formatter
+        """
+        if self.failed:
+            self.drop(1)
+            return
+        self.queue.put(line)
+
+    def drop(self, n_lines, reason="the log is not written"):
+        """
+        Count lines that will never be written, warning on the first ones
+        """
+        if not self.dropped:
+            logging.warning(f"{reason}, dropping lines of log {self.path}")
+        self.dropped += n_lines
+
+    def encode(self, item):
+        """
+        UTF-8 encoded line of a queued item, None if the formatter fails
+        """
+        try:
+            line = item if self.formatter is None else self.formatter(item)
+            return line.encode("utf-8")
+        except Exception as err:  # pylint: disable=broad-except
+            self.drop(1, reason=f"could not format a line: {err!r}")
+            return None
+
+    def close(self):
+        """
+        Write the queued lines, close the file and stop the writer thread
+        """
+        if self.thread.is_alive():
+            self.queue.put(_CLOSE)
+            self.thread.join()
+        if self.dropped:
+            logging.warning(f"dropped {self.dropped} lines of log {self.path}")
+
+    def segment_path(self, segment):
+        root, ext = os.path.splitext(self.path)
+        return f"{root}.{segment}{ext}"
+
+    def rotate(self, f):
+        """
+        Move the full log to the next segment and reopen an empty log
+        """
+        f.close()
+        self.segment += 1
+        segment_path = self.segment_path(self.segment)
+        os.replace(self.path, segment_path)
+        if self.compress:
+            with open(segment_path, "rb") as src, gzip.open(
+                f"{segment_path}.gz", "wb"
+            ) as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(segment_path)
+        return open(self.path, "ab")
+
+    def run(self):
+        f = None
+        try:
+            # binary, so size and max_bytes count bytes
+            f = open(self.path, "ab")
+            size = f.tell()
+            last_flush = time.monotonic()
+            closed = False
+            while not closed:
+                try:
+                    line = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    line = None
+                # write whatever else is already queued
+                while line is not None:
+                    if line is _CLOSE:
+                        closed = True
+                        break
+                    data = self.encode(line)
+                    if data is not None:
+                        f.write(data)
+                        size += len(data)
+                        if self.max_bytes and size >= self.max_bytes:
+                            break
+                    try:
+                        line = self.queue.get_nowait()
+                    except queue.Empty:
+                        line = None
+                if self.max_bytes and size >= self.max_bytes:
+                    f = self.rotate(f)
+                    size = 0
+                elif time.monotonic() - last_flush >= self.flush_interval:
+                    f.flush()
+                    last_flush = time.monotonic()
+        except Exception as err:  # pylint: disable=broad-except
+            # e.g. OSError of a full disk, later lines are dropped
+            logging.error(f"could not write to log {self.path}: {err}")
+            self.failed = True
+            # nothing reads the queue anymore, empty it so it cannot grow
+            dropped = 0
+            while True:
+                try:
+                    line = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if line is not _CLOSE:
+                    dropped += 1
+            if dropped:
+                self.drop(dropped)
+        finally:
+            if f is not None:
+                f.close()
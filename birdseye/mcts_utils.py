@@ -1,15 +1,17 @@
 # mcts_utils.py
 # Imports
-import random
 from datetime import datetime
-from timeit import default_timer as timer
 
-import matplotlib.pyplot as plt
 import numpy as np
 from tqdm import tqdm
 
-from .utils import particle_swap
-from .utils import tracking_error
+from .core import particle_swap
+from .core import tracking_error
+from .instrument import inc
+from .instrument import span
+from .lazy import lazy_import
+
+plt = lazy_import("matplotlib.pyplot")
 
 ##################################################################
 # MCTS Algorithm
@@ -55,13 +57,13 @@ def arg_max_action(actions, Q, N, history, c=None, exploration_bonus=False):
 ##################################################################
 # Rollout
 ##################################################################
-def rollout_random(env, state, depth, pf_copy):
+def rollout_random(env, state, depth, pf_copy, rng=None):
     # print(f"Rollout: {depth=}")
     if depth == 0:
         return 0
 
     # random action
-    action, action_index = env.actions.get_random_action()
+    action, action_index = env.actions.get_random_action(rng=rng)
 
     # print([state[4*t:4*(t+1)] for t in range(env.state.n_targets)])
     # generate next state and reward with random action; observation doesn't matter
@@ -92,112 +94,85 @@ def rollout_random(env, state, depth, pf_copy):
     # )
     reward = np.mean(rewards)
 
-    return reward + lambda_arg * rollout_random(env, next_state, depth - 1, pf_copy)
+    return reward + lambda_arg * rollout_random(
+        env, next_state, depth - 1, pf_copy, rng=rng
+    )
 
 
 ##################################################################
 # Simulate
 ##################################################################
-def simulate(env, Q, N, state, history, depth, c, pf_copy):
+def simulate(env, Q, N, state, history, depth, c, pf_copy, rng=None):
     # print(f"Simulate: {history=}, {depth=} \n {Q=}")
 
     if depth == 0:
         return (Q, N, 0)
 
+    if rng is None:
+        rng = np.random.default_rng()
+
     # expansion
     new_tree = history.copy()
     new_tree.append(
-        np.random.randint(len(env.actions.get_action_list()))
+        rng.integers(len(env.actions.get_action_list()))
     )  # TODO: why 1?
 
     if tuple(new_tree) not in Q:
-        expansion_start = timer()
-        # Q[tuple(new_tree)] = 0
-        # N[tuple(new_tree)] = 0
-        for action in env.actions.get_action_list():
-            # initialize Q and N to zeros
-            new_index = history.copy()
-            new_index.append(action)
-            Q[tuple(new_index)] = 0
-            N[tuple(new_index)] = 0
-        ret = rollout_random(env, state, depth, pf_copy)
-        expansion_end = timer()
-
-        # print(f"expansion time = {expansion_end-expansion_start}")
+        with span("mcts.expansion"):
+            # Q[tuple(new_tree)] = 0
+            # N[tuple(new_tree)] = 0
+            for action in env.actions.get_action_list():
+                # initialize Q and N to zeros
+                new_index = history.copy()
+                new_index.append(action)
+                Q[tuple(new_index)] = 0
+                N[tuple(new_index)] = 0
+            ret = rollout_random(env, state, depth, pf_copy, rng=rng)
 
         return (Q, N, ret)
         # rollout
         # return (Q, N, rollout_random(env, state, depth, pf_copy))
 
-    select_start = timer()
-    # search: find optimal action to explore
-    search_action_index = arg_max_action(env.actions, Q, N, history, c, True)
-
-    action = env.actions.index_to_action(search_action_index)
-    select_end = timer()
+    with span("mcts.selection"):
+        # search: find optimal action to explore
+        search_action_index = arg_max_action(env.actions, Q, N, history, c, True)
 
-    # print(f"selection time = {select_end-select_start}")
+        action = env.actions.index_to_action(search_action_index)
 
     # print("Selected action = ",search_action_index)
 
     # take action; get new state, observation, and reward
     # state_prime = np.array([env.state.update_state(state[4*t:4*(t+1)], action) for t in range(env.state.n_targets)]) # env.state.update_state(state, action)
 
-    state_start = timer()
-    next_state = np.array([env.state.update_sim_state(s, action) for s in state])
-    state_end = timer()
-
-    # print(f"state time = {state_end-state_start}")
+    with span("mcts.state_update"):
+        next_state = np.array([env.state.update_sim_state(s, action) for s in state])
 
-    # pf_start = timer()
-    # o_start = timer()
     # observations = [env.sensor.observation(next_state[t], t)[0] for t in range(env.state.n_targets)]
-    # o_end = timer()
-    # p_start = timer()
     # for t in range(env.state.n_targets):
     #     pf_copy[t].update(np.array(observations[t]), control=action) #for t in range(env.state.n_targets)
-    # p_end = timer()
-    # r_start = timer()
     # reward = np.mean([env.state.reward_func(pf_copy[t]) for t in range(env.state.n_targets)])
-    # r_end = timer()
-    # pf_end = timer()
-    # print(f"r time = {r_end-r_start}")
-    # print(f"o time = {o_end-o_start}")
-    # print(f"p time = {p_end-p_start}")
-    # print(f"pf time = {pf_end-pf_start}")
     observations = []
     rewards = 0
-    pf_start = timer()
     for t in range(env.state.n_targets):
         # Get sensor observation
-        o_start = timer()
-        observation = env.sensor.observation(next_state[t], t)[0]
+        with span("mcts.observation"):
+            observation = env.sensor.observation(next_state[t], t)[0]
         observations.append(observation)
-        o_end = timer()
         # Update particle filter
-        p_start = timer()
-        pf_copy[t].update(
-            np.array(observation), xp=pf_copy[t].particles, control=action
-        )
-        p_end = timer()
-        r_start = timer()
-        # rewards.append(env.state.reward_func(pf_copy[t]))
-        rewards += env.state.reward_func(
-            pf=pf_copy[t],
-            state=next_state,
-            action_idx=search_action_index,
-            particles=pf_copy[t].particles,
-        )
-
-        r_end = timer()
-    pf_end = timer()
+        with span("mcts.pf_update"):
+            pf_copy[t].update(
+                np.array(observation), xp=pf_copy[t].particles, control=action
+            )
+        with span("mcts.reward"):
+            # rewards.append(env.state.reward_func(pf_copy[t]))
+            rewards += env.state.reward_func(
+                pf=pf_copy[t],
+                state=next_state,
+                action_idx=search_action_index,
+                particles=pf_copy[t].particles,
+            )
     reward = rewards / env.state.n_targets
 
-    # print(f"r time = {r_end-r_start}")
-    # print(f"o time = {o_end-o_start}")
-    # print(f"p time = {p_end-p_start}")
-    # print(f"pf time = {pf_end-pf_start}")
-
     # if env.state.belief_mdp:
     #     env.pf.particles = belief
     #     env.pf.update(np.array(observation), xp=belief, control=action)
@@ -207,12 +182,11 @@ def simulate(env, Q, N, state, history, depth, c, pf_copy):
     #     state=state_prime, action_idx=search_action_index, particles=belief
     # )
     # recursive call after taking action and getting observation
-    tree_start = timer()
     new_history = history.copy()
     new_history.append(search_action_index)
     # new_history.append(tuple([int(o) for o in observations]))
     (Q, N, successor_reward) = simulate(
-        env, Q, N, next_state, new_history, depth - 1, c, pf_copy
+        env, Q, N, next_state, new_history, depth - 1, c, pf_copy, rng=rng
     )
     q = reward + lambda_arg * successor_reward
 
@@ -221,9 +195,6 @@ def simulate(env, Q, N, state, history, depth, c, pf_copy):
     update_index.append(search_action_index)
     N[tuple(update_index)] += 1
     Q[tuple(update_index)] += (q - Q[tuple(update_index)]) / N[tuple(update_index)]
-    tree_end = timer()
-
-    # print(f"tree time = {tree_end-tree_start}")
 
     # print("Q update = ",Q[tuple(update_index)])
     return (Q, N, q)
@@ -232,12 +203,16 @@ def simulate(env, Q, N, state, history, depth, c, pf_copy):
 ##################################################################
 # Select Action
 ##################################################################
-def select_action(env, Q, N, belief, depth, c, iterations):
+def select_action(env, Q, N, belief, depth, c, iterations, rng=None):
     # empty history at top recursive call
     history = []
 
+    if rng is None:
+        rng = np.random.default_rng()
+
     # number of iterations
     counter = 0
+    inc("mcts_simulations", iterations)
 
     original_particles = np.copy(env.pf.particles)
     original_n_particles = env.pf.n_particles
@@ -247,7 +222,7 @@ def select_action(env, Q, N, belief, depth, c, iterations):
     env.pf.weights = np.ones(env.pf.n_particles) / env.pf.n_particles
     while counter < iterations:
         # draw state randomly based on belief state (pick a random particle)
-        state = random.choice(belief)
+        state = belief[rng.integers(len(belief))]
         converted_state = state.reshape(env.state.n_targets, 4)
         # simulate
         simulate(
@@ -259,8 +234,11 @@ def select_action(env, Q, N, belief, depth, c, iterations):
             depth,
             c,
             np.copy(original_particles)[
-                random.sample(range(len(original_particles)), n_particle_downsample)
+                rng.choice(
+                    len(original_particles), n_particle_downsample, replace=False
+                )
             ],
+            rng=rng,
         )
 
         counter += 1
@@ -273,13 +251,17 @@ def select_action(env, Q, N, belief, depth, c, iterations):
 
 
 def select_action_light(
-    env, Q={}, N={}, depth=2, c=20, iterations=100, n_downsample=500
+    env, Q={}, N={}, depth=2, c=20, iterations=100, n_downsample=500, rng=None
 ):
     # empty history at top recursive call
     history = []
 
+    if rng is None:
+        rng = np.random.default_rng()
+
     # number of iterations
     counter = 0
+    inc("mcts_simulations", iterations)
 
     while counter < iterations:
         # print(f"{counter}/{iterations} simulations")
@@ -297,6 +279,7 @@ def select_action_light(
             depth,
             c,
             pf_copy,
+            rng=rng,
         )
 
         counter += 1
@@ -319,11 +302,12 @@ def trim_tree(Q, N, action):
 
 
 class MCTSRunner:
-    def __init__(self, env, depth, c, simulations=1000):
+    def __init__(self, env, depth, c, simulations=1000, rng=None):
         self.env = env
         self.depth = depth
         self.c = c
         self.simulations = simulations
+        self.rng = rng
 
         self.Q = {}
         self.N = {}
@@ -353,6 +337,7 @@ class MCTSRunner:
             self.depth,
             self.c,
             self.simulations,
+            rng=self.rng,
         )
 
         return self.action
@@ -374,6 +359,7 @@ def mcts_trial(
     fig=None,
     ax=None,
     results=None,
+    rng=None,
 ):
     # Initialize true state and belief state (particle filter);
     # we assume perfect knowledge at start of simulation (could experiment otherwise with random beliefs)
@@ -439,7 +425,9 @@ def mcts_trial(
         # select an action
         inference_start_time = datetime.now()
 
-        (Q, N, action) = select_action(env, Q, N, belief, depth, c, simulations)
+        (Q, N, action) = select_action(
+            env, Q, N, belief, depth, c, simulations, rng=rng
+        )
         inference_time = (datetime.now() - inference_start_time).total_seconds()
         # take action; get next true state, obs, and reward
         # next_state = env.state.update_state(env.state.target_state, action, target_update=True)
@@ -1,16 +1,15 @@
-from .baseline import baseline
-from .dqn import dqn
-from .mcts import mcts
+import importlib
 
-
-AVAIL_METHODS = {"mcts": mcts, "dqn": dqn, "baseline": baseline}
+# method name -> module defining it, imported on first use so that looking up
+# one method does not import the dependencies (e.g. torch) of the others
+AVAIL_METHODS = {"mcts": ".mcts", "dqn": ".dqn", "baseline": ".baseline"}
 
 
 def get_method(method_name=""):
     """Convenience function for retrieving BirdsEye methods
     Parameters
     ----------
-    method_name : {'mcts', 'dqn'}
+    method_name : {'mcts', 'dqn', 'baseline'}
         Name of method.
     Returns
     -------
@@ -19,7 +18,8 @@ def get_method(method_name=""):
     """
     method_name = method_name.lower()
     if method_name in AVAIL_METHODS:
-        method = AVAIL_METHODS[method_name]
+        module = importlib.import_module(AVAIL_METHODS[method_name], __package__)
+        method = getattr(module, method_name)
         return method
     raise ValueError(
         f"Invalid method name, {method_name}, entered. Must be in {AVAIL_METHODS.keys()}"
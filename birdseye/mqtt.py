@@ -4,12 +4,41 @@ import os
 import paho.mqtt.client
 import sys
 
+from birdseye.logsink import AsyncLogWriter
 from paho.mqtt.enums import CallbackAPIVersion
 from pathlib import Path
 
 
+def payload_line(payload):
+    """
+    Log line of a raw JSON message payload, re-encoded only if it spans
+    several lines
+    """
+    if isinstance(payload, bytes):
+        try:
+            payload = payload.decode("utf-8")
+        except UnicodeDecodeError:
+            # json also reads UTF-16 and UTF-32 encoded payloads
+            payload = json.dumps(json.loads(payload))
+    payload = payload.strip()
+    if "\n" in payload:
+        payload = json.dumps(json.loads(payload))
+    return f"{payload}\n"
+
+
 class BirdsEyeMQTT:
-    def __init__(self, mqtt_host, mqtt_port, topics, log_path, start_time):
+    def __init__(
+        self,
+        mqtt_host,
+        mqtt_port,
+        topics,
+        log_path,
+        start_time,
+        log_flush_interval=1.0,
+        log_max_bytes=0,
+        log_compress=False,
+        client=None,
+    ):
         self.mqtt_host = mqtt_host
         self.mqtt_port = mqtt_port
         self.topics = topics
@@ -17,9 +46,20 @@ class BirdsEyeMQTT:
         self.start_time = start_time
 
         Path(self.log_path).mkdir(parents=True, exist_ok=True)
+        # written by a background thread, the callbacks only queue lines
+        self.log_writer = AsyncLogWriter(
+            os.path.join(self.log_path, f"mqtt-{self.start_time}.log"),
+            flush_interval=log_flush_interval,
+            max_bytes=log_max_bytes,
+            compress=log_compress,
+            formatter=payload_line,
+        )
 
         try:
-            self.client = paho.mqtt.client.Client(CallbackAPIVersion.VERSION2)
+            # e.g. a birdseye.mqtt_local.LocalClient of an in-process broker
+            self.client = client
+            if self.client is None:
+                self.client = paho.mqtt.client.Client(CallbackAPIVersion.VERSION2)
             self.client.on_connect = self.on_connect
             self.client.on_publish = self.on_publish
             self.client.connect(mqtt_host, mqtt_port, 60)
@@ -36,22 +76,21 @@ class BirdsEyeMQTT:
 
     def on_message_func(self, message_handler):
         def on_message(client, userdata, json_message):
-            json_data = json.loads(json_message.payload)
-            self.log(json_data)
-            message_handler(json_data)
+            # only queue the raw payload on the network thread, the writer
+            # thread formats the log line and the handler's reader (e.g.
+            # MessageQueue.drain) decodes the JSON
+            self.log_writer.write(json_message.payload)
+            message_handler(json_message.payload)
 
         return on_message
 
-    def log(self, json_data):
-        try:
-            with open(
-                os.path.join(self.log_path, f"mqtt-{self.start_time}.log"),
-                "a",
-                encoding="utf-8",
-            ) as f:
-                f.write(f"{json.dumps(json_data)}\n")
-        except FileNotFoundError as err:
-            logging.error(f"could not write to mqtt rssi log: {err}")
+    def close(self):
+        """
+        Disconnect and write the queued log lines
+        """
+        self.client.loop_stop()
+        self.client.disconnect()
+        self.log_writer.close()
 
     def on_connect(self, client, userdata, flags, result_code):
         logging.info(
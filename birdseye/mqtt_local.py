@@ -0,0 +1,117 @@
+"""
+In-process stand-in for a MQTT broker, for tests and load generation
+
+LocalBroker delivers published payloads to the clients subscribed to the
+topic from its own delivery thread, like paho delivers messages from its
+network thread. LocalClient implements the subset of paho.mqtt.client.Client
+used by BirdsEyeMQTT, so
+
+    broker = LocalBroker()
+    BirdsEyeMQTT(..., client=broker.client())
+
+runs without a network or a real broker. Topics are matched exactly, MQTT
+wildcards are not supported.
+"""
+import queue
+import threading
+
+# stop marker of the delivery queue
+_STOP = object()
+
+
+class LocalMessage:
+    """
+    Message as passed to the on_message callbacks
+    """
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+class LocalBroker:
+    """
+    Broker stand-in delivering messages on a background thread
+    """
+
+    def __init__(self):
+        self.clients = []
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def client(self):
+        return LocalClient(self)
+
+    def publish(self, topic, payload):
+        self.queue.put(LocalMessage(topic, payload))
+
+    def backlog(self):
+        """
+        Number of published messages not delivered yet
+        """
+        return self.queue.qsize()
+
+    def run(self):
+        while True:
+            message = self.queue.get()
+            if message is _STOP:
+                return
+            for client in list(self.clients):
+                client.deliver(message)
+
+    def close(self):
+        """
+        Deliver the published messages and stop the delivery thread
+        """
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+
+
+class LocalClient:
+    """
+    Client of a LocalBroker with the paho client interface used by
+    BirdsEyeMQTT
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.on_connect = None
+        self.on_publish = None
+        self.on_message = None
+        self.subscriptions = set()
+        self.callbacks = {}
+
+    def connect(self, host=None, port=None, keepalive=60):
+        if self not in self.broker.clients:
+            self.broker.clients.append(self)
+
+    def loop_start(self):
+        if self.on_connect is not None:
+            self.on_connect(self, None, {}, 0)
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        if self in self.broker.clients:
+            self.broker.clients.remove(self)
+
+    def subscribe(self, topic):
+        self.subscriptions.add(topic)
+
+    def message_callback_add(self, topic, callback):
+        self.callbacks[topic] = callback
+
+    def publish(self, topic, payload):
+        self.broker.publish(topic, payload)
+        if self.on_publish is not None:
+            self.on_publish(self, None, None)
+
+    def deliver(self, message):
+        if message.topic not in self.subscriptions:
+            return
+        callback = self.callbacks.get(message.topic, self.on_message)
+        if callback is not None:
+            callback(self, None, message)
@@ -0,0 +1,375 @@
+"""
+Particle filter with explicit random number generation
+"""
+import numpy as np
+import pfilter
+
+
+def systematic_resample(weights, rng):
+    """
+    Systematic resampling, vectorized with searchsorted
+
+    Parameters
+    ----------
+    weights : array_like
+        Normalized particle weights
+    rng : numpy.random.Generator
+        Random number generator
+
+    Returns
+    -------
+    indices : array_like
+        Indices of the resampled particles
+    """
+    n = len(weights)
+    positions = (np.arange(n) + rng.uniform(0, 1)) / n
+    indices = np.searchsorted(np.cumsum(weights), positions, side="right")
+    return np.minimum(indices, n - 1)
+
+
+def stratified_resample(weights, rng):
+    """
+    Stratified resampling, one uniform draw in each of n equal strata
+
+    Parameters
+    ----------
+    weights : array_like
+        Normalized particle weights
+    rng : numpy.random.Generator
+        Random number generator
+
+    Returns
+    -------
+    indices : array_like
+        Indices of the resampled particles
+    """
+    n = len(weights)
+    positions = (np.arange(n) + rng.uniform(0, 1, n)) / n
+    indices = np.searchsorted(np.cumsum(weights), positions, side="right")
+    return np.minimum(indices, n - 1)
+
+
+def multinomial_resample(weights, rng):
+    """
+    Multinomial resampling, n independent draws from the weights
+
+    Parameters
+    ----------
+    weights : array_like
+        Normalized particle weights
+    rng : numpy.random.Generator
+        Random number generator
+
+    Returns
+    -------
+    indices : array_like
+        Indices of the resampled particles
+    """
+    n = len(weights)
+    indices = np.searchsorted(np.cumsum(weights), rng.uniform(0, 1, n), side="right")
+    return np.minimum(indices, n - 1)
+
+
+def residual_resample(weights, rng):
+    """
+    Residual resampling, floor(n * weight) copies of every particle and
+    multinomial draws from the remainders for the rest
+
+    Parameters
+    ----------
+    weights : array_like
+        Normalized particle weights
+    rng : numpy.random.Generator
+        Random number generator
+
+    Returns
+    -------
+    indices : array_like
+        Indices of the resampled particles
+    """
+    n = len(weights)
+    scaled = n * np.asarray(weights)
+    copies = np.floor(scaled).astype(int)
+    indices = np.repeat(np.arange(n), copies)
+    n_residual = n - len(indices)
+    if n_residual > 0:
+        cumulative = np.cumsum(scaled - copies)
+        positions = rng.uniform(0, cumulative[-1], n_residual)
+        residual = np.searchsorted(cumulative, positions, side="right")
+        indices = np.concatenate((indices, np.minimum(residual, n - 1)))
+    return indices
+
+
+# resample_fn of ParticleFilter by name
+RESAMPLE_METHODS = {
+    "systematic": systematic_resample,
+    "stratified": stratified_resample,
+    "residual": residual_resample,
+    "multinomial": multinomial_resample,
+}
+
+
+def batch_systematic_resample(weights, rng):
+    """
+    Systematic resampling of many independent filters at once
+
+    Parameters
+    ----------
+    weights : array_like
+        Normalized particle weights of shape (n_filters, n_particles)
+    rng : numpy.random.Generator
+        Random number generator
+
+    Returns
+    -------
+    indices : array_like
+        Indices of shape (n_filters, n_particles) into each filter's particles
+    """
+    n_filters, n = weights.shape
+    # offset every row by its index so one flat searchsorted covers all rows
+    offsets = np.arange(n_filters)[:, None]
+    positions = (np.arange(n) + rng.uniform(0, 1, (n_filters, 1))) / n + offsets
+    cumulative = np.cumsum(weights, axis=1)
+    cumulative[:, -1] = 1
+    indices = np.searchsorted(
+        (cumulative + offsets).ravel(), positions.ravel(), side="right"
+    )
+    return np.minimum(indices.reshape(n_filters, n) - offsets * n, n - 1)
+
+
+def log_normalize(log_weights, axis=-1):
+    """
+    Normalize log weights with the log-sum-exp trick
+
+    Parameters
+    ----------
+    log_weights : array_like
+        Unnormalized log weights
+    axis : int
+        Axis of the particles
+
+    Returns
+    -------
+    log_weights : array_like
+        Log weights whose exponentials sum to 1, uniform where every weight
+        is 0
+    log_total : array_like
+        Log of the sum of the weights, -inf where every weight is 0
+    """
+    log_weights = np.asarray(log_weights, dtype=float)
+    top = np.max(log_weights, axis=axis, keepdims=True)
+    finite = np.isfinite(top)
+    top = np.where(finite, top, 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_total = top + np.log(
+            np.sum(np.exp(log_weights - top), axis=axis, keepdims=True)
+        )
+        uniform = -np.log(log_weights.shape[axis])
+        normalized = np.where(finite, log_weights - log_total, uniform)
+    return normalized, np.squeeze(log_total, axis=axis)
+
+
+class ParticleFilter(pfilter.ParticleFilter):
+    """
+    pfilter.ParticleFilter that draws the randomness of its resampling and
+    prior replenishment from a NumPy Generator instead of the global
+    np.random state.
+
+    resample_fn takes the normalized weights and the Generator and returns
+    the resampled indices, e.g. systematic_resample.
+
+    version counts the updates of the particles, so values derived from them
+    can be cached until the next update. Code replacing the particles
+    directly should increment it.
+
+    The particles are resampled only when n_eff drops below n_eff_threshold
+    (pfilter's n_eff is a fraction of n_particles, 1 resamples on every
+    update), otherwise the weights carry over to the next update.
+    Resampling gathers into the array of the particles before the previous
+    resampling, so keep a copy of pf.particles rather than a reference
+    across updates.
+
+    log_weight_fn, if given, replaces weight_fn with a function of the same
+    arguments returning log likelihoods. The weights are then combined and
+    normalized in the log domain, so particles far from the readings keep
+    finite relative weights instead of all underflowing to 0, and n_eff
+    and weight_entropy are computed from the normalized log weights.
+    """
+
+    def __init__(self, *args, rng=None, log_weight_fn=None, **kwargs):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.version = 0
+        self.log_weight_fn = log_weight_fn
+        # whether the last update resampled, and how many updates did
+        self.resampled = False
+        self.resample_count = 0
+        self.resample_buffer = None
+        kwargs.setdefault("resample_fn", systematic_resample)
+        super().__init__(*args, **kwargs)
+
+    def update(self, observed=None, **kwargs):
+        """Update the state of the particle filter given an observation.
+
+        Modified from https://github.com/johnhw/pfilter/blob/master/pfilter/pfilter.py
+        to use self.rng.
+
+        Parameters
+        ----------
+        observed : array_like
+            The observed output, in the same format as observe_fn() will produce.
+            If None, the filter runs one step in prediction-only mode.
+        kwargs :
+            Passed on to observe_fn, weight_fn (or log_weight_fn), dynamics_fn,
+            noise_fn, internal_weight_fn and transform_fn.
+        """
+        # apply dynamics and noise
+        self.particles = self.noise_fn(
+            self.dynamics_fn(self.particles, **kwargs), **kwargs
+        )
+
+        # hypothesise observations
+        self.hypotheses = self.observe_fn(self.particles, **kwargs)
+
+        if self.log_weight_fn is not None:
+            self.update_log_weights(observed, **kwargs)
+        else:
+            self.update_weights(observed, **kwargs)
+
+        # preserve current sample set before any replenishment
+        self.original_particles = np.array(self.particles)
+
+        # store mean (expected) hypothesis
+        self.mean_hypothesis = np.sum(self.hypotheses.T * self.weights, axis=-1).T
+        self.mean_state = np.sum(self.particles.T * self.weights, axis=-1).T
+        self.cov_state = np.cov(self.particles, rowvar=False, aweights=self.weights)
+
+        # store MAP estimate
+        argmax_weight = np.argmax(self.weights)
+        self.map_state = self.original_particles[argmax_weight]
+        self.map_hypothesis = self.hypotheses[argmax_weight]
+        self.original_weights = np.array(self.weights)  # before any resampling
+
+        # apply any post-processing
+        if self.transform_fn:
+            self.transformed_particles = self.transform_fn(
+                self.original_particles, self.weights, **kwargs
+            )
+        else:
+            self.transformed_particles = self.original_particles
+
+        # resampling step
+        self.resampled = self.n_eff < self.n_eff_threshold
+        if self.resampled:
+            indices = self.resample_fn(self.weights, self.rng)
+            self.particles = self.gather(indices)
+            self.weights = np.ones(self.n_particles) / self.n_particles
+            self.resample_count += 1
+
+        # randomly resample some particles from the prior
+        if self.resample_proportion > 0:
+            random_mask = self.rng.random(self.n_particles) < self.resample_proportion
+            self.resampled_particles = random_mask
+            self.init_filter(mask=random_mask)
+            if not self.resampled and np.any(random_mask):
+                # the prior draws get a neutral weight, not the weight of the
+                # particle they replace
+                weights = np.where(random_mask, 1 / self.n_particles, self.weights)
+                self.weights = weights / np.sum(weights)
+                if self.log_weight_fn is not None:
+                    with np.errstate(divide="ignore"):
+                        self.log_weights = np.log(self.weights)
+
+        self.version += 1
+
+    def gather(self, indices):
+        """Particles at indices, gathered into a preallocated buffer
+
+        The buffer is the array of the particles before the previous
+        resampling, no longer referenced by the filter.
+        """
+        buffer = self.resample_buffer
+        if (
+            buffer is None
+            or buffer is self.particles
+            or buffer.shape != self.particles.shape
+            or buffer.dtype != self.particles.dtype
+        ):
+            buffer = np.empty_like(self.particles)
+        np.take(self.particles, indices, axis=0, out=buffer)
+        self.resample_buffer = self.particles
+        return buffer
+
+    def update_weights(self, observed=None, **kwargs):
+        """Weight the particles by the likelihood of observed, as pfilter"""
+        if observed is not None:
+            observed = np.asarray(observed, dtype=np.float64)
+            weights = np.clip(
+                self.weights
+                * np.array(
+                    self.weight_fn(
+                        self.hypotheses.reshape(self.n_particles, -1),
+                        observed.reshape(1, -1),
+                        **kwargs
+                    )
+                ),
+                0,
+                np.inf,
+            )
+        else:
+            # we have no observation, so all particles weighted the same
+            weights = self.weights * np.ones((self.n_particles,))
+
+        # apply weighting based on the internal state
+        if self.internal_weight_fn is not None:
+            internal_weights = self.internal_weight_fn(
+                self.particles, observed, **kwargs
+            )
+            internal_weights = np.clip(internal_weights, 0, np.inf)
+            internal_weights = internal_weights / np.sum(internal_weights)
+            weights *= internal_weights
+
+        # normalise weights to resampling probabilities
+        self.weight_normalisation = np.sum(weights)
+        self.weights = weights / self.weight_normalisation
+
+        # effective sample size and entropy of the weights
+        self.n_eff = (1.0 / np.sum(self.weights**2)) / self.n_particles
+        self.weight_informational_energy = np.sum(self.weights**2)
+        self.weight_entropy = np.sum(self.weights * np.log(self.weights))
+
+    def update_log_weights(self, observed=None, **kwargs):
+        """Weight the particles by the log likelihood of observed and
+        normalize with log-sum-exp"""
+        with np.errstate(divide="ignore"):
+            log_weights = np.log(self.weights)
+        if observed is not None:
+            observed = np.asarray(observed, dtype=np.float64)
+            log_weights = log_weights + np.array(
+                self.log_weight_fn(
+                    self.hypotheses.reshape(self.n_particles, -1),
+                    observed.reshape(1, -1),
+                    **kwargs
+                )
+            )
+
+        # apply weighting based on the internal state
+        if self.internal_weight_fn is not None:
+            internal_weights = self.internal_weight_fn(
+                self.particles, observed, **kwargs
+            )
+            internal_weights = np.clip(internal_weights, 0, np.inf)
+            with np.errstate(divide="ignore"):
+                log_weights = log_weights + np.log(internal_weights)
+
+        # normalise weights to resampling probabilities
+        self.log_weights, log_normalisation = log_normalize(log_weights)
+        self.weight_normalisation = np.exp(log_normalisation)
+        self.weights = np.exp(self.log_weights)
+
+        # effective sample size and entropy of the weights
+        _, log_energy = log_normalize(2 * self.log_weights)
+        self.n_eff = np.exp(-log_energy) / self.n_particles
+        self.weight_informational_energy = np.exp(log_energy)
+        self.weight_entropy = np.sum(
+            self.weights * self.log_weights, where=np.isfinite(self.log_weights)
+        )
@@ -5,7 +5,7 @@ import numpy as np
 import torch
 
 from birdseye.pfrnn.model import Localizer
-from birdseye.utils import pol2cart
+from birdseye.core import pol2cart
 
 
 def parse_args(arg_string=None):
@@ -28,8 +28,10 @@ class LightweightPlanner(PathPlanner):
 
 
 class MCTSPlanner(PathPlanner):
-    def __init__(self, env, actions, depth, c, simulations):
-        self.runner = MCTSRunner(env=env, depth=depth, c=c, simulations=simulations)
+    def __init__(self, env, actions, depth, c, simulations, rng=None):
+        self.runner = MCTSRunner(
+            env=env, depth=depth, c=c, simulations=simulations, rng=rng
+        )
         self.actions = actions
 
     def proposal(self, observation):
@@ -1,11 +1,12 @@
 import numpy as np
 
-from birdseye.utils import circ_tangents, cart2pol
+from birdseye.core import circ_tangents, cart2pol
 
 
 class LAVAPilot:
-    def __init__(self, env, min_std_dev, r_min, horizon, min_bound):
+    def __init__(self, env, min_std_dev, r_min, horizon, min_bound, rng=None):
         self.env = env
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.min_std_dev = min_std_dev
         self.r_min = r_min
         self.horizon = horizon
@@ -89,6 +90,6 @@ class LAVAPilot:
 
         if control_action is None:
             print(f"Error: No path satisfies void constraints. Choosing random path.")
-            control_action = trajectories[np.random.randint(len(default_controls))]
+            control_action = trajectories[self.rng.integers(len(default_controls))]
 
         return control_action
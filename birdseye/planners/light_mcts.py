@@ -1,4 +1,3 @@
-import birdseye.utils
 import birdseye.sensor
 import birdseye.actions
 import birdseye.state
@@ -7,8 +6,11 @@ import birdseye.mcts_utils
 
 
 class LightMCTS:
-    def __init__(self, env, depth=3, c=20, simulations=100, n_downsample=400):
+    def __init__(
+        self, env, depth=3, c=20, simulations=100, n_downsample=400, rng=None
+    ):
         self.env = env
+        self.rng = rng
         self.depth = depth
         self.c = c
         self.simulations = simulations
@@ -30,6 +32,7 @@ class LightMCTS:
             self.c,
             self.simulations,
             self.n_downsample,
+            rng=self.rng,
         )
         birdseye.mcts_utils.trim_tree(
             self.Q, self.N, self.env.actions.action_to_index(self.action)
@@ -1,13 +1,25 @@
 import logging
 import numpy as np
-from scipy.spatial import distance
 
-from birdseye.utils import circ_tangents, cart2pol
+from birdseye.core import circ_tangents, cart2pol
+from birdseye.lazy import lazy_import
+
+distance = lazy_import("scipy.spatial.distance")
 
 
 class REPP:
-    def __init__(self, env, min_std_dev, r_min, horizon, min_bound, target_selections):
+    def __init__(
+        self,
+        env,
+        min_std_dev,
+        r_min,
+        horizon,
+        min_bound,
+        target_selections,
+        rng=None,
+    ):
         self.env = env
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.min_std_dev = min_std_dev
         self.r_min = r_min
         self.horizon = horizon
@@ -134,6 +146,6 @@ class REPP:
             logging.info(
                 f"Path planner (REPP): No path satisfies void constraints. Choosing random path."
             )
-            control_action = trajectories[np.random.randint(len(default_controls))]
+            control_action = trajectories[self.rng.integers(len(default_controls))]
 
         return control_action
@@ -0,0 +1,303 @@
+"""
+Streaming readers of recorded captures for replays
+
+Two capture formats are replayed:
+
+- mqtt-*.log files written by birdseye.mqtt, one JSON message per line,
+  and their gzip compressed rotated segments (mqtt-*.log.gz)
+- aligned .json captures, one JSON object mapping timestamps to messages
+
+Both are parsed incrementally from fixed size chunks, so memory use does not
+grow with the length of a capture. Captures are recorded in time order, which
+time window seeking relies on: a sidecar <capture>.idx file maps the time of
+every index_every-th message to its byte offset, so a replay starting late in
+a multi-hour capture does not parse everything before it.
+"""
+import bisect
+import codecs
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+
+from .core import is_float
+
+CHUNK_SIZE = 1 << 16
+INDEX_SUFFIX = ".idx"
+WHITESPACE = " \t\n\r"
+
+# end of stream marker of the read-ahead queue
+_DONE = object()
+
+
+def message_time(message, default=None):
+    """
+    Recorded time of a message, its "time" or "gps_time" field
+    """
+    for key in ["time", "gps_time"]:
+        if is_float(message.get(key, None)):
+            return float(message[key])
+    return default
+
+
+def iter_json_lines(f, offset=0):
+    """
+    Yield (offset, message) for every line of a JSON lines file
+
+    Parameters
+    ----------
+    f : file
+        File opened in binary mode
+    offset : int
+        Byte offset of the first line to parse
+    """
+    f.seek(offset)
+    for line in f:
+        line_offset = offset
+        offset += len(line)
+        if line.strip():
+            yield line_offset, json.loads(line)
+
+
+def iter_json_object(f, offset=None, chunk_size=CHUNK_SIZE):
+    """
+    Yield (offset, key, value) for every member of a top level JSON object,
+    without loading the whole object
+
+    Parameters
+    ----------
+    f : file
+        File opened in binary mode
+    offset : int, optional
+        Byte offset of a member key to start from, e.g. from the sidecar
+        index, by default the object is parsed from the start of the file
+    chunk_size : int
+        Bytes read at a time
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    f.seek(offset or 0)
+    # buf holds the decoded text from byte offset position onwards
+    position = offset or 0
+    buf = ""
+    i = 0
+    eof = False
+
+    def read():
+        nonlocal buf, eof
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buf += utf8.decode(chunk, final=eof)
+
+    def skip(chars):
+        # advance past chars, return the next character ("" at the end)
+        nonlocal i
+        while True:
+            while i < len(buf) and buf[i] in chars:
+                i += 1
+            if i < len(buf) or eof:
+                return buf[i] if i < len(buf) else ""
+            read()
+
+    def decode():
+        # a value ending exactly at the end of buf may be a truncated number
+        nonlocal i
+        skip(WHITESPACE)
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, i)
+                if end < len(buf) or eof:
+                    i = end
+                    return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            read()
+
+    if offset is None:
+        if skip(WHITESPACE) != "{":
+            raise ValueError(f"{f.name} is not a JSON object")
+        i += 1
+
+    while True:
+        if skip(WHITESPACE + ",") in ["}", ""]:
+            return
+        # drop the parsed text, so buf only holds the current member
+        position += len(buf[:i].encode("utf-8"))
+        buf = buf[i:]
+        i = 0
+        member_offset = position
+        key = decode()
+        if skip(WHITESPACE) != ":":
+            raise ValueError(f"{f.name}: expected ':' at byte {member_offset}")
+        i += 1
+        yield member_offset, key, decode()
+
+
+class ReplayReader:
+    """
+    Streaming reader of a replay capture
+
+    Iterating yields (timestamp, message) pairs in file order, where the
+    timestamp is the key of an aligned .json capture or the recorded time of
+    a mqtt log message (None if the message has none).
+
+    Parameters
+    ----------
+    path : str
+        Aligned .json capture or mqtt-*.log JSON lines file
+    start_time : float, optional
+        Skip the messages recorded before start_time, seeking with the
+        sidecar index (built on first use)
+    end_time : float, optional
+        Stop at the first message recorded after end_time
+    read_ahead : int
+        Messages parsed ahead by a background thread, 0 parses on demand
+    index_every : int
+        Messages between two entries of the sidecar index
+    """
+
+    def __init__(
+        self, path, start_time=None, end_time=None, read_ahead=64, index_every=100
+    ):
+        self.path = path
+        self.start_time = start_time
+        self.end_time = end_time
+        self.read_ahead = read_ahead
+        self.index_every = index_every
+        self.index_path = f"{path}{INDEX_SUFFIX}"
+
+    def __iter__(self):
+        if self.read_ahead > 0:
+            return self.read_buffered()
+        return self.read()
+
+    def parse(self, offset=None):
+        """
+        Yield (offset, timestamp, message) from the byte offset of a message
+        """
+        opener = gzip.open if self.path.endswith(".gz") else open
+        with opener(self.path, "rb") as f:
+            if self.path.removesuffix(".gz").endswith(".json"):
+                for member_offset, key, message in iter_json_object(f, offset):
+                    timestamp = float(key) if is_float(key) else message_time(message)
+                    yield member_offset, timestamp, message
+            else:
+                for line_offset, message in iter_json_lines(f, offset or 0):
+                    yield line_offset, message_time(message), message
+
+    def read(self):
+        """
+        Yield the (timestamp, message) pairs of the time window
+        """
+        offset = None
+        if self.start_time is not None:
+            offset = self.seek(self.start_time)
+        for _, timestamp, message in self.parse(offset):
+            if timestamp is not None:
+                if self.start_time is not None and timestamp < self.start_time:
+                    continue
+                if self.end_time is not None and timestamp > self.end_time:
+                    return
+            yield timestamp, message
+
+    def read_buffered(self):
+        """
+        read() with the parsing done by a background thread, at most
+        read_ahead messages ahead of the consumer
+        """
+        buffer = queue.Queue(maxsize=self.read_ahead)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    buffer.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce():
+            try:
+                for item in self.read():
+                    if not put(item):
+                        return
+            except Exception as err:  # pylint: disable=broad-except
+                put(err)
+            else:
+                put(_DONE)
+
+        thread = threading.Thread(target=produce, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = buffer.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # stop the producer if the consumer stops early
+            stop.set()
+
+    def load_index(self):
+        """
+        Entries of the sidecar index, None if it is missing or stale
+        """
+        try:
+            with open(self.index_path, "r", encoding="UTF-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+        stat = os.stat(self.path)
+        if index.get("size") != stat.st_size or index.get("mtime") != stat.st_mtime:
+            return None
+        return index["entries"]
+
+    def build_index(self):
+        """
+        Index the [timestamp, offset] of every index_every-th message and
+        save it next to the capture
+
+        Returns
+        -------
+        entries : list
+            Index entries, empty if the capture is not in time order
+        """
+        entries = []
+        last_timestamp = None
+        for i, (offset, timestamp, _) in enumerate(self.parse()):
+            if timestamp is None:
+                continue
+            if last_timestamp is not None and timestamp < last_timestamp:
+                logging.warning(f"{self.path} is not in time order, seeking disabled")
+                entries = []
+                break
+            last_timestamp = timestamp
+            if i % self.index_every == 0:
+                entries.append([timestamp, offset])
+        stat = os.stat(self.path)
+        index = {"size": stat.st_size, "mtime": stat.st_mtime, "entries": entries}
+        try:
+            with open(self.index_path, "w", encoding="UTF-8") as f:
+                json.dump(index, f)
+        except OSError as err:
+            logging.warning(f"could not write replay index: {err}")
+        return entries
+
+    def seek(self, start_time):
+        """
+        Byte offset of the last indexed message recorded at or before
+        start_time, None to parse from the start
+        """
+        entries = self.load_index()
+        if entries is None:
+            entries = self.build_index()
+        i = bisect.bisect_right([entry[0] for entry in entries], start_time) - 1
+        if i < 0:
+            return None
+        return entries[i][1]
@@ -1,12 +1,11 @@
 import ast
-import os
 import re
-from datetime import datetime
 
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
+from .catalog import RunCatalog
 from .definitions import RUN_DIR
 from .utils import read_header_log
 
@@ -1060,8 +1059,11 @@ def get_config(method_name, run_name):
     """
     Results file reader functions
     """
-    config = read_header_log(f"{RUN_DIR}/{method_name}/{run_name}_header.txt")
-    config["Methods"]["reward"] = config["Methods"].get("reward", "range_reward")
+    with RunCatalog(RUN_DIR) as catalog:
+        config = catalog.config(method_name, run_name)
+    if config is None:
+        config = read_header_log(f"{RUN_DIR}/{method_name}/{run_name}_header.txt")
+        config["Methods"]["reward"] = config["Methods"].get("reward", "range_reward")
     return config
 
 
@@ -1077,77 +1079,13 @@ def append_metric_avgs(df, metrics):
 
 
 def get_valid_runs(method_name):
-    files = os.listdir("{}/{}/".format(RUN_DIR, method_name))
-    runs = list(set([f.split("_")[0] for f in files]))
-    valid_runs = []
-    for r in runs:
-        if (r + "_data.csv" in files) and (r + "_header.txt" in files):
-            try:
-                get_config(method_name, r)
-                valid_runs.append(r)
-            except:
-                pass
-    return valid_runs
+    with RunCatalog(RUN_DIR) as catalog:
+        return catalog.runs(method_name)
 
 
 def filter_runs(method_name, config_filter=None):
-    runs = get_valid_runs(method_name)
-
-    filtered_runs = []
-
-    for r in runs:
-        match = True
-        if method_name == "baseline":
-            config = get_config(method_name, r)["Methods"]
-            config.update(get_config(method_name, r)["Defaults"])
-        else:
-            config = get_config(method_name, r)["Methods"]
-        for k, v in config_filter.items():
-            if k == "target_speed":
-                v = float(v)
-                if ((config.get(k) is None) and (v != 1.0)) or (
-                    float(config.get(k)) != v
-                ):
-                    match = False
-                    break
-            elif k == "target_start":
-                if isinstance(v, list):
-                    if config.get(k, None) not in v:
-                        match = False
-                        break
-                else:
-                    if config.get(k) is None or float(config.get(k)) != float(v):
-                        match = False
-                        break
-            elif k == "datetime_start":
-                config_datetime = datetime.strptime(v, "%Y-%m-%dT%H:%M:%S")
-                run_datetime = datetime.strptime(r, "%Y-%m-%dT%H:%M:%S")
-                if run_datetime < config_datetime:
-                    match = False
-                    break
-            elif k == "datetime_end":
-                config_datetime = datetime.strptime(v, "%Y-%m-%dT%H:%M:%S")
-                run_datetime = datetime.strptime(r, "%Y-%m-%dT%H:%M:%S")
-                if run_datetime > config_datetime:
-                    match = False
-                    break
-            elif k == "fading_sigma":
-                v = float(v)
-                if float(config.get(k, 0.0)) != v:
-                    match = False
-                    break
-            elif k == "particle_resample":
-                v = float(v)
-                if float(config.get(k, 0.005)) != v:
-                    match = False
-                    break
-            elif config.get(k) != v:
-                match = False
-                break
-        if match:
-            filtered_runs.append(r)
-
-    return filtered_runs
+    with RunCatalog(RUN_DIR) as catalog:
+        return catalog.query(method_name, config_filter)
 
 
 def show_results():
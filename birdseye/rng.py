@@ -0,0 +1,58 @@
+"""
+Random number generator helpers
+"""
+import numpy as np
+
+
+class RNGContext:
+    """
+    Independent NumPy Generators for each BirdsEye component, spawned
+    from a single seed so runs can be reproduced bit-for-bit.
+
+    Parameters
+    ----------
+    seed : {None, int, array_like, SeedSequence}
+        Seed for the root SeedSequence. None draws fresh OS entropy.
+    """
+
+    components = ("state", "sensor", "filter", "planner")
+
+    def __init__(self, seed=None):
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_sequence = seed
+        else:
+            self.seed_sequence = np.random.SeedSequence(seed)
+        children = self.seed_sequence.spawn(len(self.components))
+        for name, child in zip(self.components, children):
+            setattr(self, name, np.random.default_rng(child))
+
+    @property
+    def entropy(self):
+        """Root entropy, log this to reproduce a run"""
+        return self.seed_sequence.entropy
+
+    def spawn(self, n):
+        """
+        Spawn n statistically independent contexts, e.g. one per worker
+        """
+        return [RNGContext(child) for child in self.seed_sequence.spawn(n)]
+
+
+def parse_seed(seed):
+    """
+    Parse a seed from a config value
+
+    Parameters
+    ----------
+    seed : str
+        Empty or "none" for fresh entropy, otherwise one or more comma
+        separated integers, e.g. "1234" or "1234,5"
+
+    Returns
+    -------
+    seed : None or list of int
+        Seed accepted by RNGContext
+    """
+    if seed is None or str(seed).strip().lower() in ("", "none"):
+        return None
+    return [int(x) for x in str(seed).split(",")]
@@ -0,0 +1,143 @@
+"""
+Persisted per-experiment index of run summaries used by ResultsReader
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .runlog import COLUMNS_DIR
+from .runlog import SCHEMA_FILE
+from .runlog import has_run_log
+from .runlog import load_run_log
+
+INDEX_FILE = "summary_index.json"
+# per step curves are kept for every CURVE_STRIDE-th step, what the plots use
+CURVE_STRIDE = 20
+
+
+def run_mtime(log_dir):
+    """
+    Latest modification time of a run directory and its log files
+    """
+    paths = [
+        log_dir,
+        os.path.join(log_dir, "config.log"),
+        os.path.join(log_dir, "data.log"),
+        os.path.join(log_dir, COLUMNS_DIR, SCHEMA_FILE),
+    ]
+    return max(os.path.getmtime(p) for p in paths if os.path.exists(p))
+
+
+def summarize_run(log_dir):
+    """
+    Summary statistics, run length and config of a single run
+
+    Parameters
+    ----------
+    log_dir : str
+        Run log directory
+
+    Returns
+    -------
+    dict
+        mtime, config and, if the run has a log, a summary with length,
+        mean plan time, final per target max std dev, final centroid rmse
+        and strided std dev and rmse curves
+    """
+    entry = {"mtime": run_mtime(log_dir), "config": {}, "summary": None}
+    config_file = os.path.join(log_dir, "config.log")
+    if os.path.exists(config_file):
+        with open(config_file, "r", encoding="UTF-8") as f:
+            entry["config"] = json.load(f)
+    if not has_run_log(log_dir):
+        return entry
+
+    log = load_run_log(log_dir)
+    summary = {"length": len(log)}
+    if len(log) and "plan_time" in log.columns:
+        summary["plan_time_mean"] = float(np.mean(log.column("plan_time")))
+    if len(log) and "std_dev_cartesian" in log.columns:
+        std_dev = np.max(np.asarray(log.column("std_dev_cartesian")), axis=-1)
+        summary["final_std_dev_max"] = std_dev[-1].tolist()
+        summary["std_dev_curve"] = np.mean(std_dev, axis=-1)[::CURVE_STRIDE].tolist()
+    if len(log) and "centroid_distance_err" in log.columns:
+        rmse = np.sqrt(
+            np.mean(np.square(np.asarray(log.column("centroid_distance_err"))), axis=-1)
+        )
+        summary["final_rmse"] = float(rmse[-1])
+        summary["rmse_curve"] = rmse[::CURVE_STRIDE].tolist()
+    entry["summary"] = summary
+    return entry
+
+
+class RunIndex:
+    """
+    Index of run summaries persisted next to the runs of an experiment.
+    Runs whose directory or log files changed since they were indexed are
+    summarized again, in parallel.
+
+    Parameters
+    ----------
+    parent_logs_dir : str
+        Experiment directory containing the *_logs run directories
+    n_workers : int, optional
+        Worker processes used to summarize runs, defaults to the number of cores
+    """
+
+    def __init__(self, parent_logs_dir, n_workers=None):
+        self.index_path = os.path.join(parent_logs_dir, INDEX_FILE)
+        self.n_workers = n_workers or os.cpu_count()
+        self.entries = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r", encoding="UTF-8") as f:
+                    self.entries = json.load(f)
+            except ValueError:
+                # corrupt index, rebuild it
+                self.entries = {}
+
+    def update(self, log_dirs):
+        """
+        Bring the index up to date for log_dirs and return their entries
+
+        Parameters
+        ----------
+        log_dirs : list of str
+            Run log directories
+
+        Returns
+        -------
+        dict
+            Entry of each run, keyed by run directory name
+        """
+        names = {os.path.basename(os.path.normpath(d)): d for d in log_dirs}
+        stale = [
+            d
+            for name, d in names.items()
+            if name not in self.entries or self.entries[name]["mtime"] != run_mtime(d)
+        ]
+        if stale:
+            if self.n_workers > 1 and len(stale) > 1:
+                with ProcessPoolExecutor(
+                    max_workers=min(self.n_workers, len(stale))
+                ) as executor:
+                    summaries = list(executor.map(summarize_run, stale))
+            else:
+                summaries = [summarize_run(d) for d in stale]
+            for d, entry in zip(stale, summaries):
+                self.entries[os.path.basename(os.path.normpath(d))] = entry
+
+        removed = set(self.entries) - set(names)
+        for name in removed:
+            del self.entries[name]
+        if stale or removed:
+            self.save()
+        return {name: self.entries[name] for name in names}
+
+    def save(self):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="UTF-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.index_path)
@@ -0,0 +1,264 @@
+"""
+Columnar run log
+
+Every numeric field of the per step data dict is stored as a raw float64
+file of fixed width rows (columns/<name>.bin), described by
+columns/schema.json. Fields that are not numeric arrays are stored as JSON
+lines (columns/<name>.jsonl). Rows are buffered in memory and written in
+chunks, and readers memory map only the columns they need. A numeric field
+whose shape or type changes during the run, e.g. None on some steps, is
+moved to a JSON column.
+"""
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+COLUMNS_DIR = "columns"
+SCHEMA_FILE = "schema.json"
+
+
+def numeric_array(value):
+    """
+    Return value as a float64 array, or None if it is not numeric
+    """
+    try:
+        array = np.asarray(value)
+    except ValueError:
+        # ragged
+        return None
+    if array.dtype.kind not in "biuf":
+        return None
+    return array.astype(np.float64)
+
+
+class ColumnarLogWriter:
+    """
+    Buffered writer of a columnar run log
+
+    The schema is taken from the first row: numeric fields become fixed
+    shape binary columns and everything else a JSON column. A binary column
+    becomes a JSON column, rows written so far included, as soon as a row
+    does not match its shape.
+
+    Parameters
+    ----------
+    logdir : str
+        Run log directory, the columns are written to logdir/columns/
+    chunk_size : int
+        Number of rows buffered in memory before they are written
+    """
+
+    def __init__(self, logdir, chunk_size=64):
+        self.column_dir = os.path.join(logdir, COLUMNS_DIR)
+        self.chunk_size = chunk_size
+        self.schema = None
+        self.buffer = {}
+        self.n_buffered = 0
+        self.n_rows = 0
+
+    def init_schema(self, data):
+        columns = {}
+        json_columns = []
+        for name, value in data.items():
+            array = numeric_array(value)
+            if array is None:
+                json_columns.append(name)
+            else:
+                columns[name] = {"dtype": "float64", "shape": list(array.shape)}
+        self.schema = {"n_rows": 0, "columns": columns, "json_columns": json_columns}
+        self.buffer = {name: [] for name in data}
+        Path(self.column_dir).mkdir(parents=True, exist_ok=True)
+
+    def append(self, data):
+        """
+        Append one row, a dict with the same fields as the first row
+        """
+        if self.schema is None:
+            self.init_schema(data)
+        if set(data) != set(self.buffer):
+            raise ValueError(
+                f"row fields {sorted(data)} do not match log fields {sorted(self.buffer)}"
+            )
+        for name, column in list(self.schema["columns"].items()):
+            array = numeric_array(data[name])
+            if array is None or list(array.shape) != column["shape"]:
+                self.to_json_column(name)
+            else:
+                self.buffer[name].append(array)
+        for name in self.schema["json_columns"]:
+            self.buffer[name].append(data[name])
+        self.n_buffered += 1
+        if self.n_buffered >= self.chunk_size:
+            self.flush()
+
+    def to_json_column(self, name):
+        """
+        Move a binary column and its written rows to a JSON column
+        """
+        shape = self.schema["columns"].pop(name)["shape"]
+        self.schema["json_columns"].append(name)
+        path = os.path.join(self.column_dir, f"{name}.bin")
+        if os.path.exists(path):
+            rows = np.fromfile(path, dtype=np.float64).reshape([-1] + shape)
+            self.write_json(name, rows)
+            self.write_schema()
+            os.remove(path)
+
+    def write_json(self, name, values):
+        # deferred, utils imports this module
+        from .utils import NumpyEncoder  # pylint: disable=import-outside-toplevel
+
+        with open(
+            os.path.join(self.column_dir, f"{name}.jsonl"), "a", encoding="UTF-8"
+        ) as f:
+            for value in values:
+                f.write(json.dumps(value, cls=NumpyEncoder))
+                f.write("\n")
+
+    def write_schema(self):
+        with open(
+            os.path.join(self.column_dir, SCHEMA_FILE), "w", encoding="UTF-8"
+        ) as f:
+            json.dump(self.schema, f)
+
+    def flush(self):
+        """
+        Write the buffered rows and update the schema
+        """
+        if self.schema is None or self.n_buffered == 0:
+            return
+        for name in self.schema["columns"]:
+            with open(os.path.join(self.column_dir, f"{name}.bin"), "ab") as f:
+                np.asarray(self.buffer[name], dtype=np.float64).tofile(f)
+        for name in self.schema["json_columns"]:
+            self.write_json(name, self.buffer[name])
+        self.n_rows += self.n_buffered
+        self.schema["n_rows"] = self.n_rows
+        self.write_schema()
+        self.buffer = {name: [] for name in self.buffer}
+        self.n_buffered = 0
+
+    def __len__(self):
+        return self.n_rows + self.n_buffered
+
+
+class RunLog:
+    """
+    Common interface of run logs: len() is the number of steps, column(name)
+    an array with one row per step, and indexing or iterating gives the
+    per step data dicts of data.log.
+    """
+
+    columns = ()
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def column(self, name):
+        raise NotImplementedError
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return {name: self.column(name)[index] for name in self.columns}
+
+    def __iter__(self):
+        columns = {name: self.column(name) for name in self.columns}
+        for i in range(len(self)):
+            yield {name: column[i] for name, column in columns.items()}
+
+
+class ColumnarLog(RunLog):
+    """
+    Reader of a columnar run log, binary columns are memory mapped
+    """
+
+    def __init__(self, logdir):
+        self.column_dir = os.path.join(logdir, COLUMNS_DIR)
+        with open(
+            os.path.join(self.column_dir, SCHEMA_FILE), "r", encoding="UTF-8"
+        ) as f:
+            self.schema = json.load(f)
+        self.columns = list(self.schema["columns"]) + list(
+            self.schema["json_columns"]
+        )
+        self.cache = {}
+
+    def __len__(self):
+        return self.schema["n_rows"]
+
+    def column(self, name):
+        if name not in self.cache:
+            if name in self.schema["columns"]:
+                shape = self.schema["columns"][name]["shape"]
+                if len(self) == 0:
+                    self.cache[name] = np.empty([0] + shape)
+                else:
+                    self.cache[name] = np.memmap(
+                        os.path.join(self.column_dir, f"{name}.bin"),
+                        dtype=np.float64,
+                        mode="r",
+                        shape=tuple([len(self)] + shape),
+                    )
+            elif name in self.schema["json_columns"]:
+                with open(
+                    os.path.join(self.column_dir, f"{name}.jsonl"),
+                    "r",
+                    encoding="UTF-8",
+                ) as f:
+                    self.cache[name] = [
+                        json.loads(line) for line, _ in zip(f, range(len(self)))
+                    ]
+            else:
+                raise KeyError(name)
+        return self.cache[name]
+
+
+class JSONRunLog(RunLog):
+    """
+    Reader of a line delimited JSON data.log, for runs from before the
+    columnar format
+    """
+
+    def __init__(self, log_file):
+        self.data = []
+        with open(log_file, "r", encoding="UTF-8") as infile:
+            for line in infile:
+                self.data.append(json.loads(line))
+        self.columns = list(self.data[0]) if self.data else []
+        self.cache = {}
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def column(self, name):
+        if name not in self.cache:
+            values = [d[name] for d in self.data]
+            array = numeric_array(values)
+            self.cache[name] = values if array is None else array
+        return self.cache[name]
+
+
+def has_run_log(logdir):
+    return os.path.exists(
+        os.path.join(logdir, COLUMNS_DIR, SCHEMA_FILE)
+    ) or os.path.exists(os.path.join(logdir, "data.log"))
+
+
+def load_run_log(logdir):
+    """
+    Load the run log of a run directory, columnar if present, else data.log
+    """
+    if os.path.exists(os.path.join(logdir, COLUMNS_DIR, SCHEMA_FILE)):
+        return ColumnarLog(logdir)
+    return JSONRunLog(os.path.join(logdir, "data.log"))
@@ -0,0 +1,165 @@
+"""
+Bounded process pool for running experiment sweeps
+"""
+import json
+import logging
+import os
+import sys
+from concurrent.futures import as_completed
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .definitions import RUN_DIR
+from .rng import RNGContext
+
+# Environment variables read by the BLAS/OpenMP backends when they load
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+
+def pin_threads(n_threads=1):
+    """
+    Limit BLAS, OpenMP and torch to n_threads in the current process, so a
+    pool of workers does not oversubscribe the cores.
+    """
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(n_threads)
+    try:
+        from threadpoolctl import threadpool_limits
+
+        threadpool_limits(n_threads)
+    except ImportError:
+        pass
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(n_threads)
+
+
+def run_unit(fn, config, trial):
+    """
+    Worker entry point, runs a single (config, trial) work unit
+    """
+    fn(config, trial)
+    return config["experiment_name"], trial
+
+
+class ExperimentScheduler:
+    """
+    Runs every (config, trial) pair of a sweep on a bounded pool of worker
+    processes. Completed units are appended to a progress file in the run
+    directory, so an interrupted sweep skips them when started again.
+
+    Parameters
+    ----------
+    sweep_name : str
+        Name of the sweep, progress is tracked in RUN_DIR/<sweep_name>/
+    n_workers : int, optional
+        Number of worker processes, defaults to the number of cores
+    run_dir : str, optional
+        Parent directory of the sweep directory
+    """
+
+    def __init__(self, sweep_name="batch", n_workers=None, run_dir=RUN_DIR):
+        self.sweep_dir = f"{run_dir}/{sweep_name}/"
+        Path(self.sweep_dir).mkdir(parents=True, exist_ok=True)
+        self.progress_path = f"{self.sweep_dir}progress.log"
+        self.n_workers = n_workers or os.cpu_count()
+        self.entropy = self.sweep_entropy()
+
+    def sweep_entropy(self):
+        """
+        Root seed entropy of the sweep, persisted so a resumed sweep draws
+        the same per-unit seeds
+        """
+        sweep_path = f"{self.sweep_dir}sweep.json"
+        if os.path.exists(sweep_path):
+            with open(sweep_path, "r", encoding="UTF-8") as f:
+                return json.load(f)["entropy"]
+        entropy = RNGContext().entropy
+        with open(sweep_path, "w", encoding="UTF-8") as f:
+            json.dump({"entropy": entropy}, f)
+        return entropy
+
+    def completed(self):
+        """
+        Set of (experiment_name, trial) units already completed
+        """
+        if not os.path.exists(self.progress_path):
+            return set()
+        done = set()
+        with open(self.progress_path, "r", encoding="UTF-8") as f:
+            for line in f:
+                if line.strip():
+                    unit = json.loads(line)
+                    done.add((unit["experiment_name"], unit["trial"]))
+        return done
+
+    def mark_completed(self, experiment_name, trial):
+        with open(self.progress_path, "a", encoding="UTF-8") as f:
+            f.write(json.dumps({"experiment_name": experiment_name, "trial": trial}))
+            f.write("\n")
+
+    def run(self, fn, configs, n_trials):
+        """
+        Run fn(config, trial) for every config and trial not yet completed
+
+        Each config must have a unique "experiment_name". Configs without a
+        "seed" are seeded from the sweep entropy, their index and the trial,
+        so every work unit gets a deterministic, independent stream.
+
+        Parameters
+        ----------
+        fn : callable
+            Picklable (module level) function taking (config, trial)
+        configs : list of dict
+            Experiment configurations
+        n_trials : int
+            Number of trials per configuration
+
+        Returns
+        -------
+        failed : list
+            (experiment_name, trial) units that raised an exception
+        """
+        done = self.completed()
+        units = []
+        for i, config in enumerate(configs):
+            for trial in range(n_trials):
+                if (config["experiment_name"], trial) not in done:
+                    unit_config = dict(config)
+                    unit_config.setdefault("seed", f"{self.entropy},{i},{trial}")
+                    units.append((unit_config, trial))
+        logging.info(
+            f"{len(units)} work units to run ({len(done)} already completed) "
+            f"on {self.n_workers} workers"
+        )
+
+        # set before the workers start so BLAS picks it up on import
+        for var in THREAD_ENV_VARS:
+            os.environ.setdefault(var, "1")
+
+        failed = []
+        with ProcessPoolExecutor(
+            max_workers=self.n_workers, initializer=pin_threads
+        ) as executor:
+            futures = {
+                executor.submit(run_unit, fn, config, trial): (
+                    config["experiment_name"],
+                    trial,
+                )
+                for config, trial in units
+            }
+            for future in as_completed(futures):
+                unit = futures[future]
+                try:
+                    future.result()
+                except Exception:  # pylint: disable=broad-except
+                    logging.exception(f"Work unit {unit} failed")
+                    failed.append(unit)
+                else:
+                    self.mark_completed(*unit)
+        return failed
@@ -2,8 +2,11 @@ import csv
 import random
 
 import numpy as np
-from scipy.constants import speed_of_light
-from timeit import default_timer as timer
+
+from .instrument import timed
+
+# m/s, scipy.constants.speed_of_light without importing scipy.constants
+speed_of_light = 299792458.0
 
 
 class Sensor:
@@ -60,9 +63,11 @@ def rssi(
     directivity_tx=1,
     freq=5.7e9,
     fading_sigma=None,
+    rng=None,
 ):
     """
-    Calculate the received signal strength at a receiver in dB
+    Calculate the received signal strength at a receiver in dB, fading is
+    drawn from rng (np.random if None)
     """
     power_rx = (
         float(power_tx) - 30 # -30 dbm to dbW
@@ -74,7 +79,9 @@ def rssi(
     )
     # fading
     if fading_sigma:
-        power_rx -= np.random.normal(0, fading_sigma)
+        if rng is None:
+            rng = np.random
+        power_rx -= rng.normal(0, fading_sigma)
     return power_rx
 
 
@@ -104,6 +111,60 @@ def power_to_dB(power):
     return 10 * np.log10(power)
 
 
+class RSSITable:
+    """
+    Noise free RSSI of one transmitter precomputed per bearing bin of the
+    receive antenna, the quantized likelihood mode of the RSSI sensors
+
+    The free space model is separable in (range, bearing): the RSSI at
+    distance d and bearing bin b is table[b] - 20 log10(d), with table[b]
+    the RSSI at 1 m, so the range axis of the lattice needs no bins and no
+    interpolation. Bearings are binned like get_directivity and lookups
+    match rssi() to rounding, without its per call conversions and the
+    dB to power round trip of the sensors.
+
+    Parameters
+    ----------
+    radiation_pattern : array_like
+        Receive antenna gain (dB) per degree, see get_radiation_pattern
+    power_tx : float
+        Transmit power (dBm)
+    directivity_tx : float
+        Transmit antenna gain (dB)
+    freq : float
+        Transmit frequency (Hz)
+    """
+
+    def __init__(self, radiation_pattern, power_tx=26, directivity_tx=1, freq=5.7e9):
+        self.table = rssi(
+            1.0,
+            np.asarray(radiation_pattern, dtype=float),
+            power_tx=power_tx,
+            directivity_tx=directivity_tx,
+            freq=freq,
+        )
+
+    def lookup(self, distance, theta):
+        """
+        Expected RSSI (dB) of the transmitter
+
+        Parameters
+        ----------
+        distance : array_like
+            Distance to the transmitter (m)
+        theta : array_like
+            Bearing of the transmitter relative to the antenna (rad)
+
+        Returns
+        -------
+        array_like
+            RSSI of the shape of distance
+        """
+        bearing_bins = (np.asarray(theta) * 180 / np.pi).astype(int)
+        directional = np.take(self.table, bearing_bins, mode="wrap")
+        return directional - 20 * np.log10(distance)
+
+
 class DoubleRSSILofi(Sensor):
     """
     Uses RSSI comparison from two opposite facing Yagi/directional antennas
@@ -116,6 +177,8 @@ class DoubleRSSILofi(Sensor):
         directivity_tx=1,
         freq=5.7e9,
         fading_sigma=None,
+        rng=None,
+        rssi_table=False,
     ):
         self.radiation_pattern = get_radiation_pattern(
             antenna_filename=antenna_filename
@@ -127,8 +190,33 @@ class DoubleRSSILofi(Sensor):
         self.fading_sigma = fading_sigma
         if self.fading_sigma:
             self.fading_sigma = float(self.fading_sigma)
+        self.rng = rng if rng is not None else np.random.default_rng()
+        # quantized likelihood mode, expected RSSI looked up in a table
+        self.rssi_table = None
+        if rssi_table:
+            self.rssi_table = RSSITable(
+                self.radiation_pattern,
+                power_tx=self.power_tx,
+                directivity_tx=self.directivity_tx,
+                freq=self.freq,
+            )
 
     def weight(self, hyp, obs, state=None):
+        return np.exp(self.log_weight(hyp, obs))
+
+    def log_weight(self, hyp, obs, state=None):
+        """
+        Gaussian log likelihood (up to a constant) of the observed front and
+        back RSSI difference, finite where the likelihood underflows
+
+        Parameters
+        ----------
+        hyp : array_like
+            Expected front and back RSSI of each particle, shape
+            (n_particles, 2)
+        obs : array_like
+            Observed front and back RSSI, shape (1, 2)
+        """
         # TODO add front, mid, back
         # expected_rssi = hyp # array [# of particles x 2 rssi readings(front rssi & back rssi)]
         expected_rssi = hyp
@@ -139,9 +227,7 @@ class DoubleRSSILofi(Sensor):
         # Gaussian weighting function
         numerator = np.power(expected_diff - observed_diff, 2.0)
         denominator = 2 * np.power(self.std_dev, 2.0)
-        weight = np.exp(-numerator / denominator)  # + 0.000000001
-        # likelihood = np.prod(weight, axis=1)
-        return weight
+        return -numerator / denominator
 
     def weight3(self, hyp, obs):
         # TODO add front, mid, back
@@ -199,6 +285,28 @@ class DoubleRSSILofi(Sensor):
             likelihood = match + unsure + no_match
         return likelihood
 
+    def expected_rssi(self, distance, theta):
+        """
+        Noise free RSSI (dB) of a target, from the RSSI table if enabled
+
+        Parameters
+        ----------
+        distance : array_like
+            Distance to the target (m)
+        theta : array_like
+            Bearing of the target relative to the front antenna (rad)
+        """
+        if self.rssi_table is not None:
+            return self.rssi_table.lookup(distance, theta)
+        directivity_rx = get_directivity(self.radiation_pattern, theta)
+        return rssi(
+            distance,
+            directivity_rx,
+            power_tx=self.power_tx,
+            directivity_tx=self.directivity_tx,
+            freq=self.freq,
+        )
+
     # samples observation given state
     def observation(self, state, **kwargs):
         # Calculate observation for multiple targets
@@ -208,33 +316,49 @@ class DoubleRSSILofi(Sensor):
             distance = ts[0]
             theta_front = ts[1] * np.pi / 180.0
             theta_back = theta_front + np.pi
-            directivity_rx_front = get_directivity(self.radiation_pattern, theta_front)
-            directivity_rx_back = get_directivity(self.radiation_pattern, theta_back)
-            power_front += dB_to_power(
-                rssi(
-                    distance,
-                    directivity_rx_front,
-                    power_tx=self.power_tx,
-                    directivity_tx=self.directivity_tx,
-                    freq=self.freq,
-                    fading_sigma=self.fading_sigma,
-                )
-            )
-            power_back += dB_to_power(
-                rssi(
-                    distance,
-                    directivity_rx_back,
-                    power_tx=self.power_tx,
-                    directivity_tx=self.directivity_tx,
-                    freq=self.freq,
-                    fading_sigma=self.fading_sigma,
-                )
-            )
+            rssi_front = self.expected_rssi(distance, theta_front)
+            rssi_back = self.expected_rssi(distance, theta_back)
+            # fading
+            if self.fading_sigma:
+                rssi_front -= self.rng.normal(0, self.fading_sigma)
+                rssi_back -= self.rng.normal(0, self.fading_sigma)
+            power_front += dB_to_power(rssi_front)
+            power_back += dB_to_power(rssi_back)
         rssi_front = power_to_dB(power_front)
         rssi_back = power_to_dB(power_back)
 
         return [rssi_front, rssi_back]
 
+    @timed("sensor.observation_vectorized")
+    def observation_vectorized(self, states, fading_sigma=None):
+        """
+        Front and back RSSI of many joint states
+
+        Parameters
+        ----------
+        states : array_like
+            Target states of every joint state, shape (n, n_targets, 4)
+        fading_sigma : float, optional
+            Fading of the readings, one draw per target and antenna for
+            all the states, by default the fading of the sensor
+
+        Returns
+        -------
+        array_like
+            Front and back RSSI, shape (n, 2)
+        """
+        if fading_sigma is None:
+            fading_sigma = self.fading_sigma
+        states = np.asarray(states)
+        theta_front = states[..., 1] * np.pi / 180.0
+        powers = []
+        for theta in [theta_front, theta_front + np.pi]:
+            expected = self.expected_rssi(states[..., 0], theta)
+            if fading_sigma:
+                expected -= self.rng.normal(0, fading_sigma, expected.shape[-1])
+            powers.append(np.sum(dB_to_power(expected), axis=-1))
+        return power_to_dB(np.stack(powers, axis=-1))
+
 
 class SingleRSSISeparable(Sensor):
     """
@@ -249,6 +373,8 @@ class SingleRSSISeparable(Sensor):
         freq=[5.7e9, 5.7e9],
         n_targets=2,
         fading_sigma=None,
+        rng=None,
+        rssi_table=False,
     ):
         if n_targets != len(power_tx):
             raise ValueError("len(power_tx) must equal n_targets")
@@ -271,27 +397,84 @@ class SingleRSSISeparable(Sensor):
         self.fading_sigma = fading_sigma
         if self.fading_sigma is not None:
             self.fading_sigma = float(self.fading_sigma)
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        # quantized likelihood mode, the expected RSSI of the particles is
+        # looked up in one table per distinct transmitter
+        self.rssi_tables = None
+        if rssi_table:
+            tables = {}
+            self.rssi_tables = []
+            for key in zip(power_tx, directivity_tx, freq):
+                if key not in tables:
+                    tables[key] = RSSITable(
+                        self.radiation_pattern,
+                        power_tx=key[0],
+                        directivity_tx=key[1],
+                        freq=key[2],
+                    )
+                self.rssi_tables.append(tables[key])
 
     def weight(self, hyp, obs):
-        start = timer()
-        # array of shape (# of particles)
+        """
+        Gaussian likelihood of the observed RSSI readings
+
+        Parameters
+        ----------
+        hyp : array_like
+            Expected RSSI of each particle, shape (n_particles, 1)
+        obs : array_like
+            Observed RSSI readings of the step, shape (1, n_obs)
+
+        Returns
+        -------
+        weight : array_like
+            Product of the likelihoods of the n_obs readings, shape
+            (n_particles)
+        """
+        return np.exp(self.log_weight(hyp, obs))
+
+    @timed("sensor.log_weight")
+    def log_weight(self, hyp, obs):
+        """
+        Gaussian log likelihood (up to a constant) of the observed RSSI
+        readings, finite where weight() underflows to 0
+
+        Parameters
+        ----------
+        hyp : array_like
+            Expected RSSI of each particle, shape (n_particles, 1)
+        obs : array_like
+            Observed RSSI readings of the step, shape (1, n_obs)
+
+        Returns
+        -------
+        log_weight : array_like
+            Sum of the log likelihoods of the n_obs readings, shape
+            (n_particles)
+        """
         expected_rssi = hyp
         observed_rssi = obs
-        # Gaussian weighting function
-        numerator = np.power(expected_rssi - observed_rssi, 2.0)
+        # Gaussian weighting function, the product over readings is the
+        # exponential of the summed squared errors
+        numerator = np.sum(np.power(expected_rssi - observed_rssi, 2.0), axis=-1)
         denominator = 2 * np.power(self.std_dev, 2.0)
-        weight = np.exp(-numerator / denominator)  # + 0.000000001
-        weight = np.squeeze(weight)
-        end = timer()
-        # print(f"weight: {end-start}")
-        return weight
+        return np.squeeze(-numerator / denominator)
 
     # samples observation given state
+    @timed("sensor.observation_vectorized")
     def observation_vectorized(self, states, target, fading_sigma=None):
-        start = timer()
         if fading_sigma is None:
             fading_sigma = self.fading_sigma
 
+        if self.rssi_tables is not None:
+            theta = states[:, 1] * np.pi / 180.0
+            rssi_power = self.rssi_tables[target].lookup(states[:, 0], theta)
+            # fading
+            if fading_sigma:
+                rssi_power -= self.rng.normal(0, fading_sigma)
+            return rssi_power
+
         # Calculate observation for specified target
         power = 0
 
@@ -306,12 +489,11 @@ class SingleRSSISeparable(Sensor):
                 directivity_tx=self.directivity_tx[target],
                 freq=self.freq[target],
                 fading_sigma=fading_sigma,
+                rng=self.rng,
             )
         )
         rssi_power = power_to_dB(power)
         # return [rssi_power]
-        end = timer()
-        # print(f"observation: {end-start}")
         return rssi_power
 
     # samples observation given state
@@ -333,6 +515,7 @@ class SingleRSSISeparable(Sensor):
                 directivity_tx=self.directivity_tx[target],
                 freq=self.freq[target],
                 fading_sigma=fading_sigma,
+                rng=self.rng,
             )
         )
         rssi_power = power_to_dB(power)
@@ -351,6 +534,7 @@ class SingleRSSI(Sensor):
         directivity_tx=1,
         freq=5.7e9,
         fading_sigma=None,
+        rng=None,
     ):
         self.radiation_pattern = get_radiation_pattern(
             antenna_filename=antenna_filename
@@ -365,6 +549,7 @@ class SingleRSSI(Sensor):
         self.fading_sigma = fading_sigma
         if self.fading_sigma:
             self.fading_sigma = float(self.fading_sigma)
+        self.rng = rng if rng is not None else np.random.default_rng()
 
     def weight(self, hyp, obs):
         # array [# of particles x 1 rssi reading]
@@ -396,6 +581,7 @@ class SingleRSSI(Sensor):
                     directivity_tx=self.directivity_tx,
                     freq=self.freq,
                     fading_sigma=fading_sigma,
+                    rng=self.rng,
                 )
             )
         rssi_front = power_to_dB(power_front)
@@ -414,6 +600,7 @@ class DoubleRSSI(Sensor):
         directivity_tx=1,
         freq=5.7e9,
         fading_sigma=None,
+        rng=None,
     ):
         self.radiation_pattern = get_radiation_pattern(
             antenna_filename=antenna_filename
@@ -425,6 +612,7 @@ class DoubleRSSI(Sensor):
         self.fading_sigma = fading_sigma
         if self.fading_sigma:
             self.fading_sigma = float(self.fading_sigma)
+        self.rng = rng if rng is not None else np.random.default_rng()
 
     def weight(self, hyp, obs, state=None):
         # array [# of particles x 2 rssi readings(front rssi & back rssi)]
@@ -455,6 +643,7 @@ class DoubleRSSI(Sensor):
                     directivity_tx=self.directivity_tx,
                     freq=self.freq,
                     fading_sigma=self.fading_sigma,
+                    rng=self.rng,
                 )
             )
             power_back += dB_to_power(
@@ -465,6 +654,7 @@ class DoubleRSSI(Sensor):
                     directivity_tx=self.directivity_tx,
                     freq=self.freq,
                     fading_sigma=self.fading_sigma,
+                    rng=self.rng,
                 )
             )
         rssi_front = power_to_dB(power_front)
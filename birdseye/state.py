@@ -1,12 +1,12 @@
-import random
-
 import numpy as np
-from scipy.ndimage import gaussian_filter
-from timeit import default_timer as timer
 
 
-from .utils import cart2pol
-from .utils import pol2cart
+from .core import cart2pol
+from .core import pol2cart
+from .instrument import timed
+from .lazy import lazy_import
+
+ndimage = lazy_import("scipy.ndimage")
 
 
 class State:
@@ -43,8 +43,11 @@ class RFMultiState(State):
         particle_distance=None,
         reward=None,
         simulated=True,
+        rng=None,
     ):
         self.state_dim = 4
+        # Random number generator used by the vectorized samplers
+        self.rng = rng if rng is not None else np.random.default_rng()
         # Target Settings
         # Transition probability
         self.prob_target_change_crs = prob
@@ -115,7 +118,7 @@ class RFMultiState(State):
             Randomly generated state variable array
         """
         # state is [range, heading, relative course, own speed]
-        return np.array([self.random_state() for _ in range(self.n_targets)])
+        return self.random_states(self.n_targets)
 
     def init_particle_state(self):
         """Function to initialize a random particle state
@@ -126,7 +129,22 @@ class RFMultiState(State):
             Randomly generated state variable array
         """
         # state is [range, heading, relative course, own speed]
-        return np.array([self.random_particle_state() for _ in range(self.n_targets)])
+        return self.random_particle_states(self.n_targets)
+
+    def init_particle_states(self, n):
+        """Function to initialize n random joint particle states
+
+        Parameters
+        ----------
+        n : integer
+            Number of particles
+
+        Returns
+        -------
+        array_like
+            Array of shape (n, 4 * n_targets) with one joint state per row
+        """
+        return self.random_particle_states(n * self.n_targets).reshape(n, -1)
 
     def random_particle_state(self):
         """Function to initialize a random state
@@ -137,14 +155,86 @@ class RFMultiState(State):
             Randomly generated state variable array
         """
         # state is [range, heading, relative course, own speed]
-        return np.array(
-            [
-                random.randint(1, int(self.particle_distance)),
-                random.randint(0, 359),
-                random.randint(0, 11) * 30,
-                self.target_speed,
-            ]
-        )
+        return self.random_particle_states(1)[0]
+
+    def random_particle_states(self, n):
+        """Function to initialize n random particle states
+
+        Parameters
+        ----------
+        n : integer
+            Number of particles
+
+        Returns
+        -------
+        array_like
+            Array of shape (n, 4) of randomly generated states
+        """
+        # state is [range, heading, relative course, own speed]
+        return np.column_stack(
+            (
+                self.rng.integers(1, int(self.particle_distance), n, endpoint=True),
+                self.rng.integers(0, 359, n, endpoint=True),
+                self.rng.integers(0, 11, n, endpoint=True) * 30,
+                np.full(n, self.target_speed),
+            )
+        ).astype(float)
+
+    def belief_particle_states(self, n, particles, sigmas=(1, 2, 2)):
+        """Function to draw n particle states from a previous belief
+
+        Parameters
+        ----------
+        n : integer
+            Number of particles
+        particles : array_like
+            Array of shape (m, 4) of particles from a previous belief
+        sigmas : tuple
+            Standard deviation of the jitter added to range, heading and course
+
+        Returns
+        -------
+        array_like
+            Array of shape (n, 4) of resampled states
+        """
+        particles = np.asarray(particles, dtype=float)
+        states = particles[self.rng.integers(0, len(particles), n)]
+        states[:, [0, 1, 2]] += self.rng.normal(0, sigmas, (n, 3))
+        states[:, 0] = np.clip(states[:, 0], a_min=1, a_max=None)
+        states[:, [1, 2]] %= 360
+        return states
+
+    def gps_particle_states(
+        self, n, distance, bearing, range_sigma=10, bearing_sigma=10
+    ):
+        """Function to draw n particle states around a known target position
+
+        Parameters
+        ----------
+        n : integer
+            Number of particles
+        distance : float
+            Distance from the sensor to the target (m)
+        bearing : float
+            Bearing of the target relative to the sensor heading (deg)
+        range_sigma : float
+            Standard deviation of the range (m)
+        bearing_sigma : float
+            Standard deviation of the bearing (deg)
+
+        Returns
+        -------
+        array_like
+            Array of shape (n, 4) of states centered on the target
+        """
+        return np.column_stack(
+            (
+                np.clip(self.rng.normal(distance, range_sigma, n), 1, None),
+                self.rng.normal(bearing, bearing_sigma, n) % 360,
+                self.rng.integers(0, 11, n, endpoint=True) * 30,
+                np.full(n, self.target_speed),
+            )
+        ).astype(float)
 
     def random_state(self):
         """Function to initialize a random state
@@ -155,15 +245,31 @@ class RFMultiState(State):
             Randomly generated state variable array
         """
         # state is [range, heading, relative course, own speed]
-        return np.array(
-            [
-                # random.randint(50, self.target_start + 25),
-                random.randint(50, 100),
-                random.randint(0, 359),
-                random.randint(0, 11) * 30,
-                self.target_speed,
-            ]
-        )
+        return self.random_states(1)[0]
+
+    def random_states(self, n):
+        """Function to initialize n random states
+
+        Parameters
+        ----------
+        n : integer
+            Number of states
+
+        Returns
+        -------
+        array_like
+            Array of shape (n, 4) of randomly generated states
+        """
+        # state is [range, heading, relative course, own speed]
+        return np.column_stack(
+            (
+                # self.rng.integers(50, self.target_start + 25, n, endpoint=True),
+                self.rng.integers(50, 100, n, endpoint=True),
+                self.rng.integers(0, 359, n, endpoint=True),
+                self.rng.integers(0, 11, n, endpoint=True) * 30,
+                np.full(n, self.target_speed),
+            )
+        ).astype(float)
 
     def init_sensor_state(self):
         # state is [range, heading, relative course, own speed]
@@ -303,7 +409,7 @@ class RFMultiState(State):
             pf_theta = np.radians(particles[:, (4 * t) + 1])
             pf_x, pf_y = pol2cart(pf_r, pf_theta)
             b, _, _ = np.histogram2d(pf_x, pf_y, bins=(xedges, yedges))
-            b = gaussian_filter(b, sigma=8)
+            b = ndimage.gaussian_filter(b, sigma=8)
             b += 0.0000001
             b /= np.sum(b)
             H += -1.0 * np.sum([b * np.log(b)])
@@ -315,6 +421,7 @@ class RFMultiState(State):
 
         return -1.0 * cost
 
+    @timed("state.update_state_vectorized")
     def update_state_vectorized(self, state, control, **kwargs):
         """Update state based on state and action
 
@@ -332,9 +439,7 @@ class RFMultiState(State):
         """
         original_shape = state.shape
         state = np.atleast_2d(state)
-        total_start = timer()
         # Get current state vars
-        start = timer()
         r = state[:, 0]
         theta = state[:, 1]
         crs = state[:, 2]
@@ -346,36 +451,23 @@ class RFMultiState(State):
         control_theta = control[0]
         control_spd = control[1]
 
-        end = timer()
-        # print(f"1: {end-start}")
-
-        start = timer()
         theta = theta % 360
         theta -= control_theta
         theta = theta % 360
         theta[theta < 0] += 360
-        end = timer()
-        # print(f"2: {end-start}")
         # if theta < 0:
         #     theta += 360
 
-        start = timer()
         crs = crs % 360
         crs -= control[0]
         crs[crs < 0] += 360
         # if crs < 0:
         #     crs += 360
         crs = crs % 360
-        end = timer()
-        # print(f"3: {end-start}")
-        start = timer()
         # Get cartesian coords
         x, y = pol2cart(r, np.radians(theta))
-        end = timer()
-        # print(f"4: {end-start}")
-        start = timer()
         # Generate next course given current course
-        crs += np.random.choice(
+        crs += self.rng.choice(
             [0, -30, 30],
             size=len(crs),
             p=[
@@ -390,17 +482,11 @@ class RFMultiState(State):
 
         crs %= 360
         crs[crs < 0] += 360
-        end = timer()
-        # print(f"5: {end-start}")
-        start = timer()
         # if crs < 0:
         #     crs += 360
 
         # Transform changes to coords to cartesian
         dx, dy = pol2cart(spd, np.radians(crs))
-        end = timer()
-        # print(f"6: {end-start}")
-        start = timer()
         new_x = x + dx - control_spd
         new_y = y + dy
         # pos = [x + dx - control_spd, y + dy]
@@ -409,9 +495,6 @@ class RFMultiState(State):
         theta_rad = np.arctan2(new_y, new_x)
         theta = np.degrees(theta_rad)
         theta[theta < 0] += 360
-        end = timer()
-        # print(f"7: {end-start}")
-        # print(f"total: {end-total_start}")
         # if theta < 0:
         #     theta += 360
 
@@ -420,6 +503,69 @@ class RFMultiState(State):
         new_state = np.reshape(new_state, original_shape)
         return new_state
 
+    def update_states_batched(self, states, controls):
+        """Update the states of many episodes, each with its own control
+
+        Parameters
+        ----------
+        states : array_like
+            States of shape (n_episodes, ..., 4)
+        controls : array_like
+            Controls of shape (n_episodes, 2), (delta heading, speed)
+
+        Returns
+        -------
+        array_like
+            Updated states with the same shape as states
+        """
+        # broadcast each episode's control over its remaining axes
+        shape = (len(states),) + (1,) * (states.ndim - 2)
+        control_theta = np.reshape(controls[:, 0], shape)
+        control_spd = np.reshape(controls[:, 1], shape)
+        r, theta, crs, spd = np.moveaxis(states, -1, 0)
+
+        theta = (theta - control_theta) % 360
+        crs = (crs - control_theta) % 360
+        x, y = pol2cart(r, np.radians(theta))
+
+        # Generate next course given current course, keep it with
+        # prob_target_change_crs, otherwise turn by -30 or 30 with equal odds
+        u = self.rng.random(crs.shape)
+        turn = np.where(u < (1 + self.prob_target_change_crs) / 2, -30, 30)
+        crs = (crs + np.where(u < self.prob_target_change_crs, 0, turn)) % 360
+
+        dx, dy = pol2cart(spd, np.radians(crs))
+        new_x = x + dx - control_spd
+        new_y = y + dy
+        r = np.sqrt(new_x**2 + new_y**2)
+        theta = np.degrees(np.arctan2(new_y, new_x)) % 360
+        return np.stack((r, theta, crs, spd), axis=-1)
+
+    def update_sensors_batched(self, sensor_states, controls):
+        """Update the absolute sensor states of many episodes, see update_sensor
+
+        Parameters
+        ----------
+        sensor_states : array_like
+            Sensor states of shape (n_episodes, 4)
+        controls : array_like
+            Controls of shape (n_episodes, 2), (delta heading, speed)
+
+        Returns
+        -------
+        array_like
+            Updated sensor states of shape (n_episodes, 4)
+        """
+        r, theta_deg, crs, _ = sensor_states.T
+        spd = controls[:, 1]
+        crs = (crs + controls[:, 0]) % 360
+        x, y = pol2cart(r, np.radians(theta_deg))
+        dx, dy = pol2cart(spd, np.radians(crs))
+        x, y = x + dx, y + dy
+        r = np.sqrt(x**2 + y**2)
+        theta_deg = np.degrees(np.arctan2(y, x)) % 360
+        return np.stack((r, theta_deg, crs, spd), axis=-1)
+
     # returns new state given last state and action (control)
 
     def update_sim_state(
@@ -462,8 +608,8 @@ class RFMultiState(State):
         x, y = pol2cart(r, np.radians(theta))
 
         # Generate next course given current course
-        if random.random() >= self.prob_target_change_crs:
-            crs += random.choice([-1, 1]) * 30
+        if self.rng.random() >= self.prob_target_change_crs:
+            crs += self.rng.choice([-1, 1]) * 30
         crs %= 360
         if crs < 0:
             crs += 360
@@ -509,9 +655,9 @@ class RFMultiState(State):
 
         # Get current state vars
         r, theta_deg, crs, spd = state
-        if random.random() >= self.prob_target_change_crs:
-            crs += random.choice([-1, 1]) * 30
-        spd = random.randint(0, 1)
+        if self.rng.random() >= self.prob_target_change_crs:
+            crs += self.rng.choice([-1, 1]) * 30
+        spd = self.rng.integers(0, 1, endpoint=True)
         control_spd = distance
         control_course = course % 360
         control_delta_heading = (heading - self.sensor_state[2]) % 360
@@ -583,7 +729,25 @@ class RFMultiState(State):
 
     # returns absolute state given base state(absolute) and relative state
     def get_absolute_state(self, relative_state):
-        r_t, theta_t, crs_t, spd = relative_state
+        return list(self.get_absolute_states(relative_state))
+
+    def get_absolute_states(self, relative_states):
+        """Absolute states of states relative to the sensor
+
+        Parameters
+        ----------
+        relative_states : array_like
+            States of shape (..., 4), (range, bearing, relative course, speed)
+
+        Returns
+        -------
+        array_like
+            States of shape (..., 4), (range, bearing, course, speed) from the
+            origin of the sensor state
+        """
+        r_t, theta_t, crs_t, spd = np.moveaxis(
+            np.asarray(relative_states, dtype=float), -1, 0
+        )
         r_s, theta_s, crs_s, _ = self.sensor_state
 
         x_t, y_t = pol2cart(r_t, np.radians(theta_t + crs_s))
@@ -592,11 +756,79 @@ class RFMultiState(State):
         x = x_t + x_s
         y = y_t + y_s
         r = np.sqrt(x**2 + y**2)
-        theta_deg = np.degrees(np.arctan2(y, x))
-        if theta_deg < 0:
-            theta_deg += 360
+        theta_deg = np.degrees(np.arctan2(y, x)) % 360
+
+        return np.stack((r, theta_deg, crs_s + crs_t, spd), axis=-1)
+
+    def sensor_pose(self):
+        """Position (x, y) in meters from the origin and heading of the sensor"""
+        r_s, theta_s, heading, _ = self.sensor_state
+        x_s, y_s = pol2cart(r_s, np.radians(theta_s))
+        return x_s, y_s, heading
+
+    def world_states(self, relative_states):
+        """Convert states relative to the sensor to the world frame
+
+        Parameters
+        ----------
+        relative_states : array_like
+            States of shape (..., 4), (range, bearing, relative course, speed)
+
+        Returns
+        -------
+        array_like
+            States of shape (..., 4), (x, y, course, speed) with x east and y
+            north in meters from the origin of the sensor state
+        """
+        r, theta, crs, spd = np.moveaxis(np.asarray(relative_states, float), -1, 0)
+        x_s, y_s, heading = self.sensor_pose()
+        x, y = pol2cart(r, np.radians(theta + heading))
+        return np.stack((x + x_s, y + y_s, (crs + heading) % 360, spd), axis=-1)
+
+    def relative_states(self, world_states):
+        """Convert world frame states to states relative to the sensor, the
+        inverse of world_states
+
+        Parameters
+        ----------
+        world_states : array_like
+            States of shape (..., 4), (x, y, course, speed)
+
+        Returns
+        -------
+        array_like
+            States of shape (..., 4), (range, bearing, relative course, speed)
+        """
+        x, y, crs, spd = np.moveaxis(np.asarray(world_states, float), -1, 0)
+        x_s, y_s, heading = self.sensor_pose()
+        dx, dy = x - x_s, y - y_s
+        theta = (np.degrees(np.arctan2(dy, dx)) - heading) % 360
+        return np.stack((np.sqrt(dx**2 + dy**2), theta, (crs - heading) % 360, spd), -1)
+
+    @timed("state.update_world_states")
+    def update_world_states(self, states):
+        """Move world frame target states by one step, the target motion of
+        update_real_state without the sensor motion
+
+        Parameters
+        ----------
+        states : array_like
+            States of shape (..., 4), (x, y, course, speed)
 
-        return [r, theta_deg, crs_s + crs_t, spd]
+        Returns
+        -------
+        array_like
+            Updated states with the same shape as states
+        """
+        x, y, crs, _ = np.moveaxis(np.asarray(states, float), -1, 0)
+        # keep the course with prob_target_change_crs, otherwise turn by -30
+        # or 30 with equal odds
+        u = self.rng.random(crs.shape)
+        turn = np.where(u < (1 + self.prob_target_change_crs) / 2, -30, 30)
+        crs = (crs + np.where(u < self.prob_target_change_crs, 0, turn)) % 360
+        spd = self.rng.integers(0, 1, crs.shape, endpoint=True).astype(float)
+        dx, dy = pol2cart(spd, np.radians(crs))
+        return np.stack((x + dx, y + dy, crs, spd), axis=-1)
 
     def circular_control(self, size):
         self.target_move_iter += 1
@@ -616,7 +848,10 @@ class RFState(State):
         target_movement=None,
         target_start=None,
         reward=None,
+        rng=None,
     ):
+        # Random number generator used by the vectorized samplers
+        self.rng = rng if rng is not None else np.random.default_rng()
         # Transition probability
         self.prob_target_change_crs = prob
         # Target speed
@@ -661,11 +896,13 @@ class RFState(State):
         # return np.array([random.randint(25,100), random.randint(0,359), random.randint(0,11)*30, self.target_speed])
         return np.array(
             [
-                random.randint(
-                    int(self.target_start - 25), int(self.target_start + 25)
+                self.rng.integers(
+                    int(self.target_start - 25),
+                    int(self.target_start + 25),
+                    endpoint=True,
                 ),
-                random.randint(0, 359),
-                random.randint(0, 11) * 30,
+                self.rng.integers(0, 359, endpoint=True),
+                self.rng.integers(0, 11, endpoint=True) * 30,
                 self.target_speed,
             ]
         )
@@ -679,14 +916,30 @@ class RFState(State):
             Randomly generated state variable array
         """
         # state is [range, heading, relative course, own speed]
-        return np.array(
-            [
-                random.randint(10, 200),
-                random.randint(0, 359),
-                random.randint(0, 11) * 30,
-                self.target_speed,
-            ]
-        )
+        return self.random_states(1)[0]
+
+    def random_states(self, n):
+        """Function to initialize n random states
+
+        Parameters
+        ----------
+        n : integer
+            Number of states
+
+        Returns
+        -------
+        array_like
+            Array of shape (n, 4) of randomly generated states
+        """
+        # state is [range, heading, relative course, own speed]
+        return np.column_stack(
+            (
+                self.rng.integers(10, 200, n, endpoint=True),
+                self.rng.integers(0, 359, n, endpoint=True),
+                self.rng.integers(0, 11, n, endpoint=True) * 30,
+                np.full(n, self.target_speed),
+            )
+        ).astype(float)
 
     def init_sensor_state(self):
         # state is [range, heading, relative course, own speed]
@@ -795,17 +1048,17 @@ class RFState(State):
 
         # Generate next course given current course
         if target_update:
-            spd = random.choice(self.target_speed_range)
+            spd = self.rng.choice(self.target_speed_range)
             if self.target_movement == "circular":
                 d_crs, circ_spd = self.circular_control(50)
                 crs += d_crs
                 spd = circ_spd
             else:
-                if random.random() >= self.prob_target_change_crs:
-                    crs += random.choice([-1, 1]) * 30
+                if self.rng.random() >= self.prob_target_change_crs:
+                    crs += self.rng.choice([-1, 1]) * 30
         else:
-            if random.random() >= self.prob_target_change_crs:
-                crs += random.choice([-1, 1]) * 30
+            if self.rng.random() >= self.prob_target_change_crs:
+                crs += self.rng.choice([-1, 1]) * 30
         crs %= 360
         if crs < 0:
             crs += 360
@@ -847,7 +1100,25 @@ class RFState(State):
 
     # returns absolute state given base state(absolute) and relative state
     def get_absolute_state(self, relative_state):
-        r_t, theta_t, crs_t, spd = relative_state
+        return list(self.get_absolute_states(relative_state))
+
+    def get_absolute_states(self, relative_states):
+        """Absolute states of states relative to the sensor
+
+        Parameters
+        ----------
+        relative_states : array_like
+            States of shape (..., 4), (range, bearing, relative course, speed)
+
+        Returns
+        -------
+        array_like
+            States of shape (..., 4), (range, bearing, course, speed) from the
+            origin of the sensor state
+        """
+        r_t, theta_t, crs_t, spd = np.moveaxis(
+            np.asarray(relative_states, dtype=float), -1, 0
+        )
         r_s, theta_s, crs_s, _ = self.sensor_state
 
         x_t, y_t = pol2cart(r_t, np.radians(theta_t + crs_s))
@@ -856,11 +1127,9 @@ class RFState(State):
         x = x_t + x_s
         y = y_t + y_s
         r = np.sqrt(x**2 + y**2)
-        theta_deg = np.degrees(np.arctan2(y, x))
-        if theta_deg < 0:
-            theta_deg += 360
+        theta_deg = np.degrees(np.arctan2(y, x)) % 360
 
-        return [r, theta_deg, crs_s + crs_t, spd]
+        return np.stack((r, theta_deg, crs_s + crs_t, spd), axis=-1)
 
     def circular_control(self, size):
         self.target_move_iter += 1
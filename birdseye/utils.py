@@ -9,206 +9,45 @@ import os
 import datetime
 from collections import defaultdict
 from io import BytesIO
-from itertools import permutations
 from itertools import product
 from pathlib import Path
-import pandas as pd
-from pyparsing import col
-import seaborn as sns
 
-
-import imageio
-import matplotlib.pyplot as plt
-from matplotlib.lines import Line2D
-import matplotlib.patheffects as pe
-import matplotlib.patches as mpatches
-from matplotlib import colormaps
 import numpy as np
-import pandas as pd
-import requests
-from PIL import Image
-from scipy.ndimage import gaussian_filter
 
+from .core import angle_diff
+from .core import cart2pol
+from .core import circ_tangents
+from .core import get_distance
+from .core import get_heading
+from .core import is_float
+from .core import particle_swap
+from .core import particles_centroid_xy
+from .core import particles_mean_belief
+from .core import permute_particle
+from .core import pol2cart
+from .core import targets_found
+from .core import tracking_error
+from .core import tracking_metrics_separable
+from .lazy import lazy_import
 from .definitions import REPO_DIR
 from .definitions import RUN_DIR
-
-
-def targets_found(env, min_std_dev):
-    std_dev = np.amax(
-        env.get_particle_std_dev_cartesian(), axis=1
-    )  # get maximum standard deviation axis for each target
-    not_found = np.where(std_dev > min_std_dev)
-    if len(not_found[0]) == 0:
-        return True
-    return False
-
-
-def permute_particle(particle):
-    return np.hstack((particle[4:], particle[:4]))
-
-
-def particle_swap(env):
-    # 2000 x 8
-    particles = np.copy(env.pf.particles)
-    n_targets = env.state.n_targets
-    state_dim = 4
-
-    # convert particles to cartesian
-    for i in range(n_targets):
-        x, y = pol2cart(
-            particles[:, state_dim * i], np.radians(particles[:, (state_dim * i) + 1])
-        )
-        particles[:, state_dim * i] = x
-        particles[:, (state_dim * i) + 1] = y
-
-    swapped = True
-    k = 0
-    while swapped and k < 10:
-        k += 1
-        swapped = False
-        for i in range(len(particles)):
-            original_particle = np.copy(particles[i])
-            target_centroids = [
-                np.mean(particles[:, state_dim * t : (state_dim * t) + 2])
-                for t in range(n_targets)
-            ]
-            distance = 0
-            for t in range(n_targets):
-                dif = (
-                    particles[i, state_dim * t : (state_dim * t) + 2]
-                    - target_centroids[t]
-                )
-                distance += np.dot(dif, dif)
-
-            permuted_particle = permute_particle(particles[i])
-            particles[i] = permuted_particle
-            permuted_target_centroids = [
-                np.mean(particles[:, state_dim * t : (state_dim * t) + 2])
-                for t in range(n_targets)
-            ]
-            permuted_distance = 0
-            for t in range(n_targets):
-                dif = (
-                    particles[i, state_dim * t : (state_dim * t) + 2]
-                    - permuted_target_centroids[t]
-                )
-                permuted_distance += np.dot(dif, dif)
-
-            if distance < permuted_distance:
-                particles[i] = original_particle
-            else:
-                swapped = True
-
-    # convert particles to polar
-    for i in range(n_targets):
-        rho, phi = cart2pol(
-            particles[:, state_dim * i], particles[:, (state_dim * i) + 1]
-        )
-        particles[:, state_dim * i] = rho
-        particles[:, (state_dim * i) + 1] = np.degrees(phi)
-
-    env.pf.particles = particles
-
-
-def circ_tangents(point, center, radius):
-    px, py = point
-    cx, cy = center
-
-    b = np.sqrt((px - cx) ** 2 + (py - cy) ** 2)
-    if radius >= b:
-        ##print(f"Warning: No tangents are possible.  radius >= distance to circle center ({radius} >= {b})")
-        return None
-    th = np.arccos(radius / b)
-    d = np.arctan2(py - cy, px - cx)
-    d1 = d + th
-    d2 = d - th
-
-    tangents = [
-        [cx + radius * np.cos(d1), cy + radius * np.sin(d1)],
-        [cx + radius * np.cos(d2), cy + radius * np.sin(d2)],
-    ]
-    v = np.array(point) - np.array(center)
-    v /= np.linalg.norm(v)
-    intersection = np.array(center) + radius * v
-    tangents.append(list(intersection))
-    return np.array(tangents)
-
-
-def pol2cart(rho, phi):
-    """
-    Transform polar to cartesian
-    """
-    x = rho * np.cos(phi)
-    y = rho * np.sin(phi)
-    return (x, y)
-
-
-def cart2pol(x, y):
-    """
-    Transform cartesian to polar
-    """
-    rho = np.sqrt(x**2 + y**2)
-    phi = np.arctan2(y, x)
-    return rho, phi
-
-
-def get_distance(coord1, coord2):
-    """
-    Get the distance between two coordinates
-    """
-    if (coord1 is None) or (coord2 is None):
-        return None
-
-    lat1, long1 = coord1
-    lat2, long2 = coord2
-    # approximate radius of earth in km
-    R = 6373.0
-
-    lat1 = np.radians(lat1)
-    long1 = np.radians(long1)
-
-    lat2 = np.radians(lat2)
-    long2 = np.radians(long2)
-
-    dlon = long2 - long1
-    dlat = lat2 - lat1
-
-    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
-    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
-
-    distance = R * c
-    return distance * (1e3)
-
-
-def get_heading(coord1, coord2):
-    """
-    Get the heading of two coordinates
-    """
-    if (coord1 is None) or (coord2 is None):
-        return None
-
-    lat1, long1 = coord1
-    lat2, long2 = coord2
-    dLon = long2 - long1
-    x = np.cos(np.radians(lat2)) * np.sin(np.radians(dLon))
-    y = np.cos(np.radians(lat1)) * np.sin(np.radians(lat2)) - np.sin(
-        np.radians(lat1)
-    ) * np.cos(np.radians(lat2)) * np.cos(np.radians(dLon))
-    brng = np.arctan2(x, y)
-    brng = np.degrees(brng)
-
-    return -brng + 90
-
-
-def is_float(element):
-    """
-    Check if an element is a float or not
-    """
-    try:
-        float(element)
-        return True
-    except (ValueError, TypeError):
-        return False
+from .runlog import ColumnarLogWriter
+from .runlog import JSONRunLog
+from .runlog import load_run_log
+from .run_index import CURVE_STRIDE
+from .run_index import RunIndex
+
+# plotting, dataframe and map tile dependencies are only imported when used
+imageio = lazy_import("imageio")
+mpl = lazy_import("matplotlib")
+mlines = lazy_import("matplotlib.lines")
+mpatches = lazy_import("matplotlib.patches")
+plt = lazy_import("matplotlib.pyplot")
+ndimage = lazy_import("scipy.ndimage")
+pd = lazy_import("pandas")
+requests = lazy_import("requests")
+sns = lazy_import("seaborn")
+Image = lazy_import("PIL.Image")
 
 
 class GPSVis:
@@ -448,45 +287,58 @@ class NumpyEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, np.ndarray):
             return obj.tolist()
+        if isinstance(obj, np.generic):
+            return obj.item()
         return json.JSONEncoder.default(self, obj)
 
 
 class ResultsReader:
     """
     ResultsReader class for loading run results
+
+    Metrics are computed from a summary index of the runs that is built in
+    parallel, persisted in the experiment directory and refreshed for runs
+    that changed. The full per step logs are loaded on first access of
+    log_data.
     """
 
-    def __init__(
-        self,
-        experiment_name="",
-    ):
+    def __init__(self, experiment_name="", n_workers=None):
         self.parent_logs_dir = f"{RUN_DIR}/{experiment_name}/"
         self.log_dirs = [
             f"{self.parent_logs_dir}{d}"
             for d in os.listdir(self.parent_logs_dir)
             if d.endswith("_logs")
         ]
-        self.log_data = {}
+        entries = RunIndex(self.parent_logs_dir, n_workers=n_workers).update(
+            self.log_dirs
+        )
+        self._log_data = None
         self.log_config = {}
+        self.summaries = {}
         for d in self.log_dirs:
-            log_file = f"{d}/data.log"
-            if os.path.exists(log_file):
-                self.log_data[d] = self.load_log(f"{d}/data.log")
-            config_file = f"{d}/config.log"
-            self.log_config[d] = read_header_log(config_file)
+            entry = entries[os.path.basename(os.path.normpath(d))]
+            if entry["summary"] is not None:
+                self.summaries[d] = entry["summary"]
+            self.log_config[d] = entry["config"]
 
             # fix missing target_speed
             if "target_speed" not in self.log_config[d]:
                 self.log_config[d]["target_speed"] = 0.5
 
+    @property
+    def log_data(self):
+        """
+        Per step run logs, keyed by run directory
+        """
+        if self._log_data is None:
+            self._log_data = {d: load_run_log(d) for d in self.summaries}
+        return self._log_data
+
     def average_plantime(self):
         """
         Get average planning time
         """
-        plan_time = []
-        for run, log_data in self.log_data.items():
-            times = [data["plan_time"] for data in log_data]
-            plan_time.append(np.mean(times))
+        plan_time = [s["plan_time_mean"] for s in self.summaries.values()]
         avg_plan_time = np.mean(plan_time)
         return avg_plan_time
 
@@ -496,40 +348,22 @@ class ResultsReader:
         """
         std_dev_all = []
         std_dev_success = []
-        for run, log_data in self.log_data.items():
-            std_dev = np.max(log_data[-1]["std_dev_cartesian"], axis=1)
-            if len(log_data) < 400:
+        for summary in self.summaries.values():
+            std_dev = summary["final_std_dev_max"]
+            if summary["length"] < 400:
                 std_dev_success.extend(std_dev)
             std_dev_all.extend(std_dev)
         avg_std_dev_all = np.mean(std_dev_all)
         avg_std_dev_success = np.mean(std_dev_success)
         return avg_std_dev_success, avg_std_dev_all
 
-    def std_dev_plot(self, ax=None, color=None, facecolor=None):
+    def curve_boxplot(self, curves, ax=None, color=None, facecolor=None):
         """
-        Get average of the max standard deviation dimension of the particle distributions
+        Boxplot of strided per step curves at steps 0, CURVE_STRIDE, ... < 400
         """
-        std_dev_all = []
-        std_dev_success = []
-        for run, log_data in self.log_data.items():
-            std_dev = [
-                np.mean(np.max(np.array(d["std_dev_cartesian"]), axis=1))
-                for d in log_data
-            ]
-            std_dev_all.append(std_dev)
-        # if ax is None:
-        #     fig = plt.figure()
-        #     ax = fig.subplots()
-        # if color is None:
-        #     color="blue"
-        # for sd in std_dev_all:
-        #     ax.scatter(range(len(sd)), sd, s=2, color=color, marker=".", alpha=0.25)
-        # plt.show()
-
-        df = pd.DataFrame(std_dev_all)
-        if df.shape[1] < 400:
-            df = df.reindex(columns=list(range(400)))
-        df = df[:][list(range(0, 400, 20))]
+        steps = list(range(0, 400, CURVE_STRIDE))
+        df = pd.DataFrame(curves).reindex(columns=list(range(len(steps))))
+        df.columns = steps
         df.boxplot(
             ax=ax,
             notch=True,
@@ -543,11 +377,16 @@ class ResultsReader:
             showfliers=False,
         )
 
-        # if experiment_name is not None:
-        #     plt.title(experiment_name)
-        # plt.show()
-
-    # df.boxplot()
+    def std_dev_plot(self, ax=None, color=None, facecolor=None):
+        """
+        Get average of the max standard deviation dimension of the particle distributions
+        """
+        self.curve_boxplot(
+            [s["std_dev_curve"] for s in self.summaries.values()],
+            ax=ax,
+            color=color,
+            facecolor=facecolor,
+        )
 
     def average_rmse(self):
         """
@@ -555,13 +394,10 @@ class ResultsReader:
         """
         rmse_success = []
         rmse_all = []
-        for run, log_data in self.log_data.items():
-            rmse = np.sqrt(
-                np.mean(np.array(log_data[-1]["centroid_distance_err"]) ** 2)
-            )
-            if len(log_data) < 400:
-                rmse_success.append(rmse)
-            rmse_all.append(rmse)
+        for summary in self.summaries.values():
+            if summary["length"] < 400:
+                rmse_success.append(summary["final_rmse"])
+            rmse_all.append(summary["final_rmse"])
 
         avg_rmse_success = np.mean(rmse_success)
         avg_rmse_all = np.mean(rmse_all)
@@ -571,69 +407,28 @@ class ResultsReader:
         """
         Get average of the max standard deviation dimension of the particle distributions
         """
-        rmse_all = []
-        for run, log_data in self.log_data.items():
-            rmse = [
-                np.sqrt(np.mean(np.array(d["centroid_distance_err"]) ** 2))
-                for d in log_data
-            ]
-            rmse_all.append(rmse)
-        # if ax is None:
-        #     fig = plt.figure()
-        #     ax = fig.subplots()
-        # if color is None:
-        #     color="blue"
-        # for sd in std_dev_all:
-        #     ax.scatter(range(len(sd)), sd, s=2, color=color, marker=".", alpha=0.25)
-        # plt.show()
-
-        df = pd.DataFrame(rmse_all)
-        if df.shape[1] < 400:
-            df = df.reindex(columns=list(range(400)))
-        df = df[:][list(range(0, 400, 20))]
-        df.boxplot(
+        self.curve_boxplot(
+            [s["rmse_curve"] for s in self.summaries.values()],
             ax=ax,
-            notch=True,
-            patch_artist=True,
-            boxprops=dict(facecolor=facecolor, color=color, alpha=0.75),
-            capprops=dict(color=color),
-            whiskerprops=dict(color=color),
-            flierprops=dict(color=color, markeredgecolor=color),
-            medianprops=dict(color=color),
-            # color=color,
-            showfliers=False,
+            color=color,
+            facecolor=facecolor,
         )
-        # if experiment_name is not None:
-        #     plt.title(experiment_name)
-        # plt.show()
 
     def rmse_plot2(self):
         """
         Get average rmse for successful and all runs
         """
-        rmse_success = []
-        rmse_all = []
-        for run, log_data in self.log_data.items():
-            rmse = np.sqrt(
-                np.mean(np.array(log_data[-1]["centroid_distance_err"]) ** 2)
-            )
-            if len(log_data) < 400:
-                rmse_success.append(rmse)
-            rmse_all.append(rmse)
-
-        avg_rmse_success = np.mean(rmse_success)
-        avg_rmse_all = np.mean(rmse_all)
-        return avg_rmse_success, avg_rmse_all
+        return self.average_rmse()
 
     def localization_probability(self):
         """
         Get the probability of successful localizations from experiment run data.
         """
         success_localize = 0
-        for run, log_data in self.log_data.items():
-            if len(log_data) < 400:
+        for summary in self.summaries.values():
+            if summary["length"] < 400:
                 success_localize += 1
-        success_localize_prob = success_localize / len(self.log_data)
+        success_localize_prob = success_localize / len(self.summaries)
         return success_localize_prob
 
     def average_localization_time(self):
@@ -642,10 +437,10 @@ class ResultsReader:
         """
         success_localize = 0
         average_localize_time = 0
-        for run, log_data in self.log_data.items():
-            if len(log_data) < 400:
+        for summary in self.summaries.values():
+            if summary["length"] < 400:
                 success_localize += 1
-                average_localize_time += len(log_data)
+                average_localize_time += summary["length"]
         average_localize_time /= success_localize
         return average_localize_time
 
@@ -654,9 +449,7 @@ class ResultsReader:
         Get the average run time of successful localization runs.
         """
 
-        runtime = []
-        for run, log_data in self.log_data.items():
-            runtime.append(len(log_data))
+        runtime = [summary["length"] for summary in self.summaries.values()]
 
         # ax.hist(runtime, color=color, bins=400)
         sns.histplot(
@@ -667,15 +460,7 @@ class ResultsReader:
         """
         Load json log file
         """
-        data = []
-        with open(
-            log_file,
-            "r",
-            encoding="UTF-8",
-        ) as infile:
-            for line in infile:
-                data.append(json.loads(line))
-        return data
+        return JSONRunLog(log_file)
 
 
 class Results:
@@ -754,6 +539,8 @@ class Results:
         self.transform = None
         self.expected_target_rssi = None
         self.target_only_map = False
+        self.log_format = config.get("log_format", "columnar").lower()
+        self.run_log = ColumnarLogWriter(self.logdir)
 
         if config:
             write_config_log(config, self.logdir)
@@ -768,6 +555,27 @@ class Results:
             array,
         )
 
+    def data_to_log(self, data):
+        """
+        Save data dict to the run log, columnar unless log_format is json
+        """
+        if self.log_format == "json":
+            self.data_to_json(data)
+        else:
+            self.data_to_columns(data)
+
+    def data_to_columns(self, data):
+        """
+        Buffer data dict in the columnar run log, see flush
+        """
+        self.run_log.append(data)
+
+    def flush(self):
+        """
+        Write buffered rows of the columnar run log
+        """
+        self.run_log.flush()
+
     def data_to_json(self, data):
         """
         Save data dict to log
@@ -992,7 +800,7 @@ class Results:
                         particles_y,
                         bins=(self.openstreetmap.xedges, self.openstreetmap.yedges),
                     )
-                    heatmap = gaussian_filter(heatmap, sigma=8)
+                    heatmap = ndimage.gaussian_filter(heatmap, sigma=8)
                     extent = [xedges[0], xedges[-1], yedges[0], yedges[-1]]
                     im = ax.imshow(
                         heatmap.T,
@@ -1034,7 +842,7 @@ class Results:
                         target_class_name = f"{class_name} particles"
 
                 legend_elements.append(
-                    Line2D(
+                    mlines.Line2D(
                         [0],
                         [0],
                         marker="o",
@@ -1046,7 +854,7 @@ class Results:
                     )
                 )
             legend_elements.append(
-                Line2D(
+                mlines.Line2D(
                     [0],
                     [0],
                     marker="^",
@@ -1116,7 +924,7 @@ class Results:
 
         # Plot targets
         if self.target_hist or self.target_gps_hist:
-            color_map = colormaps["tab10"].colors
+            color_map = mpl.colormaps["tab10"].colors
             if env.simulated:
                 n_target_hist = env.state.n_targets
             else:
@@ -1171,7 +979,7 @@ class Results:
                 )
                 # lines.extend([line5])
                 legend_elements.append(
-                    Line2D(
+                    mlines.Line2D(
                         [0],
                         [0],
                         marker="X",
@@ -1523,7 +1331,7 @@ class Results:
             heatmap, xedges, yedges = np.histogram2d(
                 all_particles_x, all_particles_y, bins=(xedges, yedges)
             )
-            heatmap = gaussian_filter(heatmap, sigma=8)
+            heatmap = ndimage.gaussian_filter(heatmap, sigma=8)
             extent = [xedges[0], xedges[-1], yedges[0], yedges[-1]]
             im = ax.imshow(
                 heatmap.T,
@@ -1678,7 +1486,7 @@ class Results:
             heatmap, xedges, yedges = np.histogram2d(
                 all_particles_x, all_particles_y, bins=(xedges, yedges)
             )
-            heatmap = gaussian_filter(heatmap, sigma=8)
+            heatmap = ndimage.gaussian_filter(heatmap, sigma=8)
             extent = [xedges[0], xedges[-1], yedges[0], yedges[-1]]
             im = ax.imshow(
                 heatmap.T,
@@ -1999,7 +1807,7 @@ class Results:
         xedges = np.arange(-150, 153, 3)
         yedges = np.arange(-150, 153, 3)
         heatmap, xedges, yedges = np.histogram2d(x, y, bins=(xedges, yedges))
-        heatmap = gaussian_filter(heatmap, sigma=5)
+        heatmap = ndimage.gaussian_filter(heatmap, sigma=5)
         extent = [xedges[0], xedges[-1], yedges[0], yedges[-1]]
         im = ax.imshow(heatmap.T, extent=extent, origin="lower", cmap="coolwarm")
         plt.colorbar(im)
@@ -2056,7 +1864,7 @@ class Results:
             np.asarray(particles_y)[:, 0],
             bins=(xedges, yedges),
         )
-        heatmap = gaussian_filter(heatmap, sigma=2)
+        heatmap = ndimage.gaussian_filter(heatmap, sigma=2)
         extent = [xedges[0], xedges[-1], yedges[0], yedges[-1]]
         im = ax.imshow(heatmap.T, extent=extent, origin="lower", cmap="coolwarm")
         plt.colorbar(im)
@@ -2103,211 +1911,3 @@ def read_header_log(filename):
         config = json.load(f)
     return config
 
-
-def particles_mean_belief(particles):
-    particles_r = particles[:, 0]
-    particles_theta = np.radians(particles[:, 1])
-    particles_x, particles_y = pol2cart(particles_r, particles_theta)
-
-    # centroid of particles x,y
-    mean_x = np.mean(particles_x)
-    mean_y = np.mean(particles_y)
-
-    # centroid of particles r,theta
-    mean_r, mean_theta = cart2pol(mean_x, mean_y)
-
-    particles_heading = particles[:, 2]
-    particles_heading_rad = np.radians(particles_heading)
-    mean_heading_rad = np.arctan2(
-        np.mean(np.sin(particles_heading_rad)), np.mean(np.cos(particles_heading_rad))
-    )
-    mean_heading = np.degrees(mean_heading_rad)
-
-    mean_spd = np.mean(particles[:, 3])
-
-    return (
-        particles_x,
-        particles_y,
-        mean_x,
-        mean_y,
-        mean_r,
-        mean_theta,
-        mean_heading,
-        mean_spd,
-    )
-
-
-def particles_centroid_xy(particles):
-    particles_r = particles[:, 0]
-    particles_theta = np.radians(particles[:, 1])
-    particles_x, particles_y = pol2cart(particles_r, particles_theta)
-
-    # centroid of particles x,y
-    mean_x = np.mean(particles_x)
-    mean_y = np.mean(particles_y)
-
-    return [mean_x, mean_y]
-
-
-def angle_diff(angle):
-    diff = angle % 360
-
-    diff = (diff + 360) % 360
-
-    diff[diff > 180] -= 360
-    return diff
-
-
-def tracking_error(all_targets, all_particles):
-    """
-    Calculate different tracking errors
-    """
-    results = []
-    r_error = None
-    theta_error = None
-    heading_error = None
-    centroid_distance_error = None
-    rmse = None
-    mae = None
-    n_targets = len(all_particles[0]) // 4
-
-    # reorder targets to fit closest particles
-    min_distance = None
-    optimal_target_permutation = None
-
-    for idxs in list(permutations(range(n_targets))):
-        target_permutation = all_targets[list(idxs)]
-
-        distance = 0
-        for t in range(n_targets):
-            particle_centroid = np.array(
-                particles_centroid_xy(all_particles[:, 4 * t : 4 * (t + 1)])
-            )
-            target = np.array(
-                pol2cart(target_permutation[t][0], np.radians(target_permutation[t][1]))
-            )
-            distance += np.linalg.norm(particle_centroid - target) ** 2
-        if min_distance is None or distance < min_distance:
-            min_distance = distance
-            optimal_target_permutation = target_permutation
-
-    for t in range(n_targets):
-        target = optimal_target_permutation[t]
-        particles = all_particles[:, 4 * t : 4 * (t + 1)]
-
-        target_r = target[0]
-        target_theta = np.radians(target[1])
-        target_heading = target[2]
-        target_x, target_y = pol2cart(target_r, target_theta)
-
-        (
-            particles_x,
-            particles_y,
-            mean_x,
-            mean_y,
-            mean_r,
-            mean_theta,
-            mean_heading,
-            mean_spd,
-        ) = particles_mean_belief(particles)
-
-        r_error = np.mean(np.abs(target_r - particles[:, 0]))
-        theta_error = np.mean(np.abs(angle_diff(target[1] - particles[:, 1])))
-        heading_diff = np.abs(np.mean(target_heading - particles[:, 2])) % 360
-        heading_error = heading_diff if heading_diff <= 180 else 360 - heading_diff
-
-        # centroid euclidean distance error x,y
-        centroid_distance_error = np.sqrt(
-            (mean_x - target_x) ** 2 + (mean_y - target_y) ** 2
-        )
-
-        mae = np.mean(
-            np.sqrt((particles_x - target_x) ** 2 + (particles_y - target_y) ** 2)
-        )
-
-        # root mean square error
-        rmse = np.sqrt(
-            np.mean((particles_x - target_x) ** 2 + (particles_y - target_y) ** 2)
-        )
-
-        results.append(
-            [r_error, theta_error, heading_error, centroid_distance_error, rmse, mae]
-        )
-    results = np.array(results).T
-
-    if len(results) > 5:
-        r_error = results[0]
-        theta_error = results[1]
-        heading_error = results[2]
-        centroid_distance_error = results[3]
-        rmse = results[4]
-        mae = results[5]
-
-    return r_error, theta_error, heading_error, centroid_distance_error, rmse, mae
-
-
-def tracking_metrics_separable(all_targets, all_particles):
-    """
-    Calculate different tracking metrics
-    """
-    results = []
-    r_error = None
-    theta_error = None
-    heading_error = None
-    centroid_distance_error = None
-    rmse = None
-    mae = None
-    n_targets, n_particles, n_states = all_particles.shape
-
-    for t in range(n_targets):
-        target = all_targets[t]
-        particles = all_particles[t]
-
-        target_r = target[0]
-        target_theta = np.radians(target[1])
-        target_heading = target[2]
-        target_x, target_y = pol2cart(target_r, target_theta)
-
-        (
-            particles_x,
-            particles_y,
-            mean_x,
-            mean_y,
-            mean_r,
-            mean_theta,
-            mean_heading,
-            mean_spd,
-        ) = particles_mean_belief(particles)
-
-        r_error = np.mean(np.abs(target_r - particles[:, 0]))
-        theta_error = np.mean(np.abs(angle_diff(target[1] - particles[:, 1])))
-        heading_diff = np.abs(np.mean(target_heading - particles[:, 2])) % 360
-        heading_error = heading_diff if heading_diff <= 180 else 360 - heading_diff
-
-        # centroid euclidean distance error x,y
-        centroid_distance_error = np.sqrt(
-            (mean_x - target_x) ** 2 + (mean_y - target_y) ** 2
-        )
-
-        mae = np.mean(
-            np.sqrt((particles_x - target_x) ** 2 + (particles_y - target_y) ** 2)
-        )
-
-        # root mean square error
-        rmse = np.sqrt(
-            np.mean((particles_x - target_x) ** 2 + (particles_y - target_y) ** 2)
-        )
-
-        results.append(
-            [r_error, theta_error, heading_error, centroid_distance_error, rmse, mae]
-        )
-    results = np.array(results).T
-
-    r_error = results[0]
-    theta_error = results[1]
-    heading_error = results[2]
-    centroid_distance_error = results[3]
-    rmse = results[4]
-    mae = results[5]
-
-    return r_error, theta_error, heading_error, centroid_distance_error, rmse, mae
@@ -1,10 +1,9 @@
 import argparse
 import base64
 import configparser
+import itertools
 import json
 import logging
-import matplotlib
-import matplotlib.pyplot as plt
 import numpy as np
 import os
 import threading
@@ -20,11 +19,14 @@ from flask import (
     url_for,
     make_response,
     jsonify,
+    Response,
 )
 from io import BytesIO
 from timeit import default_timer as timer
 
 import birdseye.env
+import birdseye.instrument as instrument
+import birdseye.scheduler
 import birdseye.mqtt
 import birdseye.sensor
 import birdseye.state
@@ -32,14 +34,27 @@ import birdseye.utils
 from birdseye.planners.light_mcts import LightMCTS
 from birdseye.planners.lavapilot import LAVAPilot
 from birdseye.planners.repp import REPP
-from birdseye.utils import (
+from birdseye.ingest import COALESCE_POLICIES
+from birdseye.ingest import coalesce
+from birdseye.ingest import MessageQueue
+from birdseye.ingest import prediction_rssi
+from birdseye.lazy import lazy_import
+from birdseye.replay import ReplayReader
+from birdseye.rng import RNGContext
+from birdseye.rng import parse_seed
+from birdseye.core import (
     get_heading,
     get_distance,
     is_float,
+    pol2cart,
     tracking_metrics_separable,
     targets_found,
 )
 
+# only imported when plotting is enabled
+matplotlib = lazy_import("matplotlib")
+plt = lazy_import("matplotlib.pyplot")
+
 ORCHESTRATOR = os.getenv("ORCHESTRATOR", "0.0.0.0")  # nosec
 
 
@@ -58,6 +73,8 @@ class GamutRFSensor(birdseye.sensor.SingleRSSISeparable):
         fading_sigma=None,
         threshold=-120,
         data={},
+        rng=None,
+        rssi_table=False,
     ):
         super().__init__(
             antenna_filename=antenna_filename,
@@ -66,6 +83,8 @@ class GamutRFSensor(birdseye.sensor.SingleRSSISeparable):
             freq=freq,
             n_targets=n_targets,
             fading_sigma=fading_sigma,
+            rng=rng,
+            rssi_table=rssi_table,
         )
         self.threshold = threshold
         self.data = data
@@ -74,6 +93,45 @@ class GamutRFSensor(birdseye.sensor.SingleRSSISeparable):
 
     def real_observation(self):
         observation = self.data.get("rssi", None)
+        if self.data.get("rssi_batch", None) is not None:
+            # every reading of the step, by class or for the single target
+            observation = self.data["rssi_batch"]
+            if type(observation) != dict:
+                observation = [observation]
+        return self.format_observation(observation)
+
+    def fused_observations(self):
+        """
+        Readings of the other fused sensors received since the last step,
+        with their pose relative to this sensor
+        """
+        fused = []
+        position = self.data.get("position", None)
+        for name, sensor in self.data.get("sensors", {}).items():
+            if not sensor["needs_processing"]:
+                continue
+            sensor["needs_processing"] = False
+            if position is None or sensor["position"] is None:
+                continue
+            # same convention as the course of the sensor motion
+            x, y = pol2cart(
+                get_distance(position, sensor["position"]),
+                np.radians(get_heading(position, sensor["position"])),
+            )
+            fused.append(
+                {
+                    "name": name,
+                    "offset": [float(x), float(y)],
+                    "heading": sensor["heading"] or 0.0,
+                    "rssi": self.format_observation(sensor["rssi"]),
+                }
+            )
+        return fused
+
+    def format_observation(self, observation):
+        """
+        Reading(s) per target of a RSSI value, list or dict by class
+        """
         default_observation = [None] * self.n_targets
 
         if observation is None:
@@ -95,7 +153,10 @@ class GamutRFSensor(birdseye.sensor.SingleRSSISeparable):
             raise ValueError("len(observation) != n_targets")
 
         for i in range(len(observation)):
-            if observation[i] and observation[i] < self.threshold:
+            if type(observation[i]) == list:
+                readings = [o for o in observation[i] if o >= self.threshold]
+                observation[i] = readings if readings else None
+            elif observation[i] and observation[i] < self.threshold:
                 observation[i] = None
 
         return observation
@@ -109,15 +170,29 @@ class NumpyEncoder(json.JSONEncoder):
 
 
 class Geolocate:
-    def __init__(self, config_path="geolocate.ini"):
+    def __init__(self, config_path="geolocate.ini", config=None):
+        """
+        Parameters
+        ----------
+        config_path : str
+            Path to the ini file with a [geolocate] section
+        config : dict, optional
+            Options overriding the ini file, e.g. the replay file of a sweep
+        """
         self.init_data()
-        config = configparser.ConfigParser()
-        config.read(config_path)
-        self.config = config["geolocate"]
+        parser = configparser.ConfigParser()
+        parser.read(config_path)
+        self.config = parser["geolocate"]
         self.config_path = config_path
         self.static_position = None
         self.static_heading = None
         self.setDaemon = False
+        self.last_belief = None
+        self.message_time = None
+        self.publish_times = []
+        # in-process broker stand-in (birdseye.mqtt_local.LocalBroker) used
+        # instead of connecting to mqtt_host, e.g. by the load generator
+        self.broker = None
 
         #### CONFIGS
         default_config = {
@@ -148,15 +223,45 @@ class Geolocate:
             "map_width": "500",
             "n_particles": "3000",
             "resample_proportion": "0.1",
+            "prior": "uniform",
+            "seed": "",
+            "metrics_file": "",
+            "replay_fast_forward": "false",
+            "replay_start_time": "",
+            "replay_end_time": "",
+            "flush_every_n": "50",
+            "results_name": "",
+            "ingest_queue_size": "1000",
+            "coalesce": "latest",
+            "mqtt_log_flush_interval": "1",
+            "mqtt_log_max_mb": "0",
+            "mqtt_log_compress": "false",
+            "step_duration": "1",
+            "fusion_sensors": "",
+            "belief_frame": "sensor",
+            "belief_backend": "particles",
+            "grid_cell_size": "2",
+            "rssi_table": "false",
+            "resample_method": "systematic",
+            "n_eff_threshold": "1",
         }
         default_config.update(self.config)
+        default_config.update(config or {})
         self.config = default_config
+        # names of the GamutRF workers fused into one belief, the first is
+        # the reference sensor the particles are relative to
+        self.fusion_sensors = [
+            name.strip()
+            for name in self.config["fusion_sensors"].split(",")
+            if name.strip()
+        ]
 
     def init_data(
         self,
     ):
         self.data = {
             "rssi": None,
+            "rssi_batch": None,
             "position": None,
             "distance": None,
             "previous_position": None,
@@ -169,6 +274,7 @@ class Geolocate:
             "gps": None,
             "targets": {},
             "target_gps": None,
+            "sensors": {},
         }
 
     def target_handler(self, message_data):
@@ -213,6 +319,8 @@ class Geolocate:
         logging.info(f"Received MQTT message: {message_data}")
         if self.data["needs_processing"]:
             logging.debug("\nReceived multiple data in one step!\n")
+            instrument.inc("messages_overwritten")
+        self.message_time = timer()
         if self.static_position:
             message_data["position"] = self.static_position
         if self.static_heading is not None:
@@ -280,6 +388,9 @@ class Geolocate:
             else (0, 0)
         )
 
+        # every reading of the step, kept by the batch coalescing policy
+        self.data["rssi_batch"] = message_data.get("rssi_batch", None)
+
         self.data["drone_position"] = message_data.get("drone_position", None)
         if self.data["drone_position"]:
             self.data["drone_position"] = [
@@ -289,12 +400,106 @@ class Geolocate:
 
         self.data["needs_processing"] = True
 
-    def run_flask(self, flask_host, flask_port, fig, results):
+    def process_messages(self, inference_queue, targets_queue, policy):
         """
-        Flask
+        Apply the MQTT messages queued since the last step
+        """
+        for _, message_data in targets_queue.drain():
+            self.target_handler(message_data)
+        messages = inference_queue.drain()
+        if self.fusion_sensors:
+            by_sensor = {}
+            for received, message_data in messages:
+                by_sensor.setdefault(message_data.get("name", None), []).append(
+                    (received, message_data)
+                )
+            for name in self.fusion_sensors[1:]:
+                if name in by_sensor:
+                    self.fusion_handler(
+                        name, coalesce([m for _, m in by_sensor[name]], policy)
+                    )
+            messages = by_sensor.get(self.fusion_sensors[0], [])
+        if not messages:
+            return
+        if len(messages) > 1:
+            instrument.inc("messages_coalesced", len(messages) - 1, policy=policy)
+        self.data_handler(coalesce([message for _, message in messages], policy))
+        # the oldest reading of the step waited longest for the filter
+        self.message_time = messages[0][0]
+        # stamped by the load generator, timer() clock of this process
+        self.publish_times = [
+            message["publish_time"]
+            for _, message in messages
+            if "publish_time" in message
+        ]
+
+    def fusion_handler(self, name, message_data):
+        """
+        Pose and RSSI of a fused sensor other than the reference sensor
+        """
+        sensor = self.data["sensors"].setdefault(
+            name, {"position": None, "heading": None, "rssi": None}
+        )
+        sensor["position"] = message_data.get("position", sensor["position"])
+        if is_float(message_data.get("heading", None)):
+            # mavlink heading is yaw relative to North
+            sensor["heading"] = -float(message_data["heading"]) + 90
+
+        class_rssi = prediction_rssi(message_data)
+        if message_data.get("rssi_batch", None) is not None:
+            rssi = message_data["rssi_batch"]
+            if type(rssi) != dict:
+                rssi = [rssi]
+        elif class_rssi:
+            rssi = {
+                class_name: float(np.mean(values))
+                for class_name, values in class_rssi.items()
+            }
+        else:
+            rssi = message_data.get("rssi", None)
+        sensor["rssi"] = rssi
+        sensor["needs_processing"] = True
+
+    def seed_target_priors(self, env, seeded_targets):
+        """
+        Center the belief of newly reported GPS targets on their position
+        """
+        if self.data["position"] is None:
+            return
+        for target_name, target in self.data["targets"].items():
+            t = target["idx"]
+            if (
+                target_name in seeded_targets
+                or t >= env.state.n_targets
+                or "position" not in target
+            ):
+                continue
+            distance = get_distance(self.data["position"], target["position"])
+            bearing = (
+                get_heading(self.data["position"], target["position"])
+                - env.state.sensor_state[2]
+            )
+            env.reseed_target(
+                t, env.state.gps_particle_states(env.n_particles, distance, bearing)
+            )
+            seeded_targets.add(target_name)
+            logging.info(f"Seeded belief of target {t} from {target_name} GPS")
+
+    def flask_app(self):
+        """
+        Flask app serving the GUI and the /metrics endpoint
         """
         app = Flask(__name__, template_folder="templates", static_folder="static")
 
+        @app.route("/metrics")
+        def metrics():
+            # snapshot of the counters updated by the main loop, in the
+            # Prometheus text exposition format
+            return Response(
+                instrument.REGISTRY.to_prometheus(),
+                mimetype="text/plain; version=0.0.4",
+            )
+
         @app.route("/gui/<path:filename>")
         def gui_file(filename):
             return send_from_directory("gui", filename)
@@ -349,6 +554,13 @@ class Geolocate:
                 return render_template("loading.html")
             return render_template("gui_from_buffer.html", config=self.config)
 
+        return app
+
+    def run_flask(self, flask_host, flask_port, fig, results):
+        """
+        Flask
+        """
+        app = self.flask_app()
         host_name = flask_host
         port = flask_port
         self.flask_thread = threading.Thread(
@@ -359,17 +571,19 @@ class Geolocate:
         self.flask_thread.daemon = self.setDaemon
         self.flask_thread.start()
 
-    def get_replay_json(self, replay_file):
-        with open(replay_file, "r", encoding="UTF-8") as open_file:
-            replay_data = json.load(open_file)
-            for ts in replay_data:
-                yield replay_data[ts]
-
-    def get_replay_log(self, replay_file):
-        with open(replay_file, "r", encoding="UTF-8") as open_file:
-            for line in open_file:
-                replay_data = json.loads(line)
-                yield replay_data
+    def write_outputs(self, log_path, particle_saves, data_lines):
+        """
+        Write the buffered particle arrays and data log lines
+        """
+        with instrument.span("geolocate.particle_save"):
+            for path, particles in particle_saves:
+                np.save(path, particles)
+        with instrument.span("geolocate.data_save"):
+            if data_lines:
+                with open(log_path, "a", encoding="UTF-8") as outfile:
+                    outfile.writelines(data_lines)
+        particle_saves.clear()
+        data_lines.clear()
 
     def start(self, setDaemon=False):
         self.setDaemon = setDaemon
@@ -401,6 +615,22 @@ class Geolocate:
             self.data["heading"] = self.static_heading
 
         replay_file = self.config["replay_file"]
+        # replay as fast as the filter runs: recorded timestamps instead of
+        # the wall clock, no step pacing, no rendering, batched writes
+        fast_forward = (
+            replay_file is not None
+            and self.config["replay_fast_forward"].lower() == "true"
+        )
+        replay_start_time = (
+            float(self.config["replay_start_time"])
+            if self.config["replay_start_time"]
+            else None
+        )
+        replay_end_time = (
+            float(self.config["replay_end_time"])
+            if self.config["replay_end_time"]
+            else None
+        )
 
         mqtt_host = self.config["mqtt_host"]
         mqtt_port = int(self.config["mqtt_port"])
@@ -433,14 +663,38 @@ class Geolocate:
 
         fading_sigma = float(self.config["fading_sigma"])
         threshold = float(self.config["threshold"])
+        rssi_table = self.config["rssi_table"].lower() == "true"
 
         n_particles = int(self.config["n_particles"])
         map_width = float(self.config["map_width"])
         resample_proportion = float(self.config["resample_proportion"])
+        resample_method = self.config["resample_method"].lower()
+        n_eff_threshold = float(self.config["n_eff_threshold"])
+        prior = self.config["prior"].lower()
+        belief_frame = self.config["belief_frame"].lower()
+        belief_backend = self.config["belief_backend"].lower()
+        grid_cell_size = float(self.config["grid_cell_size"])
+        use_planner = self.config.get("use_planner", "false").lower() == "true"
+        if use_planner and (belief_frame == "world" or belief_backend == "grid"):
+            # the planners roll the belief out with sensor relative dynamics
+            raise ValueError(
+                "use_planner requires belief_frame = sensor and "
+                "belief_backend = particles"
+            )
+        metrics_file = self.config["metrics_file"]
+        coalesce_policy = self.config["coalesce"].lower()
+        if coalesce_policy not in COALESCE_POLICIES:
+            # fail before connecting rather than on the first messages
+            raise ValueError(f"coalesce must be one of {COALESCE_POLICIES}")
+        ingest_queue_size = int(self.config["ingest_queue_size"])
+        rng = RNGContext(parse_seed(self.config["seed"]))
+        logging.info(f"seed entropy: {rng.entropy}")
 
         local_plot = self.config["local_plot"].lower()
         make_gif = self.config["make_gif"].lower()
         use_flask = self.config["use_flask"].lower()
+        if fast_forward:
+            local_plot = make_gif = use_flask = "false"
         if (local_plot == "true") or (make_gif == "true") or (use_flask == "true"):
             any_plot = True
         else:
@@ -460,7 +714,7 @@ class Geolocate:
         min_bound = 0.82
         min_std_dev = 35
 
-        step_duration = 1
+        step_duration = float(self.config["step_duration"])
 
         # Sensor
         if antenna_type in ["directional", "yagi", "logp"]:
@@ -477,6 +731,8 @@ class Geolocate:
             fading_sigma=fading_sigma,
             threshold=threshold,
             data=self.data,
+            rng=rng.sensor,
+            rssi_table=rssi_table,
         )  # fading sigm = 8dB, threshold = -120dB
 
         # Test expected RSSI
@@ -495,6 +751,7 @@ class Geolocate:
             sensor_speed=sensor_speed,
             reward=reward_func,
             simulated=False,
+            rng=rng.state,
         )
 
         # Environment
@@ -505,31 +762,62 @@ class Geolocate:
             simulated=False,
             num_particles=n_particles,
             resample_proportion=resample_proportion,
+            rng=rng.filter,
+            belief_frame=belief_frame,
+            belief_backend=belief_backend,
+            grid_cell_size=grid_cell_size,
+            grid_width=map_width,
+            resample_method=resample_method,
+            n_eff_threshold=n_eff_threshold,
         )
 
-        belief = env.reset()
+        # Reuse the belief of the previous run (e.g. after a reset from the GUI)
+        prior_belief = None
+        if (
+            prior == "belief"
+            and self.last_belief is not None
+            and len(self.last_belief) == n_targets
+        ):
+            prior_belief = self.last_belief
+        env.reset(belief=prior_belief)
+        seeded_targets = set()
 
         results = birdseye.utils.Results(
-            experiment_name=self.config_path,
+            experiment_name=self.config["results_name"] or self.config_path,
             global_start_time=global_start_time,
             config=self.config,
             class_map=sensor.class_map,
         )
 
         ###### MQTT or replay from file
+        # the MQTT thread only queues messages, the loop applies them
+        inference_queue = MessageQueue("gamutrf/inference", ingest_queue_size)
+        targets_queue = MessageQueue("gamutrf/targets", ingest_queue_size)
         if replay_file is None:
             topics = [
-                ("gamutrf/inference", self.data_handler),
-                ("gamutrf/targets", self.target_handler),
+                ("gamutrf/inference", inference_queue.put),
+                ("gamutrf/targets", targets_queue.put),
             ]
             mqtt_client = birdseye.mqtt.BirdsEyeMQTT(
-                mqtt_host, mqtt_port, topics, results.logdir, global_start_time
+                mqtt_host,
+                mqtt_port,
+                topics,
+                results.logdir,
+                global_start_time,
+                log_flush_interval=float(self.config["mqtt_log_flush_interval"]),
+                log_max_bytes=int(float(self.config["mqtt_log_max_mb"]) * 1e6),
+                log_compress=self.config["mqtt_log_compress"].lower() == "true",
+                client=self.broker.client() if self.broker is not None else None,
             )
         else:
-            if replay_file.endswith(".log"):
-                get_replay_data = self.get_replay_log(replay_file)
-            elif replay_file.endswith(".json"):
-                get_replay_data = self.get_replay_json(replay_file)
+            # streamed, so memory use does not grow with the capture length
+            get_replay_data = iter(
+                ReplayReader(
+                    replay_file,
+                    start_time=replay_start_time,
+                    end_time=replay_end_time,
+                )
+            )
         ###########
 
         # Motion planner
@@ -539,10 +827,18 @@ class Geolocate:
             target_selections = {t for t in range(n_targets)}
             if planner_method == "repp":  # REPP
                 planner = REPP(
-                    env, min_std_dev, r_min, horizon, min_bound, target_selections
+                    env,
+                    min_std_dev,
+                    r_min,
+                    horizon,
+                    min_bound,
+                    target_selections,
+                    rng=rng.planner,
                 )
             elif planner_method == "lavapilot":  # LAVAPilot
-                planner = LAVAPilot(env, min_std_dev, r_min, horizon, min_bound)
+                planner = LAVAPilot(
+                    env, min_std_dev, r_min, horizon, min_bound, rng=rng.planner
+                )
             elif planner_method == "mcts":  # MCTS
                 mcts_depth = int(self.config["mcts_depth"])
                 mcts_c = float(self.config["mcts_c"])
@@ -554,6 +850,7 @@ class Geolocate:
                     c=mcts_c,
                     simulations=mcts_simulations,
                     n_downsample=mcts_n_downsample,
+                    rng=rng.planner,
                 )
             else:
                 raise Exception
@@ -576,6 +873,11 @@ class Geolocate:
         time_step = 0
         control_actions = []
         step_time = 0
+        log_path = f"{results.logdir}/birdseye-{global_start_time}.log"
+        flush_every_n = int(self.config["flush_every_n"]) if fast_forward else 1
+        particle_saves = []
+        data_lines = []
+        replay_time = global_start_time
 
         while (
             self.data["gps"] != "fix"
@@ -584,6 +886,7 @@ class Geolocate:
             and not stopped()
         ):
             time.sleep(1)
+            self.process_messages(inference_queue, targets_queue, coalesce_policy)
             logging.info("Waiting for GPS...")
 
         while True and not stopped():
@@ -593,100 +896,154 @@ class Geolocate:
             if replay_file:
                 # load data from saved file
                 try:
-                    replay_data = next(get_replay_data)
+                    replay_timestamp, replay_data = next(get_replay_data)
                 except StopIteration:
                     break
 
-                self.data_handler(replay_data)
+                if fast_forward:
+                    # recorded time, else one step after the previous message
+                    replay_time = (
+                        replay_timestamp
+                        if replay_timestamp is not None
+                        else replay_time + step_duration
+                    )
+                    self.data["utc_time"] = replay_time
+                if self.fusion_sensors:
+                    # split by sensor with the live messages
+                    inference_queue.put(replay_data)
+                else:
+                    self.data_handler(replay_data)
+
+            with instrument.span("geolocate.action"):
+                if planner:
+                    if time_step % horizon == 0:
+                        if targets_found(env, min_std_dev):
+                            # all objects localized
+                            control_action = [None]
+
+                        else:
+                            with instrument.span("geolocate.plan"):
+                                control_action = planner.get_action()
+                            instrument.inc("planner_actions", planner=planner_method)
+
+                        control_actions.extend(control_action)
+                    # logging.info(f"{control_actions[-1]=}")
+                    action = control_actions[time_step]
+
+                    self.data["action_proposal"] = action
+
+            if not fast_forward:
+                with instrument.span("geolocate.step_wait"):
+                    while time.perf_counter() - step_time < step_duration:
+                        pass
+                step_time = time.perf_counter()
+            self.process_messages(inference_queue, targets_queue, coalesce_policy)
+
+            if self.data["needs_processing"] and self.message_time is not None:
+                # time the latest message waited for the filter
+                instrument.observe("geolocate.message_lag", timer() - self.message_time)
+            with instrument.span("geolocate.env_step"):
+                if self.fusion_sensors:
+                    self.data["fused_observations"] = sensor.fused_observations()
+                observation = env.real_step(self.data)
+                if prior == "target_gps":
+                    self.seed_target_priors(env, seeded_targets)
+            for publish_time in self.publish_times:
+                # from publishing to the filter update that used the message
+                instrument.observe("geolocate.end_to_end", timer() - publish_time)
+            self.publish_times = []
+            for t, std_dev in enumerate(env.get_particle_std_dev_cartesian()):
+                instrument.set_gauge("target_ess", env.pf[t].n_eff, target=t)
+                if env.pf[t].resampled:
+                    instrument.inc("target_resamples", target=t)
+                instrument.set_gauge("target_std_dev", float(np.max(std_dev)), target=t)
+
+            with instrument.span("geolocate.plot"):
+                if any_plot:
+                    results.live_plot(
+                        env=env,
+                        time_step=time_step,
+                        fig=fig,
+                        ax=ax,
+                        data=self.data,
+                        sidebar=False,
+                        separable=True,
+                        map_distance=map_width,
+                    )
+                    # safe image buf
+                    tmp_buf = BytesIO()
+                    fig.savefig(tmp_buf, format="png", bbox_inches="tight")
+                    self.image_buf = tmp_buf
 
-            action_start = timer()
+            for t in range(n_targets):
+                # sensor relative (range, bearing, course, speed) whatever the
+                # belief frame, the layout of the saved particles
+                particle_saves.append(
+                    (
+                        f'{results.logdir}/{self.data["utc_time"]}_target{t}_particles.npy',
+                        np.copy(env.relative_particles(t)),
+                    )
+                )
+            data_lines.append(json.dumps(self.data, cls=NumpyEncoder) + "\n")
 
-            if planner:
-                if time_step % horizon == 0:
-                    if targets_found(env, min_std_dev):
-                        # all objects localized
-                        control_action = [None]
+            flush = len(data_lines) >= flush_every_n
+            if flush:
+                self.write_outputs(log_path, particle_saves, data_lines)
+            instrument.observe("geolocate.loop", timer() - loop_start)
+            if flush and metrics_file:
+                instrument.REGISTRY.write(metrics_file)
 
-                    else:
-                        plan_start_time = timer()
-                        control_action = planner.get_action()
-                        plan_end_time = timer()
+            time_step += 1
 
-                    control_actions.extend(control_action)
-                # logging.info(f"{control_actions[-1]=}")
-                action = control_actions[time_step]
+        if replay_file is None:
+            mqtt_client.close()
+        self.write_outputs(log_path, particle_saves, data_lines)
+        if metrics_file:
+            instrument.REGISTRY.write(metrics_file)
+        self.last_belief = env.get_all_particles()
 
-                self.data["action_proposal"] = action
+        if make_gif == "true":
+            results.save_gif("tracking")
 
-            action_end = timer()
 
-            step_start = timer()
+def run_replay(config, trial):
+    """
+    Fast-forward a single replay, the work unit of the replay scheduler
 
-            while time.perf_counter() - step_time < step_duration:
-                pass
-            step_time = time.perf_counter()
-            observation = env.real_step(self.data)
-            step_end = timer()
+    config holds the "config_path" of the ini file and the options
+    overriding it, e.g. "replay_file".
+    """
+    config = dict(config)
+    config_path = config.pop("config_path", "geolocate.ini")
+    config.pop("experiment_name", None)
+    instance = Geolocate(config_path=config_path, config=config)
+    instance.main(lambda: False)
 
-            plot_start = timer()
-            if any_plot:
-                results.live_plot(
-                    env=env,
-                    time_step=time_step,
-                    fig=fig,
-                    ax=ax,
-                    data=self.data,
-                    sidebar=False,
-                    separable=True,
-                    map_distance=map_width,
-                )
-                # safe image buf
-                tmp_buf = BytesIO()
-                fig.savefig(tmp_buf, format="png", bbox_inches="tight")
-                self.image_buf = tmp_buf
-            plot_end = timer()
 
-            particle_save_start = timer()
-            for t in range(n_targets):
-                np.save(
-                    f'{results.logdir}/{self.data["utc_time"]}_target{t}_particles.npy',
-                    env.pf[t].particles,
-                )
-            particle_save_end = timer()
-
-            data_start = timer()
-            with open(
-                f"{results.logdir}/birdseye-{global_start_time}.log",
-                "a",
-                encoding="UTF-8",
-            ) as outfile:
-                json.dump(self.data, outfile, cls=NumpyEncoder)
-                outfile.write("\n")
-            data_end = timer()
-
-            loop_end = timer()
-
-            logging.debug("=======================================")
-            logging.debug("BirdsEye Timing")
-            logging.debug("time step = {}".format(time_step))
-            logging.debug(
-                "action selection = {:.4f} s".format(action_end - action_start)
-            )
-            logging.debug("env step = {:.4f} s".format(step_end - step_start))
-            logging.debug("plot = {:.4f} s".format(plot_end - plot_start))
-            logging.debug(
-                "particle save = {:.4f} s".format(
-                    particle_save_end - particle_save_start
-                )
+def replay_configs(config_path, replay_files, variants, sweep_name):
+    """
+    One fast-forward config per replay file and combination of the
+    "key=value1,value2" option variants
+    """
+    grid = [variant.split("=", 1) for variant in variants]
+    keys = [key for key, _ in grid]
+    configs = []
+    for replay_file in replay_files:
+        replay_name = os.path.splitext(os.path.basename(replay_file))[0]
+        for values in itertools.product(*[values.split(",") for _, values in grid]):
+            experiment_name = "_".join(
+                [replay_name] + [f"{k}{v}" for k, v in zip(keys, values)]
             )
-            logging.debug("data save = {:.4f} s".format(data_end - data_start))
-            logging.debug("main loop = {:.4f} s".format(loop_end - loop_start))
-            logging.debug("=======================================")
-
-            time_step += 1
-
-        if self.config.get("make_gif", "false").lower() == "true":
-            results.save_gif("tracking")
+            config = {
+                "experiment_name": experiment_name,
+                "config_path": config_path,
+                "replay_file": replay_file,
+                "replay_fast_forward": "true",
+                "results_name": f"{sweep_name}/{experiment_name}",
+            }
+            config.update(zip(keys, values))
+            configs.append(config)
+    return configs
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -695,6 +1052,25 @@ if __name__ == "__main__":  # pragma: no cover
         "config_path", help="Path to config file, geolocate.ini provided as example."
     )
     parser.add_argument("--log", default="INFO", help="Log level")
+    parser.add_argument(
+        "--replay",
+        nargs="+",
+        default=None,
+        help="fast-forward these replay files in parallel instead of running live",
+    )
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        help="replay option variants, e.g. --set n_particles=1000,3000",
+    )
+    parser.add_argument("--trials", type=int, default=1, help="trials per replay")
+    parser.add_argument(
+        "--workers", type=int, default=None, help="replay worker processes"
+    )
+    parser.add_argument(
+        "--sweep_name", type=str, default="replay", help="replay progress dir"
+    )
     args = parser.parse_args()
 
     numeric_level = getattr(logging, args.log.upper(), None)
@@ -703,5 +1079,16 @@ if __name__ == "__main__":  # pragma: no cover
     logging.basicConfig(level=numeric_level, format="[%(asctime)s] %(message)s")
     logging.getLogger("matplotlib.font_manager").disabled = True
 
-    instance = Geolocate(config_path=args.config_path)
-    instance.start()
+    if args.replay:
+        configs = replay_configs(
+            args.config_path, args.replay, args.set, args.sweep_name
+        )
+        scheduler = birdseye.scheduler.ExperimentScheduler(
+            sweep_name=args.sweep_name, n_workers=args.workers
+        )
+        failed = scheduler.run(run_replay, configs, n_trials=args.trials)
+        if failed:
+            logging.error(f"{len(failed)} replays failed: {failed}")
+    else:
+        instance = Geolocate(config_path=args.config_path)
+        instance.start()
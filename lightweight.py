@@ -363,7 +363,9 @@ def main(config_path="lightweight_config.ini"):
                 "rmse": rmse,
                 "mae": mae,
             }
-            results.data_to_json(data)
+            results.data_to_log(data)
+
+        results.flush()
 
         if make_gif == "true":
             results.save_gif("tracking")
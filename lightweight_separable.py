@@ -1,27 +1,32 @@
 import argparse
 from datetime import datetime
 import configparser
-import matplotlib.pyplot as plt
-import torch
 import numpy as np
-from scipy.spatial import distance
+from tqdm.auto import tqdm
 from tqdm.auto import trange
 from timeit import default_timer as timer
-from multiprocessing import Process
 import itertools
+import logging
 
 import birdseye.utils
 import birdseye.sensor
 import birdseye.actions
 import birdseye.state
 import birdseye.env
-from birdseye.utils import tracking_metrics_separable, targets_found
+from birdseye.batch_env import BatchedRFMultiSeparableEnv
+from birdseye.core import tracking_metrics_separable, targets_found
+from birdseye.lazy import lazy_import
 from birdseye.planners.light_mcts import LightMCTS
 from birdseye.planners.lavapilot import LAVAPilot
 from birdseye.planners.repp import REPP
+from birdseye.rng import RNGContext
+from birdseye.rng import parse_seed
+from birdseye.scheduler import ExperimentScheduler
 
+plt = lazy_import("matplotlib.pyplot")
 
-def main(config=None, config_path=None):
+
+def main(config=None, config_path=None, trials=None):
     n_simulations = 100
     max_iterations = 400
     reward_func = lambda pf: pf.weight_entropy  # lambda *args, **kwargs: None
@@ -48,6 +53,8 @@ def main(config=None, config_path=None):
         "mcts_c": "20.0",
         "mcts_simulations": "100",
         "mcts_n_downsample": "400",
+        "seed": "",
+        "batch_episodes": "1",
     }
     if config and config_path:
         raise ValueError("config and config_path cannot both be defined")
@@ -92,18 +99,23 @@ def main(config=None, config_path=None):
     )
     n_downsample = int(config.get("n_downsample", default_config["mcts_n_downsample"]))
 
+    # one independent stream per simulation, all derived from the root seed
+    root_rng = RNGContext(parse_seed(config.get("seed", default_config["seed"])))
+    if not config.get("seed"):
+        # record the drawn entropy so the run can be reproduced
+        config["seed"] = str(root_rng.entropy)
+    simulation_rngs = root_rng.spawn(n_simulations)
+    batch_episodes = int(
+        config.get("batch_episodes", default_config["batch_episodes"])
+    )
+
     # Sensor
     if antenna_type in ["directional", "yagi", "logp"]:
         antenna_filename = "radiation_pattern_yagi_5.csv"
     elif antenna_type in ["omni", "omnidirectional"]:
         antenna_filename = "radiation_pattern_monopole.csv"
 
-    # BirdsEye
-    device = torch.device(
-        "cuda" if torch.cuda.is_available() else "cpu"
-    )  # pylint: disable=no-member
-
-    def run_simulation():
+    def run_simulation(rng):
         global_start_time = datetime.utcnow().timestamp()
 
         results = birdseye.utils.Results(
@@ -124,6 +136,7 @@ def main(config=None, config_path=None):
             freq=freq,
             n_targets=n_targets,
             fading_sigma=fading_sigma,
+            rng=rng.sensor,
         )
 
         actions = birdseye.actions.BaselineActions(sensor_speed=sensor_speed)
@@ -135,6 +148,7 @@ def main(config=None, config_path=None):
             sensor_speed=sensor_speed,
             reward=reward_func,
             simulated=True,
+            rng=rng.state,
         )
 
         env = birdseye.env.RFMultiSeparableEnv(
@@ -143,16 +157,25 @@ def main(config=None, config_path=None):
             state=state,
             simulated=True,
             num_particles=num_particles,
+            rng=rng.filter,
         )
         env.reset()
 
         target_selections = {t for t in range(n_targets)}
         if planner_method == "repp":  # REPP
             planner = REPP(
-                env, min_std_dev, r_min, horizon, min_bound, target_selections
+                env,
+                min_std_dev,
+                r_min,
+                horizon,
+                min_bound,
+                target_selections,
+                rng=rng.planner,
             )
         elif planner_method == "lavapilot":  # LAVAPilot
-            planner = LAVAPilot(env, min_std_dev, r_min, horizon, min_bound)
+            planner = LAVAPilot(
+                env, min_std_dev, r_min, horizon, min_bound, rng=rng.planner
+            )
         elif planner_method == "mcts":  # MCTS
             planner = LightMCTS(
                 env,
@@ -160,6 +183,7 @@ def main(config=None, config_path=None):
                 c=c,
                 simulations=mcts_simulations,
                 n_downsample=n_downsample,
+                rng=rng.planner,
             )
         else:
             raise Exception
@@ -218,7 +242,9 @@ def main(config=None, config_path=None):
                 "mae": mae,
                 "plan_time": plan_end_time - plan_start_time,
             }
-            results.data_to_json(data)
+            results.data_to_log(data)
+
+        results.flush()
 
         if make_gif == "true":
             results.save_gif("tracking")
@@ -226,8 +252,145 @@ def main(config=None, config_path=None):
         if (local_plot == "true") or (make_gif == "true"):
             plt.close(fig)
 
-    for i in trange(n_simulations, desc="Experiments"):
-        run_simulation()
+    def run_batched_simulations(rng, n_episodes):
+        """
+        Run n_episodes simulations together in a BatchedRFMultiSeparableEnv,
+        logging each episode like run_simulation
+        """
+        global_start_time = datetime.utcnow().timestamp()
+        results = [
+            birdseye.utils.Results(
+                experiment_name=experiment_name,
+                global_start_time=global_start_time + e * 1e-6,
+                config=config,
+            )
+            for e in range(n_episodes)
+        ]
+
+        sensor = birdseye.sensor.SingleRSSISeparable(
+            antenna_filename=antenna_filename,
+            power_tx=power_tx,
+            directivity_tx=directivity_tx,
+            freq=freq,
+            n_targets=n_targets,
+            fading_sigma=fading_sigma,
+            rng=rng.sensor,
+        )
+        actions = birdseye.actions.BaselineActions(sensor_speed=sensor_speed)
+        state = birdseye.state.RFMultiState(
+            n_targets=n_targets,
+            target_speed=target_speed,
+            sensor_speed=sensor_speed,
+            reward=reward_func,
+            simulated=True,
+            rng=rng.state,
+        )
+        env = BatchedRFMultiSeparableEnv(
+            sensor=sensor,
+            actions=actions,
+            state=state,
+            n_episodes=n_episodes,
+            num_particles=num_particles,
+            rng=rng.filter,
+        )
+        env.reset()
+        episodes = [env.episode(e) for e in range(n_episodes)]
+
+        target_selections = {t for t in range(n_targets)}
+        if planner_method == "repp":  # REPP
+            planners = [
+                REPP(
+                    episode,
+                    min_std_dev,
+                    r_min,
+                    horizon,
+                    min_bound,
+                    set(target_selections),
+                    rng=rng.planner,
+                )
+                for episode in episodes
+            ]
+        elif planner_method == "lavapilot":  # LAVAPilot
+            planners = [
+                LAVAPilot(
+                    episode, min_std_dev, r_min, horizon, min_bound, rng=rng.planner
+                )
+                for episode in episodes
+            ]
+        else:
+            raise ValueError(f"batch_episodes does not support {planner_method}")
+
+        control_actions = [[] for _ in range(n_episodes)]
+        plan_times = np.zeros(n_episodes)
+        controls = np.zeros((n_episodes, 2))
+
+        for i in trange(max_iterations, desc="Time steps"):
+            if i % horizon == 0:
+                # all objects localized
+                env.done(env.targets_found(min_std_dev))
+                if not np.any(env.active):
+                    break
+                for e in np.flatnonzero(env.active):
+                    plan_start_time = timer()
+                    control_actions[e].extend(planners[e].get_action())
+                    plan_times[e] = timer() - plan_start_time
+            active = np.flatnonzero(env.active)
+            for e in active:
+                controls[e] = control_actions[e][i]
+            observations = env.step(controls)
+
+            utc_time = datetime.utcnow().timestamp()
+            for e in active:
+                (
+                    r_error,
+                    theta_error,
+                    heading_error,
+                    centroid_distance_error,
+                    rmse,
+                    mae,
+                ) = tracking_metrics_separable(
+                    env.target_state[e], episodes[e].get_all_particles()
+                )
+                ### save results
+                data = {
+                    "time": utc_time,
+                    "target": env.target_state[e],
+                    "sensor": env.sensor_state[e],
+                    "action": controls[e],
+                    "observation": observations[e][:, None],
+                    "std_dev_cartesian": episodes[e].get_particle_std_dev_cartesian(),
+                    "std_dev_polar": episodes[e].get_particle_std_dev_polar(),
+                    "r_err": r_error,
+                    "theta_err": theta_error,
+                    "heading_err": heading_error,
+                    "centroid_distance_err": centroid_distance_error,
+                    "rmse": rmse,
+                    "mae": mae,
+                    "plan_time": plan_times[e],
+                }
+                results[e].data_to_log(data)
+
+        for episode_results in results:
+            episode_results.flush()
+
+    if trials is None:
+        trials = range(n_simulations)
+    if batch_episodes > 1:
+        # each batch draws from the stream of its first trial
+        trials = list(trials)
+        for start in trange(0, len(trials), batch_episodes, desc="Experiments"):
+            batch = trials[start : start + batch_episodes]
+            run_batched_simulations(simulation_rngs[batch[0]], len(batch))
+    else:
+        for i in tqdm(trials, desc="Experiments"):
+            run_simulation(simulation_rngs[i])
+
+
+def run_trial(config, trial):
+    """
+    Run a single trial of a config, the work unit of the batch scheduler
+    """
+    main(config=config, trials=[trial])
 
 
 if __name__ == "__main__":
@@ -236,19 +399,24 @@ if __name__ == "__main__":
     parser.add_argument(
         "--config_path", type=str, default="lightweight_separable_config.ini"
     )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="batch mode worker processes"
+    )
+    parser.add_argument(
+        "--sweep_name", type=str, default="batch", help="batch mode progress dir"
+    )
     args = parser.parse_args()
 
     if args.batch_mode:
-        procs = []
+        logging.basicConfig(level=logging.INFO)
+        configs = []
         n_targets = [4, 8]
         target_speeds = [0.1, 0.5, 1]
         sensor_speeds = [1, 2, 3]
         planner_methods = ["repp", "lavapilot"]  # "mcts"
         fading_sigmas = [5, 10]
-        for conf in list(
-            itertools.product(
-                n_targets, target_speeds, sensor_speeds, planner_methods, fading_sigmas
-            )
+        for conf in itertools.product(
+            n_targets, target_speeds, sensor_speeds, planner_methods, fading_sigmas
         ):
             n_target, target_speed, sensor_speed, planner_method, fading_sigma = conf
             config = {
@@ -259,13 +427,15 @@ if __name__ == "__main__":
                 "planner_method": planner_method,
                 "fading_sigma": str(fading_sigma),
             }
-            proc = Process(target=main, kwargs=({"config": config}))
-            procs.append(proc)
-            proc.start()
+            configs.append(config)
 
-        # complete the processes
-        for proc in procs:
-            proc.join()
+        # one work unit per (config, trial) on a bounded pool, resumable
+        scheduler = ExperimentScheduler(
+            sweep_name=args.sweep_name, n_workers=args.workers
+        )
+        failed = scheduler.run(run_trial, configs, n_trials=100)
+        if failed:
+            logging.error(f"{len(failed)} work units failed: {failed}")
 
     else:
         main(config_path=args.config_path)
@@ -24,9 +24,10 @@ import birdseye.utils
 from birdseye.actions import WalkingActions
 from birdseye.planner import DQNPlanner
 from birdseye.planner import MCTSPlanner
-from birdseye.utils import get_heading
-from birdseye.utils import get_distance
-from birdseye.utils import is_float
+from birdseye.core import get_heading
+from birdseye.core import get_distance
+from birdseye.core import is_float
+from birdseye.replay import ReplayReader
 
 logging.basicConfig(level=10, format="%(asctime)s %(message)s")
 logging.getLogger("matplotlib.font_manager").disabled = True
@@ -267,9 +268,7 @@ class SigScan:
                 )
                 sys.exit(1)
         else:
-            with open(replay_file, "r", encoding="UTF-8") as open_file:
-                replay_data = json.load(open_file)
-                replay_ts = sorted(replay_data.keys())
+            replay_data = iter(ReplayReader(replay_file))
 
         # BirdsEye
         global_start_time = datetime.utcnow().timestamp()
@@ -348,9 +347,11 @@ class SigScan:
 
             if replay_file is not None:
                 # load data from saved file
-                if time_step - 1 == len(replay_ts):
+                try:
+                    _, message_data = next(replay_data)
+                except StopIteration:
                     break
-                self.data_handler(replay_data[replay_ts[time_step - 1]])
+                self.data_handler(message_data)
 
             action_start = timer()
             self.data["action_proposal"] = (
@@ -0,0 +1,19 @@
+"""
+Shared fixtures of the tests
+"""
+import pytest
+
+from birdseye.factory import build_env
+from birdseye.factory import build_sensor
+
+
+@pytest.fixture
+def make_sensor():
+    """birdseye.factory.build_sensor"""
+    return build_sensor
+
+
+@pytest.fixture
+def make_env():
+    """birdseye.factory.build_env"""
+    return build_env
@@ -0,0 +1,63 @@
+"""
+Tests for batch_env.py
+"""
+import numpy as np
+
+from birdseye.actions import BaselineActions
+from birdseye.batch_env import BatchedRFMultiSeparableEnv
+from birdseye.core import pol2cart
+from birdseye.env import weighted_std
+from birdseye.planners.repp import REPP
+from birdseye.state import RFMultiState
+from birdseye.utils import targets_found
+
+
+def test_batched_env(make_sensor):
+    """
+    Test the episode axis, masking of done episodes and the episode views
+    """
+    rng = np.random.default_rng(0)
+    state = RFMultiState(n_targets=2, simulated=True, rng=rng)
+    env = BatchedRFMultiSeparableEnv(
+        sensor=make_sensor(n_targets=2, fading_sigma=5, rng=rng),
+        actions=BaselineActions(),
+        state=state,
+        n_episodes=3,
+        num_particles=100,
+        rng=rng,
+    )
+    env.reset()
+    assert env.particles.shape == (3, 2, 100, 4)
+    assert env.target_state.shape == (3, 2, 4)
+
+    observations = env.step(np.tile([0.0, 1.0], (3, 1)))
+    assert observations.shape == (3, 2)
+    assert np.allclose(np.sum(env.weights, axis=-1), 1)
+    assert np.all(env.particles[..., 0] >= 1)
+    # belief statistics are weighted like RFMultiSeparableEnv
+    env.weights[0, 1] = rng.random(100)
+    env.weights[0, 1] /= np.sum(env.weights[0, 1])
+    particles, weights = env.particles[0, 1], env.weights[0, 1]
+    x, y = pol2cart(particles[:, 0], np.radians(particles[:, 1]))
+    assert np.allclose(
+        env.get_particle_centroids()[0, 1],
+        [np.average(x, weights=weights), np.average(y, weights=weights)],
+    )
+    assert np.isclose(
+        env.get_particle_std_dev_polar()[0, 1, 0],
+        weighted_std(particles[:, 0], weights),
+    )
+
+    # a done episode keeps its state and reports NaN observations
+    env.done([1])
+    particles = env.particles[1].copy()
+    observations = env.step(np.tile([0.0, 1.0], (3, 1)))
+    assert np.all(np.isnan(observations[1]))
+    assert np.array_equal(env.particles[1], particles)
+    assert list(env.iters) == [2, 1, 2]
+
+    episode = env.episode(2)
+    planner = REPP(episode, 35, 10, 1, 0.82, {0, 1}, rng=rng)
+    assert np.shape(planner.get_action()) == (1, 2)
+    assert targets_found(episode, 35) == env.targets_found(35)[2]
+    assert episode.get_particle_centroids().shape == (2, 2)
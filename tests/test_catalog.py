@@ -0,0 +1,77 @@
+"""
+Tests for catalog.py
+"""
+import json
+import os
+import time
+
+import birdseye.results
+from birdseye.catalog import RunCatalog
+
+
+def write_run(method_dir, run, methods, defaults=None):
+    with open(f"{method_dir}/{run}_header.txt", "w", encoding="UTF-8") as f:
+        json.dump({"Methods": methods, "Defaults": defaults or {}}, f)
+    with open(f"{method_dir}/{run}_data.csv", "w", encoding="UTF-8") as f:
+        f.write("time\n")
+
+
+def test_run_catalog(tmp_path, monkeypatch):
+    """
+    Test catalog queries against the filter_runs semantics and incremental updates
+    """
+    method_dir = tmp_path / "mcts"
+    os.makedirs(method_dir)
+    write_run(method_dir, "2021-06-17T10:00:00", {"sensor": "drone", "target_start": "75"})
+    write_run(
+        method_dir,
+        "2021-06-19T10:00:00",
+        {"sensor": "drone", "target_speed": "0.5", "reward": "entropy_collision_reward"},
+    )
+    write_run(method_dir, "2021-06-20T10:00:00", {"sensor": "signalstrength"})
+    with open(f"{method_dir}/2021-06-21T10:00:00_header.txt", "w", encoding="UTF-8") as f:
+        f.write("not json")
+    with open(f"{method_dir}/2021-06-21T10:00:00_data.csv", "w", encoding="UTF-8") as f:
+        f.write("time\n")
+
+    monkeypatch.setattr(birdseye.results, "RUN_DIR", str(tmp_path))
+    assert len(birdseye.results.get_valid_runs("mcts")) == 3
+    assert sorted(birdseye.results.filter_runs("mcts", {"sensor": "drone"})) == [
+        "2021-06-17T10:00:00",
+        "2021-06-19T10:00:00",
+    ]
+    assert sorted(birdseye.results.filter_runs("mcts", {"reward": "range_reward"})) == [
+        "2021-06-17T10:00:00",
+        "2021-06-20T10:00:00",
+    ]
+    # runs without a target_speed count as 1.0
+    assert sorted(birdseye.results.filter_runs("mcts", {"target_speed": 1})) == [
+        "2021-06-17T10:00:00",
+        "2021-06-20T10:00:00",
+    ]
+    assert birdseye.results.filter_runs("mcts", {"target_start": 75}) == [
+        "2021-06-17T10:00:00"
+    ]
+    assert birdseye.results.filter_runs("mcts", {"target_start": ["75", "100"]}) == [
+        "2021-06-17T10:00:00"
+    ]
+    assert sorted(
+        birdseye.results.filter_runs(
+            "mcts",
+            {"datetime_start": "2021-06-18T00:00:00", "sensor": "signalstrength"},
+        )
+    ) == ["2021-06-20T10:00:00"]
+    assert (
+        birdseye.results.get_config("mcts", "2021-06-20T10:00:00")["Methods"]["reward"]
+        == "range_reward"
+    )
+
+    # changed headers are reparsed, removed runs dropped
+    time.sleep(0.01)
+    write_run(method_dir, "2021-06-20T10:00:00", {"sensor": "drone"})
+    os.remove(f"{method_dir}/2021-06-17T10:00:00_data.csv")
+    with RunCatalog(str(tmp_path)) as catalog:
+        assert sorted(catalog.query("mcts", {"sensor": "drone"})) == [
+            "2021-06-19T10:00:00",
+            "2021-06-20T10:00:00",
+        ]
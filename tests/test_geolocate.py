@@ -1,9 +1,13 @@
 """
 Tests for geolocate.py
 """
+import birdseye.instrument
 import birdseye.mqtt
 from geolocate import *
+import glob
+import json
 import pytest
+import shutil
 import socket
 
 MQTT_PORT = 1883
@@ -69,3 +73,180 @@ def test_geolocate(fake_broker):
     instance = Geolocate(config_path="tests/test_geolocate.ini")
     instance.start(setDaemon=True)
     instance.stop()
+
+
+def test_metrics_endpoint():
+    instance = Geolocate(config_path="tests/test_geolocate.ini")
+    birdseye.instrument.inc("mqtt_messages", topic="gamutrf/inference")
+    with birdseye.instrument.span("geolocate.env_step"):
+        pass
+    response = instance.flask_app().test_client().get("/metrics")
+    assert response.status_code == 200
+    text = response.get_data(as_text=True)
+    assert 'birdseye_mqtt_messages_total{topic="gamutrf/inference"}' in text
+    assert 'birdseye_span_seconds_count{span="geolocate.env_step"}' in text
+
+
+def test_replay_fast_forward():
+    instance = Geolocate(
+        config_path="tests/test_geolocate.ini",
+        config={
+            "replay_file": "tests/mqtt_messages.log",
+            "replay_fast_forward": "true",
+            "n_targets": "1",
+            "n_particles": "500",
+            "use_planner": "false",
+            "flush_every_n": "3",
+            "results_name": "test_replay",
+            "seed": "1",
+        },
+    )
+    instance.main(lambda: False)
+    logdirs = glob.glob("runs/test_replay/*_logs")
+    assert len(logdirs) == 1
+    log_files = glob.glob(f"{logdirs[0]}/birdseye-*.log")
+    with open(log_files[0], encoding="UTF-8") as f:
+        lines = [json.loads(line) for line in f]
+    with open("tests/mqtt_messages.log", encoding="UTF-8") as f:
+        times = [json.loads(line)["time"] for line in f]
+    # one line per message, stamped with the recorded time
+    assert [line["utc_time"] for line in lines] == times
+    shutil.rmtree("runs/test_replay")
+
+
+def test_invalid_coalesce_policy():
+    instance = Geolocate(
+        config_path="tests/test_geolocate.ini",
+        config={"coalesce": "median", "replay_file": "tests/mqtt_messages.log"},
+    )
+    with pytest.raises(ValueError, match="coalesce"):
+        instance.main(lambda: False)
+
+
+def test_replay_configs():
+    configs = replay_configs(
+        "geolocate.ini", ["a/one.log", "two.json"], ["n_particles=10,20"], "sweep"
+    )
+    assert [c["experiment_name"] for c in configs] == [
+        "one_n_particles10",
+        "one_n_particles20",
+        "two_n_particles10",
+        "two_n_particles20",
+    ]
+    assert configs[0]["results_name"] == "sweep/one_n_particles10"
+    assert configs[0]["n_particles"] == "10"
+
+
+def test_batched_observations(make_sensor, make_env):
+    data = {
+        "rssi": {"a": -60.0, "b": -70.0},
+        "rssi_batch": {"a": [-60.0, -58.0, -200.0], "b": [-70.0]},
+    }
+    sensor = make_sensor(n_targets=2, sensor_class=GamutRFSensor, data=data)
+    # readings below the threshold are dropped from the batch
+    assert sensor.real_observation() == [[-60.0, -58.0], [-70.0]]
+
+    hyp = np.array([[-50.0], [-65.0], [-80.0]])
+    weight = sensor.weight(hyp, np.array([[-60.0, -58.0]]))
+    product = sensor.weight(hyp, np.array([[-60.0]])) * sensor.weight(
+        hyp, np.array([[-58.0]])
+    )
+    assert np.allclose(weight, product)
+
+    env = make_env(n_targets=2, sensor=sensor, simulated=False)
+    data.update(
+        {"needs_processing": True, "distance": 0, "course": 0, "heading": 0}
+    )
+    observation = env.real_step(data)
+    assert list(observation[0]) == [-60.0, -58.0]
+    assert all(np.isclose(np.sum(pf.weights), 1) for pf in env.pf)
+
+
+def test_sensor_fusion(make_sensor, make_env):
+    data = {
+        "position": [32.9226, -117.1208],
+        "rssi": -60.0,
+        "sensors": {
+            "worker2": {
+                "position": [32.9227, -117.1208],
+                "heading": 0.0,
+                "rssi": [[-65.0, -66.0]],
+                "needs_processing": True,
+            }
+        },
+    }
+    sensor = make_sensor(fading_sigma=0, sensor_class=GamutRFSensor, data=data)
+    fused = sensor.fused_observations()
+    # worker2 is about 11 m north of the reference sensor
+    assert np.allclose(fused[0]["offset"], [0, 11.1], atol=0.1)
+    assert fused[0]["rssi"] == [[-65.0, -66.0]]
+    assert sensor.fused_observations() == []
+
+    env = make_env(sensor=sensor, simulated=False)
+    states = env.pf[0].particles
+    # readings of the reference sensor match the single sensor model
+    poses = np.array([[0.0, 0.0, env.state.sensor_state[2]]] * 2)
+    assert np.allclose(
+        env.observe(states, 0, sensor_poses=poses),
+        np.stack([env.observe(states, 0)] * 2, axis=-1),
+    )
+
+    readings, poses = env.fuse_readings(-60.0, fused, 0)
+    assert readings == [-60.0, -65.0, -66.0]
+    assert env.observe(states, 0, sensor_poses=poses).shape == (200, 3)
+
+    data.update(
+        {
+            "needs_processing": True,
+            "distance": 0,
+            "course": 0,
+            "heading": 0,
+            "fused_observations": fused,
+        }
+    )
+    env.real_step(data)
+    assert np.isclose(np.sum(env.pf[0].weights), 1)
+
+
+def test_world_belief_frame(make_sensor, make_env):
+    data = {"rssi": -60.0}
+    sensor = make_sensor(fading_sigma=0, sensor_class=GamutRFSensor, data=data)
+    envs = {}
+    for frame in ["sensor", "world"]:
+        envs[frame] = make_env(sensor=sensor, simulated=False, belief_frame=frame)
+        envs[frame].state.sensor_state = np.array([30.0, 45.0, 120.0, 1.0])
+    world = envs["world"]
+    relative = envs["sensor"].pf[0].particles
+    particles = world.state.world_states(relative)
+
+    def same_states(a, b):
+        # bearings and courses may wrap around 360
+        difference = np.array(a) - np.array(b)
+        difference[..., [1, 2]] = (difference[..., [1, 2]] + 180) % 360 - 180
+        return np.allclose(difference, 0)
+
+    assert same_states(world.state.relative_states(particles), relative)
+
+    # same expected RSSI as the sensor relative belief
+    world.pf[0].particles = particles
+    assert np.allclose(
+        world.observe(particles, 0), envs["sensor"].observe(relative, 0)
+    )
+    assert same_states(
+        world.get_absolute_particles(), envs["sensor"].get_absolute_particles()
+    )
+    # saved particles keep the sensor relative layout
+    assert same_states(world.relative_particles(0), relative)
+    # cached until the particles or the sensor change
+    cached = world.absolute_cache.entries[0][3]
+    world.get_absolute_particles()
+    assert world.absolute_cache.entries[0][3] is cached
+
+    # the sensor moves, the particles only move with the targets
+    x_s, y_s, _ = world.state.sensor_pose()
+    data.update({"needs_processing": True, "distance": 5, "course": 90, "heading": 30})
+    world.real_step(data)
+    assert np.allclose(world.state.sensor_pose(), (x_s, y_s + 5, 30))
+    world.get_absolute_particles()
+    assert world.absolute_cache.entries[0][3] is not cached
+    assert np.isclose(np.sum(world.pf[0].weights), 1)
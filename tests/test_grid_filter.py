@@ -0,0 +1,81 @@
+"""
+Tests for grid_filter.py
+"""
+import numpy as np
+
+from birdseye.grid_filter import GridFilter
+from birdseye.grid_filter import motion_kernel
+
+
+def test_motion_kernel():
+    kernel = motion_kernel(2, 2)
+    assert kernel.shape == (7, 7)
+    assert np.isclose(np.sum(kernel), 1)
+    assert np.allclose(kernel, kernel.T)
+    assert motion_kernel(2, 0).shape == (3, 3)
+
+
+def test_grid_backend(make_env):
+    env = make_env(
+        rng=np.random.default_rng(0),
+        fading_sigma=0,
+        num_particles=500,
+        state_kwargs={"particle_distance": 100},
+        belief_backend="grid",
+        grid_cell_size=4,
+    )
+    state = env.state
+    grid = env.pf[0]
+    assert grid.log_belief.shape == (50, 50)
+    assert env.get_all_particles().shape == (1, 500, 4)
+    # uniform prior over the cells within particle_distance
+    assert np.all(env.pf[0].particles[:, 0] <= 100 + 4)
+
+    entropy = grid.weight_entropy
+    env.step((30, 1))
+    assert grid.version == 1
+    assert np.isclose(np.sum(grid.belief), 1)
+    assert grid.weight_entropy > entropy
+    assert np.all(np.isfinite(env.get_particle_centroids()))
+
+    # a GPS prior concentrates the belief around the target
+    env.reseed_target(0, state.gps_particle_states(500, 50, 90, 2, 2))
+    # centroid relative to the sensor, 50 m away at a bearing of 90 degrees
+    assert np.allclose(env.get_particle_centroids()[0], [0, 50], atol=5)
+
+
+def test_grid_recenter(caplog):
+    pose = [0.0, 0.0, 0.0]
+    grid = GridFilter(
+        observe_fn=lambda x, y, **kwargs: np.hypot(x - pose[0], y - pose[1]),
+        weight_fn=lambda hyp, obs: np.exp(-((hyp - obs) ** 2) / 200).ravel(),
+        pose_fn=lambda: tuple(pose),
+        to_states=lambda states: states,
+        width=100,
+        cell_size=2,
+        n_particles=500,
+        rng=np.random.default_rng(0),
+    )
+    # a GPS prior far off the grid moves the grid onto it
+    states = np.zeros((200, 4))
+    states[:, :2] = [301, -149]
+    grid.reseed(states)
+    assert np.allclose(grid.center, [301, -149], atol=2)
+    assert np.allclose(np.mean(grid.particles[:, :2], axis=0), [301, -149], atol=2)
+
+    # the grid follows the sensor, the belief moves with it
+    grid.recenter(0, 0)
+    assert np.allclose(grid.center, [0, 0])
+    states[:, :2] = 10
+    grid.reseed(states)
+    pose[:2] = [40.0, 0.0]
+    grid.update(30)
+    assert np.allclose(grid.center, [40, 0])
+    assert np.isclose(np.sum(grid.belief), 1)
+    assert np.allclose(np.mean(grid.particles[:, :2], axis=0), [10, 10], atol=3)
+
+    # states that do not fit on the grid keep the belief, with a warning
+    version = grid.version
+    grid.reseed(np.array([[1e4, 0, 0, 0], [-1e4, 0, 0, 0]]))
+    assert grid.version == version
+    assert "no reseed state" in caplog.text
@@ -0,0 +1,47 @@
+"""
+Tests for ingest.py
+"""
+from birdseye.ingest import coalesce
+from birdseye.ingest import MessageQueue
+
+
+def inference(rssi, position):
+    return {
+        "position": position,
+        "metadata": {"rssi_max": rssi},
+        "predictions": {"mini2_video": [{"conf": 0.9}, {"rssi_max": rssi - 2}]},
+    }
+
+
+def test_message_queue():
+    messages = MessageQueue("gamutrf/inference", maxsize=3)
+    for i in range(5):
+        messages.put({"rssi": i})
+    # the two oldest messages were dropped
+    assert [message["rssi"] for _, message in messages.drain()] == [2, 3, 4]
+    assert len(messages) == 0
+
+    # raw payloads are decoded by drain, malformed ones dropped
+    messages.put(b'{"rssi": -60.0}')
+    messages.put(b"{")
+    messages.put({"rssi": -70.0})
+    assert [message["rssi"] for _, message in messages.drain()] == [-60.0, -70.0]
+
+
+def test_coalesce():
+    messages = [inference(-60, [1, 1]), inference(-70, [2, 2])]
+    assert coalesce(messages, "latest") is messages[-1]
+
+    mean = coalesce(messages, "mean")
+    assert mean["position"] == [2, 2]
+    assert [p["rssi_max"] for p in mean["predictions"]["mini2_video"]] == [
+        -60,
+        -62,
+        -70,
+        -72,
+    ]
+    assert "rssi_batch" not in mean
+
+    batch = coalesce([{"rssi": -60}, {"rssi": -70}], "batch")
+    assert batch["rssi"] == -65
+    assert batch["rssi_batch"] == [-60, -70]
@@ -0,0 +1,40 @@
+"""
+Tests for instrument.py
+"""
+import json
+
+from birdseye.instrument import NULL_SPAN
+from birdseye.instrument import Registry
+
+
+def test_registry(tmp_path):
+    registry = Registry()
+    with registry.span("env.step"):
+        pass
+    registry.observe("env.step", 0.003)
+    registry.inc("mqtt_messages", topic="gamutrf/inference")
+    registry.inc("mqtt_messages", topic="gamutrf/inference")
+    registry.set_gauge("ess", 0.5, target=0)
+
+    histogram = registry.histograms["env.step"]
+    assert histogram.count == 2
+    assert histogram.quantile(1.0) == 0.005
+
+    text = registry.to_prometheus()
+    assert 'birdseye_span_seconds_bucket{span="env.step",le="+Inf"} 2' in text
+    assert 'birdseye_span_seconds_count{span="env.step"} 2' in text
+    assert 'birdseye_mqtt_messages_total{topic="gamutrf/inference"} 2' in text
+    assert 'birdseye_ess{target="0"} 0.5' in text
+
+    registry.write(str(tmp_path / "metrics.json"))
+    with open(tmp_path / "metrics.json", encoding="UTF-8") as f:
+        metrics = json.load(f)
+    assert metrics["spans"]["env.step"]["count"] == 2
+
+
+def test_disabled_registry():
+    registry = Registry(enabled=False)
+    assert registry.span("env.step") is NULL_SPAN
+    registry.observe("env.step", 1)
+    registry.inc("mqtt_messages")
+    assert registry.to_dict() == {"spans": {}, "counters": [], "gauges": []}
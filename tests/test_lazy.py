@@ -0,0 +1,40 @@
+"""
+Tests for lazy.py and the import footprint of the core modules
+"""
+import subprocess
+import sys
+
+from birdseye.lazy import LazyModule
+from birdseye.lazy import lazy_import
+from birdseye.method_utils import get_method
+
+
+def test_lazy_module():
+    module = LazyModule("colorsys")
+    assert "not loaded" in repr(module)
+    assert module.rgb_to_hsv(1, 0, 0) == (0, 1, 1)
+    assert "not loaded" not in repr(module)
+    assert lazy_import("json") is sys.modules["json"]
+
+
+def test_core_imports_are_light():
+    """
+    Importing the simulation modules does not import plotting, dataframe or
+    RL dependencies
+    """
+    heavy = ["matplotlib", "pandas", "seaborn", "torch", "PIL", "requests"]
+    code = (
+        "import sys\n"
+        "import birdseye.utils, birdseye.env, birdseye.batch_env, birdseye.method_utils\n"
+        "import birdseye.planners.repp, birdseye.planners.lavapilot\n"
+        "import birdseye.planners.light_mcts\n"
+        f"print([m for m in {heavy} if m in sys.modules])"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert out.stdout.strip() == "[]"
+
+
+def test_get_method():
+    assert get_method("baseline").__name__ == "baseline"
@@ -0,0 +1,62 @@
+"""
+Tests for logsink.py
+"""
+import glob
+import json
+
+from birdseye.logsink import AsyncLogWriter
+from birdseye.mqtt import payload_line
+from birdseye.replay import ReplayReader
+
+
+def test_async_log_writer(tmp_path):
+    path = str(tmp_path / "mqtt-0.log")
+    writer = AsyncLogWriter(path, flush_interval=0.01, max_bytes=200, compress=True)
+    messages = [{"time": float(i), "rssi": -60.0} for i in range(50)]
+    for message in messages:
+        writer.write(f"{json.dumps(message)}\n")
+    writer.close()
+
+    segments = sorted(
+        glob.glob(str(tmp_path / "mqtt-0.*.log.gz")),
+        key=lambda segment: int(segment.split(".")[-3]),
+    )
+    assert len(segments) > 1
+    replayed = []
+    for segment in segments + [path]:
+        replayed.extend(message for _, message in ReplayReader(segment))
+    assert replayed == messages
+
+
+def test_async_log_writer_failure(tmp_path):
+    # the log directory does not exist, the writer thread stops
+    writer = AsyncLogWriter(str(tmp_path / "missing" / "mqtt-0.log"))
+    writer.thread.join()
+    assert writer.failed
+    for _ in range(10):
+        writer.write(b'{"rssi": -60.0}')
+    assert writer.dropped == 10
+    assert writer.queue.empty()
+    writer.close()
+
+
+def test_async_log_writer_formatter(tmp_path):
+    path = tmp_path / "mqtt-0.log"
+    writer = AsyncLogWriter(str(path), formatter=payload_line)
+    writer.write('{"name": "é"}'.encode("utf-8"))
+    writer.write('{"rssi":\n -60.0}'.encode("utf-16"))
+    # not JSON and not UTF-8, dropped instead of stopping the writer
+    writer.write(b"\xff\xfe{\n")
+    writer.write(b'{"rssi": -70.0}')
+    writer.close()
+    assert not writer.failed and writer.dropped == 1
+    assert path.read_bytes().decode("utf-8").splitlines() == [
+        '{"name": "é"}',
+        '{"rssi": -60.0}',
+        '{"rssi": -70.0}',
+    ]
+    # max_bytes counts bytes, not characters
+    writer = AsyncLogWriter(str(tmp_path / "utf8.log"), max_bytes=5)
+    writer.write("éé\n")
+    writer.close()
+    assert (tmp_path / "utf8.1.log").exists()
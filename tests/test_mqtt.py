@@ -2,10 +2,13 @@
 Tests for mqtt.py
 """
 import birdseye.mqtt
+import json
 import pytest
 import socket
 import time
 
+from birdseye.mqtt_local import LocalBroker
+
 MQTT_PORT = 1883
 
 
@@ -74,3 +77,27 @@ def test_mqtt_client(fake_broker):
     mqtt_client = birdseye.mqtt.BirdsEyeMQTT(
         "localhost", MQTT_PORT, topics, "fake_log_dir", time.time()
     )
+
+
+def test_local_broker(tmp_path):
+    received = []
+    broker = LocalBroker()
+    mqtt_client = birdseye.mqtt.BirdsEyeMQTT(
+        "localhost",
+        MQTT_PORT,
+        [("gamutrf/inference", received.append)],
+        str(tmp_path),
+        0,
+        client=broker.client(),
+    )
+    for i in range(10):
+        broker.publish("gamutrf/inference", json.dumps({"rssi": -60 - i}))
+    broker.publish("gamutrf/targets", json.dumps({"target_name": "drone1"}))
+    broker.close()
+    mqtt_client.close()
+    # handlers get the raw payloads
+    assert [json.loads(message)["rssi"] for message in received] == list(
+        range(-60, -70, -1)
+    )
+    with open(tmp_path / "mqtt-0.log", encoding="utf-8") as f:
+        assert len(f.readlines()) == 10
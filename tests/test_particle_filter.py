@@ -0,0 +1,84 @@
+"""
+Tests for particle_filter.py
+"""
+import numpy as np
+
+from birdseye.particle_filter import RESAMPLE_METHODS
+from birdseye.particle_filter import log_normalize
+from birdseye.particle_filter import residual_resample
+from birdseye.rng import RNGContext
+
+
+def test_log_weights(make_env):
+    """
+    Test that log domain weights survive readings far off every particle
+    """
+    log_weights, log_total = log_normalize([-2000.0, -2000.0 - np.log(3), -np.inf])
+    assert np.allclose(np.exp(log_weights), [0.75, 0.25, 0])
+    assert np.isclose(log_total, -2000 + np.log(4 / 3))
+    log_weights, log_total = log_normalize(np.full((2, 4), -np.inf))
+    assert np.allclose(np.exp(log_weights), 0.25)
+    assert np.all(log_total == -np.inf)
+
+    env = make_env(rng=RNGContext(0))
+    sensor = env.sensor
+    pf = env.pf[0]
+    # every likelihood underflows, sum of squared errors / (2 * 15**2) > 745
+    pf.update(np.full(30, 60.0), xp=pf.particles, control=(0, 1))
+    log_likelihood = sensor.log_weight(pf.hypotheses[:, None], np.full((1, 30), 60.0))
+    assert np.all(np.exp(log_likelihood) == 0)
+    assert np.isclose(np.sum(pf.original_weights), 1)
+    assert np.isfinite(pf.n_eff) and np.isfinite(pf.weight_entropy)
+    assert np.all(np.isfinite(pf.particles))
+
+
+def test_resample_methods(make_env):
+    """
+    Test the resampling strategies and the effective sample size gating
+    """
+    rng = np.random.default_rng(0)
+    weights = np.array([0.5, 0.25, 0.25, 0.0])
+    assert sorted(residual_resample(weights, rng)) == [0, 0, 1, 2]
+    weights = rng.random(1000) ** 4
+    weights /= np.sum(weights)
+    for resample_fn in RESAMPLE_METHODS.values():
+        indices = resample_fn(weights, rng)
+        assert len(indices) == 1000
+        assert np.all((indices >= 0) & (indices < 1000))
+        counts = np.bincount(indices, minlength=1000)
+        assert np.all(counts[weights == 0] == 0)
+        assert np.corrcoef(counts, weights)[0, 1] > 0.7
+
+    env = make_env(
+        rng=RNGContext(0), resample_method="residual", n_eff_threshold=0.5
+    )
+    pf = env.pf[0]
+    # even weights without a reading, nothing to resample
+    pf.update(None, xp=pf.particles, control=(0, 1))
+    assert not pf.resampled and pf.resample_count == 0
+    for _ in range(5):
+        pf.update(-40, xp=pf.particles, control=(0, 1))
+        assert pf.resampled == (pf.n_eff < 0.5)
+    assert pf.resample_count > 0
+    assert np.isclose(np.sum(pf.weights), 1)
+
+
+def test_replenished_weights(make_env):
+    """
+    Test that particles drawn from the prior without resampling do not keep
+    the weight of the particle they replace
+    """
+    env = make_env(rng=RNGContext(0), n_eff_threshold=0.5, resample_proportion=0.2)
+    pf = env.pf[0]
+    for _ in range(5):
+        pf.update(-40, xp=pf.particles, control=(0, 1))
+        if not pf.resampled:
+            break
+    assert not pf.resampled
+    replenished = pf.resampled_particles
+    assert np.any(replenished)
+    # relative to the kept particles, every prior draw weighs 1 / n_particles
+    kept = pf.original_weights[~replenished]
+    scale = np.sum(pf.weights[~replenished]) / np.sum(kept)
+    assert np.allclose(pf.weights[replenished], scale / pf.n_particles)
+    assert np.isclose(np.sum(pf.weights), 1)
@@ -0,0 +1,38 @@
+"""
+Tests for replay.py
+"""
+import json
+import os
+
+from birdseye.replay import iter_json_object
+from birdseye.replay import ReplayReader
+
+CAPTURE = "gamutrf_fieldtest/aligned_1653589177_1653589237.json"
+
+
+def test_replay_json():
+    with open(CAPTURE, "r", encoding="UTF-8") as f:
+        capture = json.load(f)
+    replay = list(ReplayReader(CAPTURE))
+    assert [timestamp for timestamp, _ in replay] == [float(ts) for ts in capture]
+    assert [message for _, message in replay] == list(capture.values())
+    # members split across many small chunks
+    with open(CAPTURE, "rb") as f:
+        keys = [key for _, key, _ in iter_json_object(f, chunk_size=7)]
+    assert keys == list(capture)
+
+
+def test_replay_log(tmp_path):
+    messages = [{"time": float(t), "rssi": -60.0 - t} for t in range(20)]
+    path = str(tmp_path / "mqtt-0.log")
+    with open(path, "w", encoding="UTF-8") as f:
+        for message in messages:
+            f.write(f"{json.dumps(message)}\n")
+    replay = list(ReplayReader(path, read_ahead=4))
+    assert [message for _, message in replay] == messages
+
+    # time window seeking builds the sidecar index
+    window = ReplayReader(path, start_time=7, end_time=12, index_every=5)
+    assert [timestamp for timestamp, _ in window] == [7, 8, 9, 10, 11, 12]
+    assert os.path.exists(f"{path}.idx")
+    assert window.seek(7) > 0
@@ -0,0 +1,67 @@
+"""
+Tests for rng.py
+"""
+from types import SimpleNamespace
+
+import numpy as np
+
+from birdseye.env import RFMultiEnv
+from birdseye.particle_filter import systematic_resample
+from birdseye.rng import RNGContext
+from birdseye.rng import parse_seed
+from birdseye.state import RFMultiState
+
+
+def run_env(make_env, seed, steps=5):
+    env = make_env(n_targets=2, rng=RNGContext(seed))
+    for _ in range(steps):
+        env.step((0, 1))
+    return env.get_all_particles()
+
+
+def test_reproducible_env(make_env):
+    """
+    Test that runs with the same seed are identical and different seeds differ
+    """
+    assert np.array_equal(run_env(make_env, 1234), run_env(make_env, 1234))
+    assert not np.array_equal(run_env(make_env, 1234), run_env(make_env, 4321))
+
+
+def test_rng_context():
+    """
+    Test seed parsing and spawning of independent contexts
+    """
+    assert parse_seed("") is None
+    assert parse_seed("1234,5") == [1234, 5]
+    first, second = RNGContext(1).spawn(2)
+    assert first.filter.random() != second.filter.random()
+    assert RNGContext(1).spawn(2)[1].state.random() == RNGContext(1).spawn(2)[
+        1
+    ].state.random()
+
+
+def test_systematic_resample():
+    """
+    Test the vectorized systematic resampling
+    """
+    weights = np.array([0.0, 0.5, 0.0, 0.5])
+    indices = systematic_resample(weights, np.random.default_rng(0))
+    assert sorted(indices) == [1, 1, 3, 3]
+    weights = np.ones(1000) / 1000
+    indices = systematic_resample(weights, np.random.default_rng(0))
+    assert np.array_equal(indices, np.arange(1000))
+
+
+def test_joint_env_rng():
+    """
+    Test that the joint env draws its particle noise and states from its rng
+    """
+    envs = [
+        RFMultiEnv(state=RFMultiState(n_targets=2), rng=np.random.default_rng(1))
+        for _ in range(2)
+    ]
+    noise = [env.particle_noise(np.zeros((10, 8))) for env in envs]
+    assert np.array_equal(noise[0], noise[1])
+    for env, particles in zip(envs, noise):
+        env.pf = SimpleNamespace(particles=particles)
+    assert np.array_equal(envs[0].random_state(None), envs[1].random_state(None))
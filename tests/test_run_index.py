@@ -0,0 +1,59 @@
+"""
+Tests for run_index.py
+"""
+import os
+import shutil
+import time
+
+import numpy as np
+
+import birdseye.utils
+from birdseye.run_index import RunIndex
+from birdseye.runlog import ColumnarLogWriter
+
+
+def write_run(log_dir, length, n_targets=2):
+    os.makedirs(log_dir)
+    with open(f"{log_dir}/config.log", "w", encoding="UTF-8") as f:
+        f.write('{"planner_method": "repp"}')
+    writer = ColumnarLogWriter(log_dir)
+    for i in range(length):
+        writer.append(
+            {
+                "plan_time": 0.1,
+                "std_dev_cartesian": np.full((n_targets, 2), 100.0 - i),
+                "centroid_distance_err": np.full(n_targets, 3.0),
+            }
+        )
+    writer.flush()
+
+
+def test_run_index(tmp_path, monkeypatch):
+    """
+    Test that run summaries are persisted, reused and refreshed on change
+    """
+    experiment_dir = tmp_path / "experiment"
+    write_run(f"{experiment_dir}/1_logs", 40)
+    write_run(f"{experiment_dir}/2_logs", 400)
+
+    monkeypatch.setattr(birdseye.utils, "RUN_DIR", str(tmp_path))
+    reader = birdseye.utils.ResultsReader("experiment", n_workers=2)
+    assert reader.localization_probability() == 0.5
+    assert reader.average_localization_time() == 40
+    assert np.isclose(reader.average_rmse()[1], 3.0)
+    assert np.isclose(reader.average_plantime(), 0.1)
+    assert reader.average_std_dev()[0] == 61.0
+    assert len(reader.log_data[f"{experiment_dir}/1_logs"]) == 40
+    assert reader.log_config[f"{experiment_dir}/1_logs"]["target_speed"] == 0.5
+    assert os.path.exists(experiment_dir / "summary_index.json")
+
+    # unchanged runs come from the persisted index
+    index = RunIndex(str(experiment_dir))
+    assert index.entries["1_logs"]["summary"]["length"] == 40
+
+    # a rewritten run is summarized again
+    time.sleep(0.01)
+    shutil.rmtree(f"{experiment_dir}/1_logs")
+    write_run(f"{experiment_dir}/1_logs", 41)
+    reader = birdseye.utils.ResultsReader("experiment", n_workers=1)
+    assert reader.average_localization_time() == 41
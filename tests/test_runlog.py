@@ -0,0 +1,75 @@
+"""
+Tests for runlog.py
+"""
+import json
+
+import numpy as np
+
+from birdseye.runlog import ColumnarLogWriter
+from birdseye.runlog import load_run_log
+
+
+def make_row(i):
+    return {
+        "time": 1000.0 + i,
+        "target": np.full((2, 4), i),
+        "action": (0, 1),
+        "plan_time": 0.5 * i,
+        "note": None,
+    }
+
+
+def test_columnar_log(tmp_path):
+    """
+    Test chunked writes and memory mapped reads of the columnar run log
+    """
+    writer = ColumnarLogWriter(str(tmp_path), chunk_size=4)
+    for i in range(10):
+        writer.append(make_row(i))
+    # two chunks written, two rows still buffered
+    assert load_run_log(str(tmp_path)).column("plan_time").shape == (8,)
+    writer.flush()
+
+    log = load_run_log(str(tmp_path))
+    assert len(log) == 10
+    assert log.column("target").shape == (10, 2, 4)
+    assert np.array_equal(log.column("plan_time"), 0.5 * np.arange(10))
+    assert log.column("note") == [None] * 10
+    assert log[-1]["time"] == 1009.0
+    assert [row["action"].tolist() for row in log][3] == [0, 1]
+
+
+def test_json_log_fallback(tmp_path):
+    """
+    Test that runs logged to data.log read through the same interface
+    """
+    with open(tmp_path / "data.log", "w", encoding="UTF-8") as f:
+        for i in range(3):
+            f.write(json.dumps({"plan_time": i, "std_dev_cartesian": [[i, i]]}))
+            f.write("\n")
+    log = load_run_log(str(tmp_path))
+    assert len(log) == 3
+    assert log.column("std_dev_cartesian").shape == (3, 1, 2)
+    assert log[1]["plan_time"] == 1
+
+
+def test_columnar_log_changing_field(tmp_path):
+    """
+    Test that a numeric field changing shape or type moves to a JSON column
+    """
+    writer = ColumnarLogWriter(str(tmp_path), chunk_size=4)
+    for i in range(10):
+        row = make_row(i)
+        if i >= 6:
+            row["plan_time"] = None
+            row["target"] = np.full((1, 4), i)
+        writer.append(row)
+    writer.flush()
+
+    log = load_run_log(str(tmp_path))
+    assert len(log) == 10
+    assert log.column("plan_time") == [0.5 * i for i in range(6)] + [None] * 4
+    assert log.column("target")[0] == [[0.0] * 4] * 2
+    assert log.column("target")[9] == [[9] * 4]
+    assert log.column("time").shape == (10,)
+    assert not (tmp_path / "columns" / "plan_time.bin").exists()
@@ -0,0 +1,59 @@
+"""
+Tests for scheduler.py
+"""
+from pathlib import Path
+
+from birdseye.scheduler import ExperimentScheduler
+
+
+def touch_unit(config, trial):
+    if config["experiment_name"] == "broken":
+        raise ValueError("broken config")
+    Path(config["out_dir"], f"{config['experiment_name']}_{trial}").write_text(
+        config["seed"]
+    )
+
+
+def test_scheduler_resume(tmp_path):
+    """
+    Test that the scheduler runs every unit once and skips completed units
+    """
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    configs = [
+        {"experiment_name": name, "out_dir": str(out_dir)}
+        for name in ["a", "b", "broken"]
+    ]
+    scheduler = ExperimentScheduler(
+        sweep_name="sweep", n_workers=2, run_dir=str(tmp_path)
+    )
+    failed = scheduler.run(touch_unit, configs, n_trials=2)
+    assert sorted(failed) == [("broken", 0), ("broken", 1)]
+    assert sorted(p.name for p in out_dir.iterdir()) == ["a_0", "a_1", "b_0", "b_1"]
+    assert (out_dir / "a_0").read_text() != (out_dir / "b_0").read_text()
+
+    # resumed sweep only retries the failed units, with the same seeds
+    seed = (out_dir / "a_0").read_text()
+    (out_dir / "a_0").unlink()
+    scheduler = ExperimentScheduler(
+        sweep_name="sweep", n_workers=2, run_dir=str(tmp_path)
+    )
+    assert len(scheduler.completed()) == 4
+    failed = scheduler.run(touch_unit, configs[:1], n_trials=2)
+    assert failed == []
+    assert not (out_dir / "a_0").exists()
+    assert seed == f"{scheduler.entropy},0,0"
+
+
+def test_scheduler_trial_seeds(tmp_path):
+    """
+    Test that every trial of a config draws its own seed
+    """
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    scheduler = ExperimentScheduler(
+        sweep_name="sweep", n_workers=2, run_dir=str(tmp_path)
+    )
+    configs = [{"experiment_name": "a", "out_dir": str(out_dir)}]
+    assert scheduler.run(touch_unit, configs, n_trials=2) == []
+    assert (out_dir / "a_0").read_text() != (out_dir / "a_1").read_text()
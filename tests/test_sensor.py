@@ -0,0 +1,45 @@
+"""
+Tests for sensor.py
+"""
+import numpy as np
+
+from birdseye.sensor import DoubleRSSILofi
+from birdseye.sensor import SingleRSSISeparable
+
+
+def test_rssi_table():
+    rng = np.random.default_rng(0)
+    states = np.column_stack(
+        (
+            rng.uniform(1, 500, 1000),
+            rng.uniform(-360, 720, 1000),
+            rng.uniform(0, 360, 1000),
+            np.ones(1000),
+        )
+    )
+    kwargs = dict(
+        antenna_filename="radiation_pattern_yagi_5.csv",
+        power_tx=[26, 20],
+        directivity_tx=[1, 1],
+        freq=[5.7e9, 2.4e9],
+        n_targets=2,
+        fading_sigma=8,
+    )
+    sensor = SingleRSSISeparable(**kwargs)
+    table_sensor = SingleRSSISeparable(rssi_table=True, **kwargs)
+    assert sensor.rssi_tables is None
+    for target in range(2):
+        expected = sensor.observation_vectorized(states, target, fading_sigma=0)
+        looked_up = table_sensor.observation_vectorized(states, target, fading_sigma=0)
+        assert np.allclose(looked_up, expected)
+    # one draw of fading per call, as without the table
+    assert not np.allclose(table_sensor.observation_vectorized(states, 0), expected)
+
+    lofi = DoubleRSSILofi(antenna_filename="radiation_pattern_yagi_5.csv")
+    table_lofi = DoubleRSSILofi(
+        antenna_filename="radiation_pattern_yagi_5.csv", rssi_table=True
+    )
+    joint_states = np.reshape(states, (500, 2, 4))
+    expected = np.array([lofi.observation(joint) for joint in joint_states])
+    assert np.allclose(table_lofi.observation_vectorized(joint_states), expected)
+    assert np.allclose(table_lofi.observation(joint_states[0]), expected[0])
@@ -0,0 +1,54 @@
+"""
+Tests for state.py
+"""
+import numpy as np
+
+from birdseye.state import RFMultiState
+from birdseye.state import RFState
+
+
+def test_random_particle_states():
+    """
+    Test the vectorized particle prior of RFMultiState
+    """
+    state = RFMultiState(n_targets=3, particle_distance=150, target_speed=0.5)
+    particles = state.random_particle_states(1000)
+    assert particles.shape == (1000, 4)
+    assert np.all((particles[:, 0] >= 1) & (particles[:, 0] <= 150))
+    assert np.all((particles[:, 1] >= 0) & (particles[:, 1] <= 359))
+    assert np.all(particles[:, 2] % 30 == 0)
+    assert np.all(particles[:, 3] == 0.5)
+    assert state.init_particle_states(10).shape == (10, 12)
+    assert state.init_target_state().shape == (3, 4)
+    assert RFState().random_states(5).shape == (5, 4)
+
+
+def test_shaped_priors():
+    """
+    Test priors shaped from a previous belief and from a target position
+    """
+    state = RFMultiState(n_targets=1)
+    previous = np.tile([50.0, 90.0, 30.0, 1.0], (100, 1))
+    particles = state.belief_particle_states(500, previous)
+    assert particles.shape == (500, 4)
+    assert abs(np.mean(particles[:, 0]) - 50) < 1
+
+    particles = state.gps_particle_states(500, 80, 45, range_sigma=5)
+    assert particles.shape == (500, 4)
+    assert abs(np.mean(particles[:, 0]) - 80) < 2
+    assert np.all(particles[:, 0] >= 1)
+
+
+def test_absolute_states():
+    """
+    Test the vectorized relative to absolute transform
+    """
+    for state in [RFMultiState(n_targets=2), RFState()]:
+        state.sensor_state = np.array([30.0, 200.0, 75.0, 1.0])
+        relative = state.random_states(12).reshape(2, 3, 2, 4)
+        absolute = state.get_absolute_states(relative)
+        assert absolute.shape == (2, 3, 2, 4)
+        assert np.allclose(
+            absolute[1, 2, 0], state.get_absolute_state(relative[1, 2, 0])
+        )
+        assert np.all((absolute[..., 1] >= 0) & (absolute[..., 1] < 360))